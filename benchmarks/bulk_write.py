@@ -0,0 +1,69 @@
+"""
+Throughput of the forecast write-back.
+
+Builds a forecast frame of --level4s x --days rows shaped like total_output.csv
+and writes it to a scratch SQLite database three ways: the former plain
+DataFrame.to_sql append, write_frame appending in chunks, and write_frame
+through the staging table. The staged write runs twice to check that a rerun
+replaces its rows instead of duplicating them.
+
+Run from the repository root:
+    python -m benchmarks.bulk_write [--level4s 2000] [--days 63] [--chunksize 10000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src.components.fetching.connection import get_engine
+from src.components.fetching.write_sql import write_frame
+
+
+def forecast_frame(level4s, days, seed=0):
+    rng = np.random.default_rng(seed)
+    n = level4s * days
+    return pd.DataFrame({"Level4_ID": np.repeat([f"{i // 100}_{i % 100}_1_1" for i in range(level4s)], days),
+                         "Date": np.tile(14050101 + np.arange(days), level4s),
+                         "Forecast": rng.gamma(2.0, 500.0, n),
+                         "WeightQTY": rng.gamma(2.0, 500.0, n),
+                         "TargetMonth": 140412,
+                         "insert_date": "1405-01-01"})
+
+
+def row_count(engine, table):
+    with engine.connect() as conn:
+        return pd.read_sql_query(f"SELECT COUNT(*) AS n FROM {table}", conn)["n"].iloc[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--level4s", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=63)
+    parser.add_argument("--chunksize", type=int, default=10000)
+    args = parser.parse_args()
+
+    df = forecast_frame(args.level4s, args.days)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        connection_string = f"sqlite:///{Path(tmp) / 'bulk_write.db'}"
+        engine = get_engine(connection_string)
+
+        start = time.perf_counter()
+        df.to_sql("plain", engine, if_exists="append", index=False)
+        rows.append({"method": "to_sql", "seconds": time.perf_counter() - start, "table_rows": row_count(engine, "plain")})
+
+        stats = write_frame(df, "chunked", connection_string, chunksize=args.chunksize)
+        rows.append({"method": "write_frame", "seconds": stats["seconds"], "table_rows": row_count(engine, "chunked")})
+
+        for run in ["write_frame staged", "write_frame staged rerun"]:
+            stats = write_frame(df, "staged", connection_string, chunksize=args.chunksize,
+                                staging_table="staged_staging")
+            rows.append({"method": run, "seconds": stats["seconds"], "table_rows": row_count(engine, "staged")})
+        engine.dispose()
+
+    results = pd.DataFrame(rows).set_index("method")
+    results["rows_per_second"] = len(df) / results["seconds"]
+    print(f"{len(df)} rows")
+    print(results.to_string(float_format=lambda x: f"{x:,.2f}"))
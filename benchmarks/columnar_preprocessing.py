@@ -0,0 +1,78 @@
+"""
+Equality check and timing of the columnar preprocessing engine.
+
+Fetches and runs the weekly stage for the first --count level4s of the
+configured data source, then preprocesses them once per entry of
+feature_rules.json (the rules of every entry applied to each level4's data, and
+once without rules) with the pandas engine and with the columnar engine. Every
+train and forecast frame must be equal (values, dtypes and column order);
+reports the time per level4 of both engines and the number of blocks of the
+resulting frames. tests/test_columnar_preprocessing.py checks the same equality
+on a synthetic level4 without a filled data source.
+
+Run from the repository root, e.g. against the local source filled by
+src.components.fetching.synthetic:
+    python -m benchmarks.columnar_preprocessing [--count 6] [--repeat 3]
+"""
+import argparse
+import json
+import time
+import warnings
+from pathlib import Path
+import pandas as pd
+
+from src.utils.utils import read_yaml
+from src.components.preprocessing import Preprocessing
+from src.components.Preprocess.plans import compile_feature_plans
+from benchmarks.global_model import fetch
+warnings.filterwarnings("ignore")
+
+
+def run_engine(engine, train_data, forecast_data, cfg, feature_rules, features_recipe, plans, repeat):
+    """Preprocess every (rules entry, level4) pair; returns the frames and the seconds per pair."""
+    frames = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for rule in list(feature_rules) + [None]:
+            for level4 in train_data:
+                rules = {level4: feature_rules[rule]} if rule is not None else {}
+                level4_plans = {level4: plans[rule]} if rule is not None else plans
+                train, forecast = Preprocessing({level4: train_data[level4]},
+                                                {level4: forecast_data[level4]},
+                                                cfg["features_to_keep"], cfg["sin_features"],
+                                                cfg["features_to_dummies"], cfg["MA_variations"],
+                                                cfg["T_variations"], rules, features_recipe,
+                                                level4_plans, engine).preprocess_data()
+                frames[(rule, level4)] = (train[level4], forecast[level4])
+    return frames, (time.perf_counter() - start) / (repeat * len(frames))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=6, help="number of Level4 IDs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config = read_yaml(Path("config/config.yaml"))
+    cfg = config["preprocessing"]
+    with open("features_recipe.json", "r") as openfile:
+        features_recipe = json.load(openfile)
+    with open("feature_rules.json", "r") as openfile:
+        feature_rules = json.load(openfile)
+
+    train_data, forecast_data = fetch(config, args.count, ["seasonal_naive"])
+    plans = compile_feature_plans(cfg, feature_rules, features_recipe)
+
+    results, rows = {}, []
+    for engine in ["pandas", "columnar"]:
+        results[engine], seconds = run_engine(engine, train_data, forecast_data, cfg,
+                                              feature_rules, features_recipe, plans, args.repeat)
+        blocks = sum(frame._mgr.nblocks for pair in results[engine].values() for frame in pair)
+        rows.append({"engine": engine, "ms per level4": seconds * 1000,
+                     "blocks per frame": blocks / (2 * len(results[engine]))})
+
+    for key, (train, forecast) in results["pandas"].items():
+        pd.testing.assert_frame_equal(results["columnar"][key][0], train, check_exact=True)
+        pd.testing.assert_frame_equal(results["columnar"][key][1], forecast, check_exact=True)
+    print(f"{len(results['pandas'])} (rules, level4) pairs: columnar frames equal to pandas frames")
+    print(pd.DataFrame(rows).set_index("engine").to_string(float_format=lambda x: f"{x:.2f}"))
@@ -0,0 +1,64 @@
+"""
+Memory of the preprocessed frames with the compact dtype policy against wide dtypes.
+
+Fetches and runs the weekly stage for the first --count level4s of the
+configured data source, preprocesses them with dtypes "wide" (int64/float64)
+and "compact" (src.components.dtypes), and reports per level4 the memory of the
+train and forecast frames, their pickled size (what a Pool worker sends back),
+the dtype LightGBM trains on and the largest relative difference of the
+feature values.
+
+Run from the repository root, e.g. against the local source filled by
+src.components.fetching.synthetic:
+    python -m benchmarks.dtype_memory [--count 6]
+"""
+import argparse
+import json
+import pickle
+import warnings
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src.utils.utils import read_yaml
+from src.components.preprocessing import Preprocessing
+from src.components.dtypes import feature_matrix
+from benchmarks.global_model import fetch
+warnings.filterwarnings("ignore")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=6, help="number of Level4 IDs")
+    args = parser.parse_args()
+
+    config = read_yaml(Path("config/config.yaml"))
+    cfg = config["preprocessing"]
+    with open("features_recipe.json", "r") as openfile:
+        features_recipe = json.load(openfile)
+    with open("feature_rules.json", "r") as openfile:
+        feature_rules = json.load(openfile)
+    train_data, forecast_data = fetch(config, args.count, ["seasonal_naive"])
+
+    frames, rows = {}, []
+    for dtypes in ["wide", "compact"]:
+        frames[dtypes] = Preprocessing(dict(train_data), dict(forecast_data), cfg["features_to_keep"],
+                                       cfg["sin_features"], cfg["features_to_dummies"], cfg["MA_variations"],
+                                       cfg["T_variations"], feature_rules, features_recipe,
+                                       engine=cfg["engine"], dtypes=dtypes).preprocess_data()
+        train, forecast = frames[dtypes]
+        X = feature_matrix(next(iter(train.values())).drop(columns=["target", "Date", "WeightQTY_Actual"]))
+        rows.append({"dtypes": dtypes,
+                     "KiB per level4": sum(df.memory_usage(deep=True).sum()
+                                           for part in (train, forecast) for df in part.values()) / 1024 / len(train),
+                     "pickled KiB per level4": len(pickle.dumps((train, forecast))) / 1024 / len(train),
+                     "LightGBM input": str(X.dtype)})
+
+    worst = 0.0
+    for wide, compact in zip(frames["wide"], frames["compact"]):
+        for level4 in wide:
+            expected, actual = wide[level4].to_numpy(dtype=float), compact[level4].to_numpy(dtype=float)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                worst = max(worst, np.nanmax(np.abs(actual - expected) / np.abs(expected), initial=0.0))
+    print(pd.DataFrame(rows).set_index("dtypes").to_string(float_format=lambda x: f"{x:.1f}"))
+    print(f"max relative difference of the values: {worst:.3g}")
@@ -0,0 +1,121 @@
+"""
+Per-level4 models against one pooled global model.
+
+Runs fetch, the weekly stage and preprocessing for the first --count level4s of
+the configured data source, then trains both ways with the search settings of
+params.yaml (params store disabled) and reports the training wall time and the
+forecast error on the forecast days that already have actuals.
+
+Run from the repository root, e.g. against the local source filled by
+src.components.fetching.synthetic:
+    python -m benchmarks.global_model [--count 20]
+"""
+import argparse
+import json
+import time
+import warnings
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import jdatetime as jdt
+
+from src.utils.utils import read_yaml
+from src.utils.cores import allocate_cores
+from src.components.data_fetching import DataFetching
+from src.components.fetching.read_sql import read_sql_data_bulk
+from src.components.fetching.sources import data_source_from_config
+from src.components.MA_Sarima import SarimaPredictor
+from src.components.preprocessing import Preprocessing
+from src.components.model_trainer import ModelTrainig, GlobalModelTrainig
+warnings.filterwarnings("ignore")
+
+
+def fetch(config, count, sarima_engines, sarima_steps=9):
+    """Train and forecast frames of the first count level4s, with the weekly stage output."""
+    source = data_source_from_config(config["data_fetching"])
+    start_forecast = jdt.datetime.strptime((jdt.date.today() - jdt.timedelta(days=15)).strftime("%Y%m%d"), "%Y%m%d")
+    end_forecast = start_forecast + jdt.timedelta(days=sarima_steps * 7)
+    level4_ids = [str(level4) for level4 in source.read_level4_ids()][:count]
+
+    data = read_sql_data_bulk(source, level4_ids, start_forecast, end_forecast)
+    train_data, forecast_data, forecast_date = {}, {}, None
+    for level4, frames in data.items():
+        train, forecast, forecast_date = DataFetching("", "", start_forecast, end_forecast,
+                                                      level4, frames, cache_dir=None, source=source).run()
+        train_data.update(train)
+        forecast_data.update(forecast)
+
+    forecast_data = SarimaPredictor(engines=sarima_engines)(train_data, forecast_data, forecast_date, steps=sarima_steps)
+    return train_data, forecast_data
+
+
+def prepare(config, features_recipe, feature_rules, count, sarima_engines, sarima_steps=9):
+    train_data, forecast_data = fetch(config, count, sarima_engines, sarima_steps)
+    cfg = config["preprocessing"]
+    return Preprocessing(train_data, forecast_data, cfg["features_to_keep"], cfg["sin_features"],
+                         cfg["features_to_dummies"], cfg["MA_variations"], cfg["T_variations"],
+                         feature_rules, features_recipe).preprocess_data()
+
+
+def forecast_errors(best_model, forecast_data):
+    """Absolute errors and actuals of the forecast rows that have actuals, over all level4s."""
+    errors, actuals = [], []
+    global_models = {}
+    for level4, model in best_model.items():
+        X = forecast_data[level4].drop(columns=["Date", "WeightQTY_Actual", "SarimaOutput"])
+        if hasattr(model, "global_model"):
+            global_models.setdefault(id(model.global_model), (model.global_model, {}))[1][level4] = X
+            continue
+        actual = forecast_data[level4]["WeightQTY_Actual"].to_numpy()
+        errors.append(np.abs(model.predict(X.values) - actual))
+        actuals.append(actual)
+
+    for global_model, frames in global_models.values():
+        for level4, forecast in global_model.predict_panel(frames).items():
+            actual = forecast_data[level4]["WeightQTY_Actual"].to_numpy()
+            errors.append(np.abs(forecast - actual))
+            actuals.append(actual)
+
+    errors, actuals = np.concatenate(errors), np.concatenate(actuals)
+    known = ~np.isnan(actuals)
+    return errors[known], actuals[known]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20, help="number of Level4 IDs")
+    parser.add_argument("--sarima-engines", nargs="+", default=["seasonal_naive"])
+    args = parser.parse_args()
+
+    config = read_yaml(Path("config/config.yaml"))
+    params = read_yaml(Path("params.yaml"))
+    with open("features_recipe.json", "r") as openfile:
+        features_recipe = json.load(openfile)
+    with open("feature_rules.json", "r") as openfile:
+        feature_rules = json.load(openfile)
+
+    train_data, forecast_data = prepare(config, features_recipe, feature_rules, args.count, args.sarima_engines)
+    budget = allocate_cores(config["resources"]["total_cores"], n_tasks=1)
+    training = config["training"]
+
+    rows = []
+    for mode in ["per_level4", "global"]:
+        if mode == "global":
+            trainer = GlobalModelTrainig(train_data, training["validation_size"], training["models"], "lgb",
+                                         params, features_recipe, None, n_jobs=budget["search_jobs"])
+        else:
+            trainer = ModelTrainig(train_data, training["validation_size"], training["models"], "lgb",
+                                   params, None, n_jobs=budget["search_jobs"])
+        start = time.perf_counter()
+        best_model, _, _ = trainer.run_training()
+        seconds = time.perf_counter() - start
+
+        errors, actuals = forecast_errors(best_model, forecast_data)
+        rows.append({"mode": mode,
+                     "level4s": len(best_model),
+                     "fits": sum(stats["n_fits"] for stats in trainer.search_stats.values()),
+                     "train_seconds": seconds,
+                     "mae": errors.mean(),
+                     "wape": errors.sum() / actuals.sum()})
+
+    print(pd.DataFrame(rows).set_index("mode").to_string(float_format=lambda x: f"{x:.3f}"))
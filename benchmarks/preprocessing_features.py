@@ -0,0 +1,35 @@
+"""
+Timing of the vectorized preprocessing features.
+
+Times the vectorized builders in src/components/Preprocess/features.py against
+the original per-row implementations on a synthetic series. Their equivalence
+is tested in tests/test_features.py, which holds the reference implementations.
+
+Run from the repository root:
+    python -m benchmarks.preprocessing_features [n_rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+from src.utils.utils import read_yaml
+from src.components.Preprocess.features import add_ma_features, add_t_lag_features
+from tests.test_features import legacy_add_ma_features, legacy_add_t_lag_features, synthetic_frame
+
+
+def timed(fn, df, *args):
+    start = time.perf_counter()
+    fn(df.copy(), df["WeightQTY"], *args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    config = read_yaml(Path("config/config.yaml"))["preprocessing"]
+    df = synthetic_frame(n_rows)
+
+    for name, legacy_fn, new_fn, variations in [
+            ("add_ma_features", legacy_add_ma_features, add_ma_features, config["MA_variations"]),
+            ("add_t_lag_features", legacy_add_t_lag_features, add_t_lag_features, config["T_variations"])]:
+        print(f"{name}: legacy {timed(legacy_fn, df, variations):.3f}s  "
+              f"vectorized {timed(new_fn, df, variations):.4f}s")
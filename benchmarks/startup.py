@@ -0,0 +1,89 @@
+"""
+Startup time of the entry points.
+
+Imports each entry module in a fresh interpreter with python -X importtime and
+reports its import time and the top-level packages that cost the most. The
+entry points and the Pool worker module must not load the modelling libraries
+(HEAVY_PACKAGES) at import: the stages import them when they run. Exits with
+status 1 when one of them does, or when an entry module takes longer than
+--max-seconds, so a regression fails the check.
+
+Run from the repository root: python -m benchmarks.startup [--max-seconds 1.0] [--repeat 3]
+"""
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+import pandas as pd
+
+
+# Modules started by the CLI: the scripts, python -m src and what a spawned Pool worker imports
+ENTRY_MODULES = ["src.cli", "main", "batch_processing", "predict", "src.settings", "src.pipeline"]
+# Stage modules, for reference: what the stages pay when they first run
+STAGE_MODULES = ["src.components.data_fetching",
+                 "src.components.MA_Sarima",
+                 "src.components.preprocessing",
+                 "src.components.model_trainer",
+                 "src.components.model_evaluation"]
+HEAVY_PACKAGES = ["statsmodels", "lightgbm", "sklearn", "matplotlib", "pyodbc", "scipy"]
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter.
+    Returns:
+        seconds (float), packages (dict): top-level package -> cumulative seconds of its first import
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    lines = [line.split("|") for line in result.stderr.splitlines()
+             if line.startswith("import time:") and "cumulative" not in line]
+    packages = defaultdict(float)
+    seconds = 0.0
+    # Nested imports are indented by two spaces per level and listed before their parent:
+    # read backwards, a module comes after its ancestors (stack)
+    stack = []
+    for _, cumulative, name in reversed(lines):
+        depth = (len(name) - len(name.lstrip())) // 2
+        package = name.strip().split(".")[0]
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if depth == 0:
+            seconds += int(cumulative) / 1e6
+        if package not in [ancestor for _, ancestor in stack]:
+            packages[package] += int(cumulative) / 1e6
+        stack.append((depth, package))
+    return seconds, dict(packages)
+
+
+def measure(module, repeat):
+    """Best of repeat imports of module, with the packages of that run."""
+    return min((import_times(module) for _ in range(repeat)), key=lambda timed: timed[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="import time budget of an entry module")
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module, the fastest is kept")
+    parser.add_argument("--top", type=int, default=4, help="packages listed per module")
+    args = parser.parse_args()
+
+    rows, failures = [], []
+    for module in ENTRY_MODULES + STAGE_MODULES:
+        seconds, packages = measure(module, args.repeat)
+        top = sorted(packages.items(), key=lambda item: -item[1])[:args.top]
+        rows.append({"module": module,
+                     "entry": module in ENTRY_MODULES,
+                     "seconds": seconds,
+                     "heaviest": ", ".join(f"{name} {t:.2f}s" for name, t in top)})
+        if module in ENTRY_MODULES:
+            heavy = [name for name in HEAVY_PACKAGES if name in packages]
+            if heavy:
+                failures.append(f"{module} imports {', '.join(heavy)}")
+            if seconds > args.max_seconds:
+                failures.append(f"{module} takes {seconds:.2f}s to import (budget {args.max_seconds:.2f}s)")
+
+    print(pd.DataFrame(rows).set_index("module").to_string(float_format=lambda x: f"{x:.3f}"))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,68 @@
+"""
+Per-model predict loop against the batched array-backed tree evaluator.
+
+Trains --models small LightGBM boosters on synthetic level4-like data (split
+over --schemas feature schemas), then forecasts --rows rows per model both as
+ModelEvaluation does, one Booster.predict(frame.values) per model, and with
+predict_ensembles over all models at once. Flattening the boosters is timed
+separately: it is paid once per loaded model. Reports the wall times and the
+largest difference between the two. ModelEvaluation keeps the per-model loop
+while this benchmark shows it faster; the equality with Booster.predict is
+tested in tests/test_tree_inference.py.
+
+Run from the repository root:
+    python -m benchmarks.tree_inference [--models 1000] [--rows 63] [--trees 200]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+
+from src.components.training.tree_inference import TreeEnsemble, predict_ensembles
+
+
+def synthetic_models(n_models, n_schemas, n_features, n_trees, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    schemas = [[f"f{s}_{i}" for i in range(n_features)] for s in range(n_schemas)]
+    models, frames = {}, {}
+    for m in range(n_models):
+        columns = schemas[m % n_schemas]
+        X = rng.normal(size=(400 + n_rows, n_features))
+        X[rng.random(X.shape) < 0.05] = np.nan
+        y = np.nansum(X[:, :3] * rng.normal(size=3), axis=1) + rng.normal(size=len(X)) * 0.3
+        train = pd.DataFrame(X[:400], columns=columns)
+        models[m] = lgb.train({"objective": "regression", "num_leaves": 15, "learning_rate": 0.05, "verbose": -1},
+                              lgb.Dataset(train, y[:400]), num_boost_round=n_trees)
+        frames[m] = pd.DataFrame(X[400:], columns=columns)
+    return models, frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", type=int, default=1000)
+    parser.add_argument("--schemas", type=int, default=3)
+    parser.add_argument("--features", type=int, default=40)
+    parser.add_argument("--trees", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=63, help="forecast rows per model")
+    args = parser.parse_args()
+
+    models, frames = synthetic_models(args.models, args.schemas, args.features, args.trees, args.rows)
+
+    start = time.perf_counter()
+    loop = {m: models[m].predict(frames[m].values) for m in models}
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ensembles = {m: TreeEnsemble.from_booster(models[m]) for m in models}
+    flatten_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = predict_ensembles({m: (ensembles[m], frames[m].values) for m in models})
+    batch_seconds = time.perf_counter() - start
+
+    print(pd.DataFrame([{"method": "predict loop", "seconds": loop_seconds},
+                        {"method": "batch flatten", "seconds": flatten_seconds},
+                        {"method": "batch predict", "seconds": batch_seconds}]).set_index("method")
+          .to_string(float_format=lambda x: f"{x:.3f}"))
+    print(f"max |difference|: {max(np.abs(batch[m] - loop[m]).max() for m in models):.3g}")
@@ -0,0 +1,83 @@
+"""
+Fit time and accuracy of the weekly forecasting engines.
+
+Holds out the last `steps` complete weeks of every level4, fits each engine on
+the rest and reports wall time and WAPE (sum |error| / sum actual) per engine.
+
+Run from the repository root against the configured data source, e.g. the
+local one filled by src.components.fetching.synthetic:
+    python -m benchmarks.weekly_engines [--count 20] [--steps 9]
+"""
+import argparse
+import time
+import warnings
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import jdatetime as jdt
+
+from src.utils.utils import read_yaml, calendar_lookup
+from src.components.fetching.sources import data_source_from_config
+from src.components.MA_Sarima import SarimaPredictor
+from src.components.weekly_engines import WEEKLY_ENGINES
+warnings.filterwarnings("ignore")
+
+
+def weekly_series(train_data):
+    """Weekly WeightQTY_Actual per (Year, WeekofYear), without a trailing partial week."""
+    df = train_data[["Date", "Year", "WeightQTY_Actual"]].copy()
+    df["WeekofYear"] = calendar_lookup(df.Date, "week_of_year")
+    weekly = df.groupby(["Year", "WeekofYear"]).agg(W=("WeightQTY_Actual", "sum"), C=("Date", "nunique"))
+    if weekly.index[-1][1] < 53 and weekly.C.iloc[-1] < 7:
+        weekly = weekly.iloc[:-1]
+    return weekly.W.reset_index(drop=True)
+
+
+def run_engine(engine, weekly, steps, fourier_k):
+    if engine == "sarimax":
+        return SarimaPredictor().fit_weekly("benchmark", weekly).forecast(steps=steps)
+    if engine == "fourier_arma":
+        return WEEKLY_ENGINES[engine](weekly, steps, fourier_k=fourier_k)
+    return WEEKLY_ENGINES[engine](weekly, steps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20, help="number of Level4 IDs")
+    parser.add_argument("--steps", type=int, default=9, help="weeks held out")
+    parser.add_argument("--engines", nargs="+", default=["sarimax", *WEEKLY_ENGINES])
+    args = parser.parse_args()
+
+    config = read_yaml(Path("config/config.yaml"))
+    source = data_source_from_config(config["data_fetching"])
+    start_forecast = jdt.datetime.now()
+    level4_ids = [str(level4) for level4 in source.read_level4_ids()][:args.count]
+    panel = source.read_train(level4_ids, start_forecast)
+    panel["WeightQTY_Actual"] = panel["WeightQTY"]
+
+    rows = []
+    for level4, train_data in panel.groupby("Level4_ID", sort=False):
+        weekly = weekly_series(train_data.sort_values("Date"))
+        history, actual = weekly[:-args.steps], weekly[-args.steps:].to_numpy()
+        for engine in args.engines:
+            start = time.perf_counter()
+            try:
+                forecast = np.asarray(run_engine(engine, history, args.steps, config["sarima"]["fourier_k"]))
+                wape = np.abs(forecast - actual).sum() / actual.sum()
+                failed = False
+            except Exception:
+                wape, failed = np.nan, True
+            rows.append({"Level4_ID": level4,
+                         "engine": engine,
+                         "seconds": time.perf_counter() - start,
+                         "wape": wape,
+                         "failed": failed})
+
+    results = pd.DataFrame(rows)
+    summary = results.groupby("engine", sort=False).agg(level4s=("Level4_ID", "nunique"),
+                                                         total_seconds=("seconds", "sum"),
+                                                         mean_seconds=("seconds", "mean"),
+                                                         mean_wape=("wape", "mean"),
+                                                         median_wape=("wape", "median"),
+                                                         failures=("failed", "sum"))
+    print(summary.to_string(float_format=lambda x: f"{x:.3f}"))
@@ -0,0 +1,16 @@
+"""
+Inference-only forecast from the model registry; same as python -m src predict.
+
+Fetches, runs the weekly stage and preprocesses the Level4 IDs stored in the
+registry exactly like batch_processing.py, then forecasts with the stored
+models: no hyperparameter search and no training. Meant for re-forecasts
+between batch runs, once the new actuals are in the database.
+
+    python predict.py [--write-to-db] ...
+"""
+import sys
+from src.cli import main
+
+
+if __name__ == "__main__":
+    main(["predict", *sys.argv[1:]])
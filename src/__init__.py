@@ -1,20 +1,32 @@
 import os
 import sys
 import logging
+from pathlib import Path
 
 logging_str = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
 
-log_dir = "logs"
-log_filepath = os.path.join(log_dir, "logging.log")
-os.makedirs(log_dir, exist_ok=True)
+logger = logging.getLogger("forecastlogger")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format=logging_str,
-    handlers=[
-        logging.FileHandler(log_filepath),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Per-level4 forecasts, plots and total_output.csv, next to src/ whatever the working directory
+OUTPUT_DIR = Path(__file__).resolve().parent.parent / "output"
 
-logger = logging.getLogger("forecastlogger")
\ No newline at end of file
+
+def setup_logging(log_dir="logs"):
+    """
+    Log to <log_dir>/logging.log and stdout. Called by the entry points and the
+    pool workers, not at import, so importing src has no side effects; a second
+    call in the same process does nothing.
+    """
+    root = logging.getLogger()
+    if getattr(root, "_forecast_configured", False):
+        return
+    os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=logging_str,
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "logging.log")),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    root._forecast_configured = True
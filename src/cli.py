@@ -0,0 +1,101 @@
+"""
+Command line entry point of the forecast pipeline.
+
+    python -m src run [--level4 7_5_9_2]     every stage of one Level4, in this process
+    python -m src batch                      all Level4 IDs of the source (batch_processing.py)
+    python -m src predict                    re-forecast with the stored models (predict.py)
+    python -m src plots [LEVEL4 ...]         render the plots of the stored forecasts
+
+The configuration is read once, after the arguments are parsed, and the stage
+modules are imported by the stages that use them, so --help and the plots do
+not pay for the modelling libraries.
+"""
+import argparse
+from pathlib import Path
+from src import OUTPUT_DIR
+
+
+def _run_options(parser):
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--params", default="params.yaml")
+    parser.add_argument("--model", default="lgb", help="model of training.models to train")
+    parser.add_argument("--date", type=int, default=None, help="first forecast day (YYYYMMDD), 15 days ago by default")
+    parser.add_argument("--sarima-steps", type=int, default=9, help="weeks forecast by the weekly stage")
+    parser.add_argument("--full-reload", action="store_true", help="ignore the local data cache and reload the full history")
+    parser.add_argument("--sarima-refit", action="store_true", help="ignore the stored SARIMA parameters and fit from scratch")
+    parser.add_argument("--params-research", action="store_true",
+                        help="search hyperparameters even when the stored best params could be reused")
+    parser.add_argument("--output-dir", default=str(OUTPUT_DIR))
+
+
+def _pool_options(parser):
+    parser.add_argument("--no-bulk-fetch", action="store_true", help="let every worker query its own Level4")
+    parser.add_argument("--write-to-db", action="store_true", help="write the combined forecasts to the database")
+    parser.add_argument("--target-month", type=int, default=140412)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src", description="Daily sales forecast pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="every stage of one Level4, in this process")
+    run.add_argument("--level4", default="7_5_9_2")
+    _run_options(run)
+
+    for name, text in [("batch", "all Level4 IDs of the source"),
+                       ("predict", "re-forecast the Level4 IDs of the model registry with their stored models")]:
+        command = commands.add_parser(name, help=text)
+        _run_options(command)
+        _pool_options(command)
+
+    plots = commands.add_parser("plots", help="render the plots of the stored forecasts")
+    plots.add_argument("level4s", nargs="*", help="Level4 IDs, all with a stored forecast by default")
+    plots.add_argument("--config", default="config/config.yaml")
+    plots.add_argument("--output-dir", default=str(OUTPUT_DIR))
+    plots.add_argument("--overwrite", action="store_true", help="render plots that are up to date too")
+    plots.add_argument("--niceness", type=int, default=10)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    from src import setup_logging
+    setup_logging()
+
+    if args.command == "plots":
+        import os
+        from src.utils.utils import read_yaml
+        from src.components.reporting import render_plots
+
+        os.nice(args.niceness)
+        config = read_yaml(Path(args.config))
+        render_plots(args.output_dir, args.level4s or None, config["training"]["validation_size"], args.overwrite)
+        return
+
+    from src import pipeline
+    from src.settings import Settings
+
+    options = dict(config_path = args.config,
+                   params_path = args.params,
+                   model_name = args.model,
+                   date = args.date,
+                   sarima_steps = args.sarima_steps,
+                   full_reload = args.full_reload,
+                   sarima_refit = args.sarima_refit,
+                   params_research = args.params_research,
+                   output_dir = args.output_dir)
+    if args.command == "run":
+        pipeline.run_single(Settings.load(**options), args.level4)
+        return
+
+    settings = Settings.load(**options,
+                             bulk_fetch = not args.no_bulk_fetch,
+                             write_to_db = args.write_to_db,
+                             target_month = args.target_month)
+    if args.command == "batch":
+        pipeline.run_batch(settings)
+    else:
+        pipeline.run_predict(settings)
@@ -1,12 +1,200 @@
+import json
+import time
+import datetime
+from pathlib import Path
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-import jdatetime as jdt
-from src.utils.utils import get_year_week
+from src.utils.utils import calendar_lookup
+from src.components.weekly_engines import WEEKLY_ENGINES, time_budget
+from src import logger
+
+
+SARIMA_ORDER = (1, 0, 1)
+SARIMA_SEASONAL_ORDER = (1, 1, 1, 53)
+
+
+def load_sarima_params(params_dir, level4):
+    """Return the stored SARIMA fit of a level4 (params, param_names, fitted_on, full_fit_on, ...) or None."""
+    path = Path(params_dir) / f"{level4}.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as openfile:
+        return json.load(openfile)
+
+
+def save_sarima_params(params_dir, level4, fit_result, n_weeks, full_fit_on=None):
+    """
+    Store a fit of a level4. fitted_on is the day of this fit, full_fit_on the
+    day of the last fit from scratch (today when None): warm starts keep it, so
+    the refit schedule counts from it.
+    """
+    path = Path(params_dir) / f"{level4}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stored = {"order": list(SARIMA_ORDER),
+              "seasonal_order": list(SARIMA_SEASONAL_ORDER),
+              "param_names": list(fit_result.model.param_names),
+              "params": [float(p) for p in fit_result.params],
+              "n_weeks": int(n_weeks),
+              "fitted_on": datetime.date.today().isoformat(),
+              "full_fit_on": full_fit_on or datetime.date.today().isoformat()}
+    with open(path, "w") as openfile:
+        json.dump(stored, openfile, indent=4)
 
 
 class SarimaPredictor:
 
+    def __init__(self,
+                 params_dir=None,
+                 warm_start="start_params",
+                 refit_every_days=7,
+                 force_refit=False,
+                 engines=("sarimax",),
+                 time_budget_seconds=None,
+                 fourier_k=4,
+                 weekly_fits=None):
+        """
+        Args:
+            params_dir (str): folder of the per-level4 fitted parameters. None disables warm starts.
+            warm_start (str): "start_params" optimizes from the stored parameters,
+                "filter" reuses them as they are and only runs the Kalman filter over the new weeks.
+            refit_every_days (int): stored parameters older than this get a full refit.
+            force_refit (bool): ignore the stored parameters.
+            engines (list): weekly models tried in order until one succeeds within the
+                time budget: "sarimax" and the ones in weekly_engines.WEEKLY_ENGINES.
+            time_budget_seconds (float): time allowed per engine, None for no limit.
+            fourier_k (int): number of yearly harmonics of the fourier_arma engine.
+            weekly_fits (dict): weekly fits of an earlier run by level4 (see fits), reused as
+                they are: the SARIMA parameters only filtered over the weeks, without optimizing.
+        """
+        self.params_dir = params_dir
+        self.warm_start = warm_start
+        self.refit_every_days = refit_every_days
+        self.force_refit = force_refit
+        self.engines = list(engines)
+        self.time_budget_seconds = time_budget_seconds
+        self.fourier_k = fourier_k
+        self.weekly_fits = weekly_fits or {}
+        # The weekly fit each level4 was forecast with: its engine, and the parameters of a SARIMA fit
+        self.fits = {}
+
+    def refit_due(self, level4):
+        """Whether the next fit of level4 starts from scratch (no usable stored fit, or one past refit_every_days)."""
+        if self.params_dir is None or self.force_refit:
+            return True
+        stored = load_sarima_params(self.params_dir, level4)
+        if stored is None:
+            return True
+        age = (datetime.date.today() - datetime.date.fromisoformat(stored.get("full_fit_on", stored["fitted_on"]))).days
+        return self.refit_every_days is not None and age >= self.refit_every_days
+
+    def fit_state(self, level4):
+        """
+        What the next fit of level4 starts from: whether a full refit is due and
+        the stored parameters a warm start or filter run would reuse (None when
+        there are none). Part of the SARIMA checkpoint key.
+        """
+        stored = None if self.params_dir is None else load_sarima_params(self.params_dir, level4)
+        return self.refit_due(level4), None if stored is None else stored["params"]
+
+    def _stored_fit(self, level4, model):
+        """Stored fit usable for this model, or None when a full refit is due."""
+        if self.params_dir is None or self.force_refit:
+            return None
+        stored = load_sarima_params(self.params_dir, level4)
+        if stored is None or stored["param_names"] != list(model.param_names):
+            return None
+        # Fits stored before full_fit_on existed only have the date of their last fit
+        full_fit_on = stored.get("full_fit_on", stored["fitted_on"])
+        age = (datetime.date.today() - datetime.date.fromisoformat(full_fit_on)).days
+        if self.refit_every_days is not None and age >= self.refit_every_days:
+            return None
+        return stored
+
+    def fit_weekly(self, level4, weekly_sales):
+        """
+        Fit the weekly SARIMA model, warm-started from the stored parameters when possible,
+        and log the fit time and optimizer iterations.
+        """
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        model = SARIMAX(weekly_sales, order=SARIMA_ORDER, seasonal_order=SARIMA_SEASONAL_ORDER)
+        stored = self._stored_fit(level4, model)
+        start_params = None if stored is None else np.asarray(stored["params"])
+
+        start = time.perf_counter()
+        if start_params is not None and self.warm_start == "filter":
+            mode = "filter"
+            fit_result = model.filter(start_params)
+            iterations = 0
+        else:
+            mode = "full" if start_params is None else "warm"
+            fit_result = model.fit(start_params=start_params, disp=False)
+            iterations = fit_result.mle_retvals.get("iterations")
+        elapsed = time.perf_counter() - start
+
+        logger.info(f"SARIMA {level4}: {mode} fit on {len(weekly_sales)} weeks "
+                    f"in {elapsed:.2f}s, {iterations} iterations")
+
+        # A filter-only run keeps the stored parameters and their refit date
+        if self.params_dir is not None and mode != "filter":
+            save_sarima_params(self.params_dir, level4, fit_result, len(weekly_sales),
+                               None if stored is None else stored.get("full_fit_on", stored["fitted_on"]))
+        return fit_result
+
+    def _run_engine(self, engine, level4, weekly_sales, steps):
+        if engine == "sarimax":
+            fit_result = self.fit_weekly(level4, weekly_sales)
+            self.fits[level4] = {"engine": engine,
+                                 "param_names": list(fit_result.model.param_names),
+                                 "params": [float(p) for p in fit_result.params]}
+            return fit_result.forecast(steps = steps)
+        self.fits[level4] = {"engine": engine}
+        if engine == "fourier_arma":
+            return WEEKLY_ENGINES[engine](weekly_sales, steps, fourier_k=self.fourier_k)
+        return WEEKLY_ENGINES[engine](weekly_sales, steps)
+
+    def reuse_fit(self, level4, weekly_sales, steps, fit):
+        """
+        Forecast the weekly series with a fit of an earlier run: SARIMA parameters are
+        filtered over the weeks as they are; the other engines fit from scratch, so
+        running them again gives the same forecast on the same weeks.
+        """
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        if fit["engine"] != "sarimax":
+            return self._run_engine(fit["engine"], level4, weekly_sales, steps)
+
+        model = SARIMAX(weekly_sales, order=SARIMA_ORDER, seasonal_order=SARIMA_SEASONAL_ORDER)
+        if fit["param_names"] != list(model.param_names):
+            raise ValueError(f"stored SARIMA parameters {fit['param_names']} do not fit the model")
+        self.fits[level4] = fit
+        logger.info(f"SARIMA {level4}: stored fit filtered on {len(weekly_sales)} weeks")
+        return model.filter(np.asarray(fit["params"])).forecast(steps = steps)
+
+    def forecast_weekly(self, level4, weekly_sales, steps):
+        """
+        Forecast the weekly series with the first engine that succeeds, falling back to the
+        next one when an engine raises, returns non-finite values or exceeds the time budget.
+        A level4 of weekly_fits is forecast with its fit instead (see reuse_fit).
+        """
+        if level4 in self.weekly_fits:
+            return self.reuse_fit(level4, weekly_sales, steps, self.weekly_fits[level4])
+
+        for engine in self.engines:
+            start = time.perf_counter()
+            try:
+                with time_budget(self.time_budget_seconds):
+                    forecast = self._run_engine(engine, level4, weekly_sales, steps)
+                if not np.isfinite(forecast).all():
+                    raise ValueError("non-finite forecast")
+                logger.info(f"Weekly model {engine} for {level4} in {time.perf_counter() - start:.2f}s")
+                return forecast
+            except Exception as e:
+                logger.warning(f"Weekly model {engine} failed for {level4} "
+                               f"after {time.perf_counter() - start:.2f}s: {e}")
+
+        raise RuntimeError(f"All weekly models failed for {level4}: {self.engines}")
+
     def __call__(self, 
                  train_data_general, 
                  forecast_data_general,
@@ -31,8 +219,7 @@ class SarimaPredictor:
                 temp_train_date =  train_data[['Date','Year']].reset_index(drop = True)
                 temp_forecast_date = forecast_dates
                 temp_dates = pd.concat([temp_train_date, temp_forecast_date]).reset_index(drop = True)
-                temp_dates['jdate'] = [jdt.datetime.strptime(str(x),'%Y%m%d') for x in temp_dates.Date]
-                temp_dates['WeekofYear'] = temp_dates['jdate'].apply(get_year_week)
+                temp_dates['WeekofYear'] = calendar_lookup(temp_dates.Date, "week_of_year")
 
                 weekly_dates_refs = temp_dates.groupby(['Year','WeekofYear']).agg(C=('Date','nunique')).reset_index()
                 weekly_dates_refs.reset_index(drop = False, inplace = True)
@@ -50,39 +237,22 @@ class SarimaPredictor:
                 daily_coef = pd.merge(daily_sales,weekly_sales,on = 'Level4_ID',copy = False)
                 daily_coef = daily_coef.assign(daily_shares = daily_coef.WeightQTY/daily_coef.W_WeightQTY)
 
-                start_jdate = jdt.datetime(1401,1,1)
-                gregorian_dates = [
-                    (start_jdate + jdt.timedelta(i-1)).togregorian()
-                    for i in np.cumsum(Week_Days_Count.C)]
-
                 if (last_week<53) & (last_week_days<7):
                     idx = temp_train_data[(temp_train_data.Year==last_week_year) & (temp_train_data.WeekofYear==last_week)].index
                     temp_train_data.drop(index = idx, inplace = True )
-                    gregorian_dates = gregorian_dates[:-1]
                     
                 ## SARIMA Model
                 weekly_sales = temp_train_data.groupby(['Year','WeekofYear']).agg(W = ('WeightQTY_Actual' , 'sum')).reset_index(drop = False)
-                weekly_sales.index = pd.to_datetime(gregorian_dates)
-
-                try:
-                    model = SARIMAX(
-                        pd.to_numeric(weekly_sales.W), order=( 1, 0, 1), seasonal_order=(1, 1, 1, 53)
-                        ).fit()
-                    
-                    forecast_index = pd.date_range(
-                        start = weekly_sales.index[-1] + pd.Timedelta(weeks=1),
-                        periods = steps, freq='7D' )
 
-                    forecast = model.forecast(steps = steps)
-                except:
-                    print("Model didn't converge")
+                # Positional index so the forecast rows line up with weekly_dates_refs
+                forecast = self.forecast_weekly(id, pd.to_numeric(weekly_sales.W).reset_index(drop = True), steps)
 
                 forecast_df = forecast.to_frame()
                 forecast_df.reset_index(inplace = True , drop = False)
                 forecast_df = pd.merge(forecast_df, weekly_dates_refs , on = 'index', how = 'inner', copy = False)
                 daily_forecast = pd.merge(forecast_df,temp_dates, on = ['Year','WeekofYear'], how = 'inner', copy = False)
                 daily_forecast['Level4_ID'] = id
-                daily_forecast['WeekDays'] = [x.weekday() for x  in daily_forecast.jdate]
+                daily_forecast['WeekDays'] = calendar_lookup(daily_forecast.Date, "weekday")
                 daily_forecast = pd.merge(daily_forecast, daily_coef, on = ['Level4_ID', 'WeekDays'],how = 'inner' ,copy = False)
                 daily_forecast = daily_forecast.drop_duplicates()
                 
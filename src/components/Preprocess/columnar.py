@@ -0,0 +1,168 @@
+"""
+Columnar engine for the feature plans.
+
+Builds the features of a plan as NumPy arrays in a dict (name -> array over
+the train and forecast rows) instead of growing a DataFrame column by column,
+so the train and forecast frames are each constructed once, from their slices
+of the arrays. Values and dtypes are those of the frame builders in
+features.py, step for step.
+"""
+import numpy as np
+import pandas as pd
+
+from src.components.Preprocess.features import campaign, rolling_ma_block, lag_block
+from src.components.Preprocess.plans import dummies_placeholder
+from src.components.dtypes import widen
+
+
+def column_values(series):
+    """The values of a Series as a NumPy array, or as its extension array for non-NumPy dtypes."""
+    return series.to_numpy() if isinstance(series.dtype, np.dtype) else series.array
+
+
+def stack_columns(train, forecast, names):
+    """
+    The columns names of train followed by forecast, with the dtypes pd.concat
+    gives them, widened to 64 bits for computing the features.
+    """
+    columns = {}
+    for name in names:
+        a, b = train[name], forecast[name]
+        if isinstance(a.dtype, np.dtype) and isinstance(b.dtype, np.dtype) and \
+                a.dtype.kind in "iuf" and b.dtype.kind in "iuf":
+            columns[name] = widen(np.concatenate([a.to_numpy(), b.to_numpy()]))
+        else:
+            columns[name] = widen(column_values(pd.concat([a, b], ignore_index=True)))
+    return columns
+
+
+def _flag(condition):
+    return condition.astype(np.int64)
+
+
+def _paycheck(cols):
+    cols["paycheck"] = _flag((cols["Day"] >= 30) | (cols["Day"] < 2))
+
+
+def _ramadan(cols):
+    cols["Ramadan"] = _flag(cols["Occastion_ID"] == 1)
+
+
+def _school(cols):
+    month = cols["Month"]
+    year = np.asarray(cols["Year"]).astype(int)
+    day = np.asarray(cols["Day"]).astype(int)
+    closed = (np.isin(month, [6, 4, 5, 3]) & (year > 1400)) | \
+             ((month == 1) & (year > 1400) & (day < 16)) | \
+             ((month == 12) & (year > 1400) & (day > 23))
+    cols["school"] = _flag(~closed)
+
+
+def _weekend(cols):
+    weekend = _flag(cols["WeekDays"] == 6)
+    cols["weekend"] = weekend
+    cols["weekend_c"] = 1 - weekend
+
+
+def _isholiday(cols):
+    cols["IsHolliday"] = cols["IsHolliday"] * (1 - cols["weekend"])
+
+
+def _start_of_year(cols):
+    cols["start_of_year"] = _flag((cols["Day"] < 3) & (cols["Month"] == 1))
+
+
+def _end_of_year(cols):
+    cols["end_of_year"] = _flag((cols["Day"] >= 28) & (cols["Month"] == 12))
+
+
+CALENDAR_BUILDERS = {
+    "paycheck": _paycheck,
+    "Ramadan": _ramadan,
+    "school": _school,
+    "weekend": _weekend,
+    "IsHolliday": _isholiday,
+    "start_of_year": _start_of_year,
+    "end_of_year": _end_of_year,
+}
+
+
+def _custom(cols, feature_name, features_recipe):
+    """The to_add features of add_custom_feature; a recipe product is a "recipe" step of its own."""
+    n = len(cols["WeightQTY"])
+    if feature_name == "campaign":
+        cols["campaign"] = _flag(np.isin(cols["Date"], campaign))
+    elif feature_name == "campaign_coef":
+        cols["campaign_coef"] = np.ones(n, dtype=np.int64)
+    elif feature_name == "summerdays":
+        cols["summerdays"] = _flag(np.isin(cols["Month"], [3, 4, 5, 6]))
+    elif feature_name == "IsBeforeHolliday":
+        holiday = np.asarray(cols["IsHolliday"])
+        dtype = holiday.dtype if holiday.dtype.kind == "f" else np.float64
+        before = np.empty(n, dtype=dtype)
+        before[:-1] = holiday[1:]
+        before[-1:] = 0
+        before[np.isnan(before) | ((before == 1) & (holiday == 1))] = 0
+        cols["IsBeforeHolliday"] = before
+    else:
+        raise ValueError(f"{feature_name} is not a calendar feature")
+
+
+def _dummies(cols, key):
+    """One-hot columns <key>_<value> of the sorted values of key (missing values in none), key removed."""
+    codes, levels = pd.factorize(cols.pop(key), sort=True)
+    names = [f"{key}_{level}" for level in levels]
+    for code, name in enumerate(names):
+        cols[name] = _flag(codes == code)
+    return names
+
+
+def build_feature_columns(data, plan, features_recipe):
+    """
+    Run a feature plan on data (input name -> array over train and forecast rows).
+    Returns:
+        columns (dict): final column name -> array, in plan order
+    """
+    cols = dict(data)
+    weight = cols["WeightQTY"]
+    ma = [step for step in plan["steps"] if step[0] == "ma"]
+    if ma:
+        block = rolling_ma_block(weight, [step[2] for step in ma])
+        for j, step in enumerate(ma):
+            cols[step[1]] = block[:, j]
+    lags = [step for step in plan["steps"] if step[0] == "lag"]
+    if lags:
+        block = lag_block(weight, [step[2] for step in lags])
+        for j, step in enumerate(lags):
+            cols[step[1]] = block[:, j]
+
+    dummies = {}
+    for step in plan["steps"]:
+        kind = step[0]
+        if kind in ("ma", "lag"):
+            continue
+        elif kind == "Ratio":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cols["Ratio"] = cols["MA-7"] / cols["MA-60"]
+        elif kind in CALENDAR_BUILDERS:
+            CALENDAR_BUILDERS[kind](cols)
+        elif kind == "week_day":
+            cols[f"WeekDays_{step[1]}"] = _flag(cols["WeekDays"] == step[1])
+        elif kind == "sine":
+            col, period = step[1], step[2]
+            cols[f"{col}Sin"] = np.sin(2 * np.pi * (cols[col] / period))
+            cols[f"{col}Cos"] = np.cos(2 * np.pi * (cols[col] / period))
+        elif kind == "custom":
+            _custom(cols, step[1], features_recipe)
+        elif kind == "recipe":
+            cols[step[1]] = cols[step[2]] * cols[step[3]]
+        elif kind == "dummies":
+            dummies[dummies_placeholder(step[1])] = _dummies(cols, step[1])
+        else:
+            raise ValueError(f"unknown feature plan step {step}")
+
+    columns = {}
+    for name in plan["columns"]:
+        for column in dummies.get(name, [name]):
+            columns[column] = cols[column]
+    return columns
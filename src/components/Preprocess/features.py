@@ -10,6 +10,12 @@ campaign = np.array([14030328,14030329,14030330,14030331,
                      14030701,14030702,14030703,
                      14030801,14030802,14030803])
 
+# Lag columns addressed by the "auto_corr" rule, in rule order (T-5 is not included)
+LAG_RULE_FEATURES = ["T-7","T-6","T-3","T-1"]
+
+# Moving-average columns addressed by the "ma" rule, in rule order
+MA_RULE_FEATURES = ["MA-60","MA-30","MA-15","MA-7"]
+
 
 def add_paycheck_feature(df):
     """
@@ -24,24 +30,92 @@ def add_paycheck_feature(df):
     df.loc[idx, "paycheck"] = 1
     return df
 
+def _insert_block(df, block, names):
+    """
+    Insert a 2-D block of new columns into df in a single operation.
+    Columns that already exist under the same name are replaced.
+    """
+    df = df.drop(columns=[n for n in names if n in df.columns])
+    return pd.concat([df, pd.DataFrame(block, columns=names, index=df.index)], axis=1)
+
+
+def rolling_ma_block(weight_col, windows):
+    """
+    Compute every moving-average column in one pass over weight_col.
+
+    Row i of window w is the mean of weight_col[i - w:], exactly like the
+    original per-row slicing (a negative start wraps to the tail of the
+    series) and row 0 is 1. Means come from suffix sums, so the cost is
+    O(n * len(windows)) instead of O(n^2). NaNs are skipped like np.mean
+    on a Series.
+
+    :param weight_col: Series or array of the target over train+forecast
+    :param windows: list of window lengths
+    :return: ndarray of shape (len(weight_col), len(windows))
+    """
+    values = np.asarray(weight_col, dtype=float)
+    n = len(values)
+    block = np.empty((n, len(windows)))
+    if n == 0:
+        return block
+
+    valid = ~np.isnan(values)
+    suffix_sum = np.append(np.cumsum(np.where(valid, values, 0.0)[::-1])[::-1], 0.0)
+    suffix_cnt = np.append(np.cumsum(valid[::-1])[::-1], 0)
+
+    rows = np.arange(n)
+    for j, window in enumerate(windows):
+        start = rows - window
+        start = np.where(start < 0, np.maximum(n + start, 0), start)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            block[:, j] = suffix_sum[start] / suffix_cnt[start]
+
+    block[0, :] = 1
+    return block
+
+
 def add_ma_features(df, weight_col, ma_variations):
-    for feature in ma_variations:
-        for key, value in feature.items():
-            df[key] = 1
-            df.loc[1: df.shape[0], key] = [
-                np.mean(weight_col[i - value:]) for i in range(1, df.shape[0])
-            ]
-    return df
+    names = [key for feature in ma_variations for key in feature.keys()]
+    windows = [value for feature in ma_variations for value in feature.values()]
+    block = rolling_ma_block(weight_col, windows)
+    return _insert_block(df, block, names)
+
+
+def lag_block(weight_col, lags):
+    """
+    Build every lag column as one shifted 2-D block.
+
+    Row i of lag k is weight_col[i - k], and the first k rows are 0, the
+    same values the original per-row loop produced.
+
+    :param weight_col: Series or array of the target over train+forecast
+    :param lags: list of lag lengths
+    :return: ndarray of shape (len(weight_col), len(lags))
+    """
+    values = np.asarray(weight_col, dtype=float)
+    source = np.arange(len(values))[:, None] - np.asarray(lags, dtype=int)[None, :]
+    return np.where(source >= 0, values[np.clip(source, 0, None)], 0.0)
 
 
 def add_t_lag_features(df, weight_col, t_variations):
-    for feature in t_variations:
-        for key, value in feature.items():
-            df[key] = 0
-            df.loc[value: df.shape[0], key] = [
-                weight_col[i - value] for i in range(value, df.shape[0])
-            ]
-    return df
+    names = [key for feature in t_variations for key in feature.keys()]
+    lags = [value for feature in t_variations for value in feature.values()]
+    block = lag_block(weight_col, lags)
+    return _insert_block(df, block, names)
+
+
+def select_lag_variations(t_variations, level4_id, feature_rules):
+    """
+    Keep only the T_variations entries a level4 does not drop through its
+    auto_corr rule, so add_t_lag_features never builds columns that
+    update_lag would remove afterwards.
+    """
+    if level4_id not in feature_rules:
+        return t_variations
+    auto_corr = feature_rules[level4_id]["auto_corr"]
+    dropped = {LAG_RULE_FEATURES[i] for i in range(len(auto_corr)) if auto_corr[i] == 0}
+    return [feature for feature in t_variations
+            if not any(key in dropped for key in feature.keys())]
 
 
 def apply_sine_features(df, 
@@ -56,8 +130,14 @@ def apply_sine_features(df,
 
     for feature in sin_features:
         for col, period in feature.items():
-            df[f"{col}Sin"] = np.sin(2 * np.pi * (df[col] / period))
-            df[f"{col}Cos"] = np.cos(2 * np.pi * (df[col] / period))
+            df = add_sine_feature(df, col, period)
+    return df
+
+
+def add_sine_feature(df, col, period):
+    """Add the <col>Sin and <col>Cos columns of one cyclical feature."""
+    df[f"{col}Sin"] = np.sin(2 * np.pi * (df[col] / period))
+    df[f"{col}Cos"] = np.cos(2 * np.pi * (df[col] / period))
     return df
 
 
@@ -65,11 +145,16 @@ def apply_dummy_features(df, features_to_dummies):
     for feature in features_to_dummies:
         for key, _ in feature.items():
             if key in df.columns:
-                df = df.join(pd.get_dummies(df[key], prefix=key).astype(int))
-                df = df.drop(columns=[key])
+                df = add_dummy_feature(df, key)
     return df
 
 
+def add_dummy_feature(df, key):
+    """Replace column key by its one-hot <key>_<value> columns, appended at the end."""
+    df = df.join(pd.get_dummies(df[key], prefix=key).astype(int))
+    return df.drop(columns=[key])
+
+
 
 def remove_sin_features(df, 
                         sin_features
@@ -130,22 +215,20 @@ def add_isholiday(df):
 def update_ma(df,
               level4_id,
               feature_rules):
-    ma_features = ["MA-60","MA-30","MA-15","MA-7"]
     if level4_id in feature_rules:
         for i in range(len(feature_rules[level4_id]["ma"])):
             if feature_rules[level4_id]["ma"][i] == 0:
-                df.drop(columns = ma_features[i], inplace=True, errors="ignore")
+                df.drop(columns = MA_RULE_FEATURES[i], inplace=True, errors="ignore")
 
     return df
     
 def update_lag(df,
               level4_id,
               feature_rules):
-    lag_features = ["T-7","T-6","T-3","T-1"] # T-5 is not included
     if level4_id in feature_rules:
         for i in range(len(feature_rules[level4_id]["auto_corr"])):
             if feature_rules[level4_id]["auto_corr"][i] == 0:
-                df.drop(columns = lag_features[i], inplace=True, errors="ignore")
+                df.drop(columns = LAG_RULE_FEATURES[i], inplace=True, errors="ignore")
 
     return df
 
@@ -158,26 +241,7 @@ def add_new_custom_feature(df,
         to_add = feature_rules[level4_id]["to_add"] 
         to_remove = feature_rules[level4_id]["to_remove"]
         for feature_name in to_add:
-
-            if feature_name == "campaign": 
-                df['campaign']= 0
-                df.loc[df.Date.isin(campaign),'campaign'] = 1
-            
-            if feature_name == "campaign_coef":
-                df['campaign_coef']= 1
-                df.loc[df.Date.isin(campaign),'campaign_coef'] = 1
-            
-            if feature_name == "summerdays":
-                df[feature_name] = 0
-                df.loc[df.Month.isin([3,4,5,6]),feature_name] = 1
-            
-            if feature_name == "IsBeforeHolliday":
-                df['IsBeforeHolliday'] = df.IsHolliday.shift(-1,axis = 0)
-                df.loc[pd.isna(df['IsBeforeHolliday'])== True, 'IsBeforeHolliday'] = 0
-                df.loc[(df['IsBeforeHolliday']==1)&(df['IsHolliday']== 1),'IsBeforeHolliday'] = 0
-
-            if feature_name not in df.columns and (features_recipe[feature_name]['a'] in df.columns) and (features_recipe[feature_name]['b'] in df.columns):
-                df[feature_name] = df[features_recipe[feature_name]['a']] * df[features_recipe[feature_name]['b']]
+            df = add_custom_feature(df, feature_name, features_recipe)
             
         for feature_name in to_remove:
             if feature_name in df.columns:
@@ -186,6 +250,40 @@ def add_new_custom_feature(df,
     return df
 
 
+def add_custom_feature(df,
+                       feature_name,
+                       features_recipe):
+    """
+    Add one to_add feature: a calendar flag built from the dates, or the
+    product of the two columns of its recipe when both exist.
+    """
+    if feature_name == "campaign": 
+        df['campaign']= 0
+        df.loc[df.Date.isin(campaign),'campaign'] = 1
+    
+    if feature_name == "campaign_coef":
+        df['campaign_coef']= 1
+        df.loc[df.Date.isin(campaign),'campaign_coef'] = 1
+    
+    if feature_name == "summerdays":
+        df[feature_name] = 0
+        df.loc[df.Month.isin([3,4,5,6]),feature_name] = 1
+    
+    if feature_name == "IsBeforeHolliday":
+        df['IsBeforeHolliday'] = df.IsHolliday.shift(-1,axis = 0)
+        df.loc[pd.isna(df['IsBeforeHolliday'])== True, 'IsBeforeHolliday'] = 0
+        df.loc[(df['IsBeforeHolliday']==1)&(df['IsHolliday']== 1),'IsBeforeHolliday'] = 0
+
+    if feature_name not in df.columns and (features_recipe[feature_name]['a'] in df.columns) and (features_recipe[feature_name]['b'] in df.columns):
+        df = add_recipe_feature(df, feature_name, features_recipe[feature_name]['a'], features_recipe[feature_name]['b'])
+    return df
+
+
+def add_recipe_feature(df, feature_name, a, b):
+    df[feature_name] = df[a] * df[b]
+    return df
+
+
 def add_week_day_indicator(df,
                            level4_id,
                            feature_rules):
@@ -193,8 +291,13 @@ def add_week_day_indicator(df,
     if level4_id in feature_rules and len(feature_rules[level4_id]["week_day_indicator"]) == 7:
         for i in range(7):
             if feature_rules[level4_id]["week_day_indicator"][i]==1:
-                c = i + 1
-                feature_name = "WeekDays_"+ str(c)
-                df[feature_name] = 0
-                df.loc[df.WeekDays == c , feature_name] = 1
-    return df
\ No newline at end of file
+                df = add_week_day_column(df, i + 1)
+    return df
+
+
+def add_week_day_column(df, c):
+    """Indicator of week day c in column WeekDays_<c>."""
+    feature_name = "WeekDays_"+ str(c)
+    df[feature_name] = 0
+    df.loc[df.WeekDays == c , feature_name] = 1
+    return df
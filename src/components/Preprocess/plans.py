@@ -0,0 +1,278 @@
+"""
+Feature plans: feature_rules.json and features_recipe.json compiled per level4.
+
+The preprocessing pipeline builds every feature and then drops the ones a
+level4's rules remove (to_remove, "ma", "auto_corr"). compile_feature_plan runs
+that pipeline on column names only, and keeps the steps the final columns
+actually depend on, so run_feature_plan builds exactly the final columns, in
+the same order and with the same values. Plans are plain JSON and are cached
+next to the rules file, keyed by the digest of everything they are compiled from.
+"""
+import json
+import hashlib
+from pathlib import Path
+from src import logger
+
+from src.components.Preprocess.features import (
+                                                MA_RULE_FEATURES,
+                                                select_lag_variations,
+                                                rolling_ma_block,
+                                                lag_block,
+                                                _insert_block,
+                                                add_paycheck_feature,
+                                                add_ramadan,
+                                                add_school,
+                                                add_weekend,
+                                                add_isholiday,
+                                                add_start_of_year,
+                                                add_end_of_year,
+                                                add_week_day_column,
+                                                add_sine_feature,
+                                                add_custom_feature,
+                                                add_recipe_feature,
+                                                add_dummy_feature
+)
+
+# Bump when the compiler changes what a plan contains, so cached plans are recompiled
+PLAN_VERSION = 1
+
+# Plan of the level4s without an entry in feature_rules.json
+DEFAULT_PLAN = "default"
+
+# Calendar steps in pipeline order: (step, input columns, output columns)
+CALENDAR_STEPS = [
+    ("paycheck", ["Day"], ["paycheck"]),
+    ("Ramadan", ["Occastion_ID"], ["Ramadan"]),
+    ("school", ["Month", "Year", "Day"], ["school"]),
+    ("weekend", ["WeekDays"], ["weekend", "weekend_c"]),
+    ("IsHolliday", ["IsHolliday", "weekend"], ["IsHolliday"]),
+    ("start_of_year", ["Day", "Month"], ["start_of_year"]),
+    ("end_of_year", ["Day", "Month"], ["end_of_year"]),
+]
+
+CALENDAR_BUILDERS = {
+    "paycheck": add_paycheck_feature,
+    "Ramadan": add_ramadan,
+    "school": add_school,
+    "weekend": add_weekend,
+    "IsHolliday": add_isholiday,
+    "start_of_year": add_start_of_year,
+    "end_of_year": add_end_of_year,
+}
+
+# Inputs of the to_add features that are not built from a recipe
+SPECIAL_FEATURE_INPUTS = {
+    "campaign": ["Date"],
+    "campaign_coef": ["Date"],
+    "summerdays": ["Month"],
+    "IsBeforeHolliday": ["IsHolliday"],
+}
+
+
+def dummies_placeholder(key):
+    """Stands for the one-hot columns of key, which depend on the data, in a plan's columns."""
+    return f"dummies:{key}"
+
+
+class _Trace:
+    """
+    Column names of the frame as the pipeline changes it, with the step that
+    last wrote each column and the steps every step read from.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.writer = {}
+        self.steps = []
+        self.reads = []
+
+    def write(self, step, inputs, outputs, move=False):
+        """Record a step; move mimics _insert_block, which re-appends existing columns."""
+        self.reads.append({self.writer[name] for name in inputs if name in self.writer})
+        index = len(self.steps)
+        self.steps.append(step)
+        for name in outputs:
+            if move and name in self.columns:
+                self.columns.remove(name)
+            if name not in self.columns:
+                self.columns.append(name)
+            self.writer[name] = index
+
+    def drop(self, name):
+        if name in self.columns:
+            self.columns.remove(name)
+            self.writer.pop(name, None)
+
+
+def compile_feature_plan(level4,
+                         features_to_keep,
+                         sin_features,
+                         features_to_dummies,
+                         MA_variations,
+                         T_variations,
+                         feature_rules,
+                         features_recipe):
+    """
+    Resolve the feature rules of a level4 into the steps that build its final columns.
+    Returns:
+        plan (dict): steps (list of [kind, *args], in pipeline order) and columns (final column order)
+    """
+    rules = feature_rules.get(level4)
+    trace = _Trace([list(f.keys())[0] for f in features_to_keep])
+
+    for feature in MA_variations:
+        for name, window in feature.items():
+            trace.write(["ma", name, window], ["WeightQTY"], [name], move=True)
+    for feature in select_lag_variations(T_variations, level4, feature_rules):
+        for name, lag in feature.items():
+            trace.write(["lag", name, lag], ["WeightQTY"], [name], move=True)
+    trace.write(["Ratio"], ["MA-7", "MA-60"], ["Ratio"])
+    for step, inputs, outputs in CALENDAR_STEPS:
+        trace.write([step], inputs, outputs)
+
+    if rules is not None and len(rules["week_day_indicator"]) == 7:
+        for i, flag in enumerate(rules["week_day_indicator"]):
+            if flag == 1:
+                trace.write(["week_day", i + 1], ["WeekDays"], [f"WeekDays_{i + 1}"])
+
+    for feature in sin_features:
+        for col, period in feature.items():
+            trace.write(["sine", col, period], [col], [f"{col}Sin", f"{col}Cos"])
+
+    if rules is not None:
+        for name in rules["to_add"]:
+            if name in SPECIAL_FEATURE_INPUTS:
+                trace.write(["custom", name], SPECIAL_FEATURE_INPUTS[name], [name])
+            elif name not in trace.columns:
+                a, b = features_recipe[name]["a"], features_recipe[name]["b"]
+                if a in trace.columns and b in trace.columns:
+                    trace.write(["recipe", name, a, b], [a, b], [name])
+        for name in rules["to_remove"]:
+            trace.drop(name)
+        for i, flag in enumerate(rules["ma"]):
+            if flag == 0:
+                trace.drop(MA_RULE_FEATURES[i])
+
+    for feature in features_to_dummies:
+        for key in feature.keys():
+            if key in trace.columns:
+                trace.write(["dummies", key], [key], [dummies_placeholder(key)])
+                trace.drop(key)
+
+    for feature in sin_features:
+        for col in feature.keys():
+            trace.drop(col)
+
+    # Keep the writers of the final columns and, transitively, the steps they read
+    needed = {trace.writer[name] for name in trace.columns if name in trace.writer}
+    pending = list(needed)
+    while pending:
+        for index in trace.reads[pending.pop()]:
+            if index not in needed:
+                needed.add(index)
+                pending.append(index)
+
+    return {"steps": [trace.steps[index] for index in sorted(needed)],
+            "columns": trace.columns}
+
+
+def run_feature_plan(data, plan, features_recipe):
+    """
+    Build the plan's features on data (train and forecast rows, with the kept
+    input columns) and return the final columns in plan order.
+    """
+    WeightQTY = data["WeightQTY"]
+    ma = [step for step in plan["steps"] if step[0] == "ma"]
+    if ma:
+        data = _insert_block(data, rolling_ma_block(WeightQTY, [step[2] for step in ma]), [step[1] for step in ma])
+    lags = [step for step in plan["steps"] if step[0] == "lag"]
+    if lags:
+        data = _insert_block(data, lag_block(WeightQTY, [step[2] for step in lags]), [step[1] for step in lags])
+
+    dummies = {}
+    for step in plan["steps"]:
+        kind = step[0]
+        if kind in ("ma", "lag"):
+            continue
+        elif kind == "Ratio":
+            data["Ratio"] = data["MA-7"] / data["MA-60"]
+        elif kind in CALENDAR_BUILDERS:
+            data = CALENDAR_BUILDERS[kind](data)
+        elif kind == "week_day":
+            data = add_week_day_column(data, step[1])
+        elif kind == "sine":
+            data = add_sine_feature(data, step[1], step[2])
+        elif kind == "custom":
+            data = add_custom_feature(data, step[1], features_recipe)
+        elif kind == "recipe":
+            data = add_recipe_feature(data, step[1], step[2], step[3])
+        elif kind == "dummies":
+            before = set(data.columns)
+            data = add_dummy_feature(data, step[1])
+            dummies[dummies_placeholder(step[1])] = [name for name in data.columns if name not in before]
+        else:
+            raise ValueError(f"unknown feature plan step {step}")
+
+    columns = []
+    for name in plan["columns"]:
+        columns.extend(dummies.get(name, [name]))
+    return data[columns]
+
+
+def _plans_digest(preprocessing_cfg, feature_rules, features_recipe):
+    payload = json.dumps([PLAN_VERSION,
+                          {key: preprocessing_cfg[key] for key in ["features_to_keep", "sin_features",
+                                                                  "features_to_dummies", "MA_variations",
+                                                                  "T_variations"]},
+                          feature_rules,
+                          features_recipe], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def compile_feature_plans(preprocessing_cfg, feature_rules, features_recipe):
+    """
+    Plans of every level4 in feature_rules, plus DEFAULT_PLAN. A level4 whose
+    rules do not compile is left out; Preprocessing compiles it again and fails
+    on it alone.
+    """
+    plans = {}
+    for level4 in list(feature_rules) + [DEFAULT_PLAN]:
+        try:
+            plans[level4] = compile_feature_plan(level4,
+                                                 preprocessing_cfg["features_to_keep"],
+                                                 preprocessing_cfg["sin_features"],
+                                                 preprocessing_cfg["features_to_dummies"],
+                                                 preprocessing_cfg["MA_variations"],
+                                                 preprocessing_cfg["T_variations"],
+                                                 feature_rules if level4 != DEFAULT_PLAN else {},
+                                                 features_recipe)
+        except Exception as e:
+            logger.warning(f"Feature plans: rules of level4 {level4} do not compile: {e!r}")
+    return plans
+
+
+def load_feature_plans(rules_path, preprocessing_cfg, feature_rules, features_recipe):
+    """
+    Compiled plans of the rules, read from <rules>.plans.json next to the rules
+    file when it was compiled from the same rules, recipe and preprocessing
+    config, and (re)written otherwise.
+    """
+    rules_path = Path(rules_path)
+    cache_path = rules_path.with_suffix(".plans.json")
+    key = _plans_digest(preprocessing_cfg, feature_rules, features_recipe)
+    try:
+        cached = json.loads(cache_path.read_text())
+        if cached.get("digest") == key:
+            return cached["plans"]
+    except (OSError, ValueError):
+        pass
+
+    plans = compile_feature_plans(preprocessing_cfg, feature_rules, features_recipe)
+    try:
+        tmp_path = cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"digest": key, "plans": plans}))
+        tmp_path.replace(cache_path)
+    except OSError as e:
+        logger.warning(f"Feature plans: could not write {cache_path}: {e}")
+    logger.info(f"Feature plans: compiled {len(plans)} plans from {rules_path}")
+    return plans
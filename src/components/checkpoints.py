@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import inspect
+import importlib
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src import logger
+
+
+# Pipeline stages that can be checkpointed, in order, with the modules their output depends on
+STAGE_MODULES = {
+    "fetch": ["src.components.data_fetching",
+              "src.components.fetching.read_sql",
+              "src.components.fetching.features",
+              "src.components.fetching.sources",
+              "src.components.fetching.cache",
+              "src.components.dtypes"],
+    "sarima": ["src.components.MA_Sarima",
+               "src.components.weekly_engines"],
+    "preprocess": ["src.components.preprocessing",
+                   "src.components.Preprocess.features",
+                   "src.components.Preprocess.plans",
+                   "src.components.Preprocess.columnar",
+                   "src.components.dtypes"],
+    "train": ["src.components.model_trainer",
+              "src.components.training.search",
+              "src.components.training.params_store",
+              "src.components.training.global_model"],
+}
+STAGES = list(STAGE_MODULES)
+
+
+def _update(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(json.dumps([[str(c) for c in obj.columns], [str(d) for d in obj.dtypes]]).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(f"{obj.name}:{obj.dtype}".encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype}{obj.shape}".encode("utf-8"))
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for k in sorted(obj, key=str):
+            _update(h, str(k))
+            _update(h, obj[k])
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for item in obj:
+            _update(h, item)
+        h.update(b"]")
+    else:
+        h.update(json.dumps(obj, sort_keys=True, default=str).encode("utf-8"))
+
+
+def digest(*objs):
+    """
+    Content hash of frames, arrays, config values and nested dicts/lists of them.
+    Equal content gives the same digest in every process and run.
+    """
+    h = hashlib.sha1()
+    _update(h, objs)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version(stage):
+    """Hash of the source files of the stage's modules, so editing a stage invalidates its checkpoints."""
+    h = hashlib.sha1()
+    for name in STAGE_MODULES[stage]:
+        h.update(Path(inspect.getsourcefile(importlib.import_module(name))).read_bytes())
+    return h.hexdigest()[:16]
+
+
+class CheckpointStore:
+    """
+    Content-addressed store of stage outputs: <root>/<stage>/<level4>-<key>.pkl,
+    where key is the digest of everything the stage output depends on: the
+    key_parts given by the caller (input frames, config, feature rules) and the
+    code version of the stage. A rerun with the same inputs loads the output
+    instead of computing it.
+    """
+
+    def __init__(self, root=None, stages=None):
+        self.root = Path(root) if root is not None else None
+        self.stages = set(STAGES if stages is None else stages)
+
+    def enabled(self, stage):
+        return self.root is not None and stage in self.stages
+
+    def path(self, stage, level4, key):
+        return self.root / stage / f"{level4}-{key[:24]}.pkl"
+
+    def run(self, stage, level4, key_parts, compute):
+        """Return compute() for the stage, from the store when it holds an output for key_parts."""
+        if not self.enabled(stage):
+            return compute()
+
+        path = self.path(stage, level4, digest(stage, code_version(stage), key_parts))
+        if path.exists():
+            with open(path, "rb") as openfile:
+                output = pickle.load(openfile)
+            # Keep checkpoints in use out of prune
+            os.utime(path)
+            logger.info(f"Checkpoint {stage} {level4}: loaded {path.name}")
+            return output
+
+        output = compute()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as openfile:
+            pickle.dump(output, openfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return output
+
+    def prune(self, max_age_days):
+        """Delete checkpoints not written for max_age_days."""
+        if self.root is None or max_age_days is None or not self.root.exists():
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for path in self.root.glob("*/*.pkl"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        return removed
@@ -1,8 +1,9 @@
-import urllib
-import pyodbc
 import pandas as pd
+from src.components.fetching.sources import MSSQLDataSource
 from src.components.fetching.read_sql import read_sql_data
+from src.components.fetching.cache import CACHE_LOOKBACK_DAYS
 from src.components.fetching.features import add_features
+from src.components.dtypes import compact_fetched
 
 
 class DataFetching:
@@ -13,45 +14,49 @@ class DataFetching:
                  database_name, 
                  start_forecast,
                  end_forecast,
-                 level4
+                 level4,
+                 data=None,
+                 cache_dir="data_cache",
+                 full_reload=False,
+                 lookback_days=CACHE_LOOKBACK_DAYS,
+                 source=None
                  ):
         
         self.server_name = server_name
         self.database_name = database_name
-        self.connection_string = self._build_connection_string()
+        self.source = source if source is not None else self._build_source()
         self.start_forecast = start_forecast
         self.end_forecast = end_forecast
         self.level4 = level4
+        self.data = data
+        self.cache_dir = cache_dir
+        self.full_reload = full_reload
+        self.lookback_days = lookback_days
 
-    def _build_connection_string(self):
+    def _build_source(self):
         """
-        Docstring for _build_connection_string
+        Docstring for _build_source
 
-        This method, builds connection strings to used to connect to database
+        This method, builds the default data source: the SQL Server database
+        given by server_name and database_name.
         """
-      
-     
-        drivers = [d for d in pyodbc.drivers() if "SQL Server" in d]
-        driver = drivers[-1]
 
-        odbc_str = (
-            f"DRIVER={driver};"
-            f"SERVER={self.server_name};"
-            f"DATABASE={self.database_name};"
-            f"Trusted_Connection=yes;"
-        )
-
-
-        return f"mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(odbc_str)}"
+        return MSSQLDataSource(self.server_name, self.database_name)
 
     def run(self):
 
-        # Read the data from database
-        train_data, forecast_data, val_query = read_sql_data(self.connection_string,
-                                                             self.level4,
-                                                             self.start_forecast,
-                                                             self.end_forecast
-                                                             )
+        # Read the data from database, unless it was prefetched in bulk
+        if self.data is not None:
+            train_data, forecast_data, val_query = self.data
+        else:
+            train_data, forecast_data, val_query = read_sql_data(self.source,
+                                                                 self.level4,
+                                                                 self.start_forecast,
+                                                                 self.end_forecast,
+                                                                 self.cache_dir,
+                                                                 self.full_reload,
+                                                                 self.lookback_days
+                                                                 )
         
         train_data, forecast_data = add_features(train_data, 
                                              forecast_data
@@ -66,7 +71,7 @@ class DataFetching:
         forecast_date = forecast_data[["Date", "Year"]]
 
         # Create the dictionaries of train and forecast data
-        train_dict[self.level4] = train_data
-        forecast_dict[self.level4] = forecast_data
+        train_dict[self.level4] = compact_fetched(train_data)
+        forecast_dict[self.level4] = compact_fetched(forecast_data)
 
         return train_dict, forecast_dict, forecast_date
\ No newline at end of file
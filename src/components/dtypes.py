@@ -0,0 +1,151 @@
+"""
+Dtype policy of the pipeline frames.
+
+Indicators and calendar codes are stored as int8 (int16 for the year), date
+keys as int32 and continuous features as float32, instead of the int64/float64
+pandas defaults. The target, the actuals and the forecasts compared with them
+stay float64. Features are computed on 64-bit copies of their inputs, so int8
+products cannot overflow, and only the stored columns are narrowed. Since the
+feature matrices are float32 (or small ints), LightGBM gets float32 arrays
+without a conversion.
+"""
+import numpy as np
+
+
+# Columns that are never narrowed: the target and what it is compared or summed with
+FLOAT64_COLUMNS = {"WeightQTY", "target", "WeightQTY_Actual", "SarimaOutput", "Gross", "DiscountAmount"}
+
+# Declared dtypes of the fetched columns
+FETCH_DTYPES = {
+    "Date": "int32",
+    "YearMonth": "int32",
+    "WeekDays": "int8",
+    "Month": "int8",
+    "Day": "int8",
+    "MonthWeeks": "int8",
+    "Sol_WeekOfYear": "int8",
+    "Year": "int16",
+    "IsHolliday": "int8",
+    "Occastion_ID": "int16",
+    "Shock": "int8",
+    "pShock": "int8",
+    "Corona": "int8",
+    "Record": "int8",
+    "BeforeWeekend": "int8",
+    "AfterWeekend": "int8",
+    "LongWeekend": "int8",
+    "StartOfLongWeekend": "int8",
+    "LastWeekOfYear": "int8",
+    "NourozHolliday": "int8",
+    "NourozHolliday_Coef": "int8",
+    "QTY": "float32",
+    "Discount": "float32",
+    "Price": "float32",
+}
+
+INTEGER_DTYPES = [np.dtype(np.int8), np.dtype(np.int16), np.dtype(np.int32), np.dtype(np.int64)]
+CONTINUOUS_DTYPE = np.dtype(np.float32)
+
+
+def _is_numeric(values):
+    return isinstance(values.dtype, np.dtype) and values.dtype.kind in "biuf"
+
+
+def integer_fits(values, dtype):
+    """Whether values (a numeric array) convert to the integer dtype without a change."""
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        if not np.isfinite(values).all() or (values != np.floor(values)).any():
+            return False
+    if values.size == 0 or values.dtype.kind == "b":
+        return True
+    info = np.iinfo(dtype)
+    return values.min() >= info.min and values.max() <= info.max
+
+
+def smallest_integer(values):
+    """The smallest integer dtype holding values, None if they are not all integers."""
+    for dtype in INTEGER_DTYPES:
+        if integer_fits(values, dtype):
+            return dtype
+    return None
+
+
+def policy_dtype(name, values, declared=None):
+    """
+    The dtype of a feature column: its declared dtype when the values fit it,
+    otherwise the smallest integer dtype for integer columns and float32 for
+    the rest. FLOAT64_COLUMNS and non-numeric columns keep their dtype.
+    """
+    if name in FLOAT64_COLUMNS or not _is_numeric(values):
+        return values.dtype
+    if declared is not None:
+        declared = np.dtype(declared)
+        if declared.kind == "f" or integer_fits(values, declared):
+            return declared
+    if values.dtype.kind in "biu":
+        return smallest_integer(values) or values.dtype
+    return CONTINUOUS_DTYPE
+
+
+def compact_columns(columns, declared=None):
+    """Cast {name: array} to the policy dtypes, in place; declared maps names to their dtype."""
+    declared = declared or {}
+    for name, values in columns.items():
+        dtype = policy_dtype(name, values, declared.get(name))
+        if dtype != values.dtype:
+            columns[name] = values.astype(dtype)
+    return columns
+
+
+def compact_frame(df, declared=None):
+    """df with its feature columns cast to the policy dtypes (one copy of the changed columns)."""
+    declared = declared or {}
+    dtypes = {}
+    for name in df.columns:
+        values = df[name].to_numpy() if _is_numeric(df[name]) else df[name]
+        dtype = policy_dtype(name, values, declared.get(name))
+        if dtype != df[name].dtype:
+            dtypes[name] = dtype
+    return df.astype(dtypes) if dtypes else df
+
+
+def compact_fetched(df):
+    """
+    A fetched frame with the columns of FETCH_DTYPES cast to them, when the
+    values fit; integer columns that do not fit are left as they are.
+    """
+    dtypes = {}
+    for name, dtype in FETCH_DTYPES.items():
+        if name not in df.columns or df[name].dtype == dtype or not _is_numeric(df[name]):
+            continue
+        dtype = np.dtype(dtype)
+        if dtype.kind == "f" or integer_fits(df[name].to_numpy(), dtype):
+            dtypes[name] = dtype
+    return df.astype(dtypes) if dtypes else df
+
+
+def widen(values):
+    """64-bit copy of an integer or float array for computing features; other arrays as they are."""
+    if isinstance(values.dtype, np.dtype):
+        if values.dtype.kind in "iu" and values.dtype != np.int64:
+            return values.astype(np.int64)
+        if values.dtype.kind == "f" and values.dtype != np.float64:
+            return values.astype(np.float64)
+    return values
+
+
+def widen_frame(df):
+    """df with the integer and float columns widened to 64 bits, like widen."""
+    dtypes = {name: widen(df[name].to_numpy()[:0]).dtype for name in df.columns
+              if isinstance(df[name].dtype, np.dtype)}
+    dtypes = {name: dtype for name, dtype in dtypes.items() if dtype != df[name].dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+def feature_matrix(df):
+    """
+    The feature values of a frame in the dtype LightGBM converts the frame to
+    when it trains on it: float32 for compact frames, float64 otherwise.
+    """
+    return df.to_numpy(dtype=np.result_type(*[dtype.type for dtype in df.dtypes], np.float32))
@@ -0,0 +1,65 @@
+from pathlib import Path
+import pandas as pd
+from src.utils.utils import shift_persian_int
+
+
+# Days re-fetched before the last cached date, to pick up late corrections
+CACHE_LOOKBACK_DAYS = 7
+
+
+def _cache_path(cache_dir, level4):
+    return Path(cache_dir) / f"{level4}.parquet"
+
+
+def load_cached(cache_dir, level4):
+    """Return the cached training rows of a level4, or None when there is no cache."""
+    path = _cache_path(cache_dir, level4)
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+
+def save_cached(cache_dir, level4, df):
+    path = _cache_path(cache_dir, level4)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    df.to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+
+
+def refresh_since(cached, lookback_days=CACHE_LOOKBACK_DAYS):
+    """
+    Return the PersianInt date after which rows have to be fetched again:
+    the last cached date minus lookback_days. None means a full load.
+    """
+    if cached is None or len(cached) == 0:
+        return None
+    return int(shift_persian_int([cached["Date"].max()], -lookback_days)[0])
+
+
+def merge_cached(cached, fetched, since, start_forecast):
+    """
+    Replace the cached rows after since with the freshly fetched ones. Cached
+    columns take the dtypes of the fetched rows, so a cache written before the
+    read dtypes changed does not mix them.
+
+    Returns:
+        cache (DataFrame): the rows to store back
+        train_data (DataFrame): the rows up to start_forecast, sorted by Date
+    """
+    start = int(start_forecast.strftime("%Y%m%d"))
+    if cached is None or since is None:
+        cache = fetched
+    else:
+        cached = cached.astype({name: fetched[name].dtype for name in fetched.columns
+                                if name in cached.columns and cached[name].dtype != fetched[name].dtype})
+        # Rows after start_forecast only exist when re-running an earlier date; keep them
+        parts = [cached[cached["Date"] <= since],
+                 fetched,
+                 cached[cached["Date"] > max(since, start)]]
+        parts = [part for part in parts if len(part) > 0]
+        cache = pd.concat(parts, ignore_index=True) if parts else fetched
+
+    cache = cache.sort_values("Date").reset_index(drop=True)
+    train_data = cache[cache["Date"] <= start].reset_index(drop=True)
+    return cache, train_data
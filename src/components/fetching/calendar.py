@@ -0,0 +1,46 @@
+# Run-scoped calendar shared by every level4 of a batch run. The parent
+# process loads it once and hands it to each Pool worker through
+# set_calendar (as the Pool initializer), so workers skip the calendar
+# queries entirely.
+_CALENDAR = None
+
+
+def read_calendar_data(source,
+                       start_forecast,
+                       end_forecast):
+    """
+    Read the tables that are identical for every level4 from source (a
+    DataSource): the forecast calendar rows between start_forecast and
+    end_forecast, and the long weekend calendar.
+
+    Returns:
+        calendar (dict): keys "start_forecast", "end_forecast",
+        "forecast_data" and "long_weekend"
+    """
+
+    forecast_data = source.read_forecast_calendar(start_forecast, end_forecast).sort_values("Date")
+    long_weekend = source.read_long_weekend().astype(float)
+
+    return {"start_forecast": start_forecast.strftime('%Y%m%d'),
+            "end_forecast": end_forecast.strftime('%Y%m%d'),
+            "forecast_data": forecast_data,
+            "long_weekend": long_weekend}
+
+
+def set_calendar(calendar):
+    """Install the run-scoped calendar in this process (usable as a Pool initializer)."""
+    global _CALENDAR
+    _CALENDAR = calendar
+
+
+def get_calendar(start_forecast, end_forecast):
+    """
+    Return copies of the cached (forecast_data, long_weekend) frames, or None
+    when nothing is cached for this forecast window.
+    """
+    if _CALENDAR is None:
+        return None
+    if (_CALENDAR["start_forecast"] != start_forecast.strftime('%Y%m%d')
+            or _CALENDAR["end_forecast"] != end_forecast.strftime('%Y%m%d')):
+        return None
+    return _CALENDAR["forecast_data"].copy(), _CALENDAR["long_weekend"].copy()
@@ -0,0 +1,118 @@
+import os
+import time
+import urllib
+import pandas as pd
+from sqlalchemy import create_engine, event
+
+
+# Process-level connection state. Engines are keyed by process id as well as
+# connection string so a forked Pool worker never reuses its parent's sockets.
+_DRIVER = None
+_ENGINES = {}
+_POOL_SIZE = 2
+_MAX_OVERFLOW = 2
+_STATS = {"connect_time": 0.0, "query_time": 0.0, "queries": 0, "new_connections": 0}
+
+
+def resolve_driver():
+    """Return the newest installed SQL Server ODBC driver, resolved once per process."""
+    global _DRIVER
+    if _DRIVER is None:
+        import pyodbc
+        drivers = [d for d in pyodbc.drivers() if "SQL Server" in d]
+        _DRIVER = drivers[-1]
+    return _DRIVER
+
+
+def build_connection_string(server_name, database_name):
+    """
+    This method, builds connection strings to used to connect to database
+    """
+    odbc_str = (
+        f"DRIVER={resolve_driver()};"
+        f"SERVER={server_name};"
+        f"DATABASE={database_name};"
+        f"Trusted_Connection=yes;"
+    )
+
+    return f"mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(odbc_str)}"
+
+
+def configure_pool(pool_size=None, max_overflow=None):
+    """Set the pool size used for engines created from now on in this process."""
+    global _POOL_SIZE, _MAX_OVERFLOW
+    if pool_size is not None:
+        _POOL_SIZE = pool_size
+    if max_overflow is not None:
+        _MAX_OVERFLOW = max_overflow
+
+
+def get_engine(connection_string):
+    """Return this process's pooled engine for connection_string, creating it on first use."""
+    key = (os.getpid(), connection_string)
+    if key not in _ENGINES:
+        kwargs = {"pool_pre_ping": True}
+        if not connection_string.startswith("sqlite"):
+            kwargs.update(pool_size=_POOL_SIZE, max_overflow=_MAX_OVERFLOW)
+        if connection_string.startswith("mssql+pyodbc"):
+            # Send executemany parameters in one array per batch instead of a round trip per row
+            kwargs.update(fast_executemany=True)
+        engine = create_engine(connection_string, **kwargs)
+        event.listen(engine, "connect", _count_new_connection)
+        _ENGINES[key] = engine
+    return _ENGINES[key]
+
+
+def _count_new_connection(dbapi_connection, connection_record):
+    _STATS["new_connections"] += 1
+
+
+def _record(start, connected, finished):
+    _STATS["connect_time"] += connected - start
+    _STATS["query_time"] += finished - connected
+    _STATS["queries"] += 1
+
+
+def read_query(query, connection_string, **kwargs):
+    """
+    Run query on a connection borrowed from the process pool and record the
+    time spent acquiring the connection and running the query.
+    Results too large to read at once go through iter_query.
+    """
+    engine = get_engine(connection_string)
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        connected = time.perf_counter()
+        result = pd.read_sql_query(query, conn, **kwargs)
+        finished = time.perf_counter()
+
+    _record(start, connected, finished)
+    return result
+
+
+def iter_query(query, connection_string, chunksize, **kwargs):
+    """
+    Yield the result of query in frames of chunksize rows, fetched from a
+    server-side cursor while the connection stays borrowed; it goes back to
+    the pool once the last chunk is read (or the generator is closed).
+    """
+    engine = get_engine(connection_string)
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        connected = time.perf_counter()
+        try:
+            yield from pd.read_sql_query(query, conn, chunksize=chunksize, **kwargs)
+        finally:
+            _record(start, connected, time.perf_counter())
+
+
+def connection_stats(reset=False):
+    """Return the connect/query timings of this process, optionally resetting them."""
+    stats = dict(_STATS)
+    if reset:
+        for key in _STATS:
+            _STATS[key] = 0 if isinstance(_STATS[key], int) else 0.0
+    return stats
@@ -1,8 +1,9 @@
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
 
 
 def add_features(train_df, forecast_df):
+    from sklearn.preprocessing import MinMaxScaler
+
     for df in [train_df, forecast_df]:
         df["Shock"] = (df["YearMonth"] == 140102).astype(int)
         df["pShock"] = (df["YearMonth"] > 140102).astype(int)
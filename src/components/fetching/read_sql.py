@@ -1,116 +1,59 @@
 import pandas as pd
-from sqlalchemy import create_engine
+from src.components.fetching.calendar import read_calendar_data, get_calendar
+from src.components.fetching.cache import (CACHE_LOOKBACK_DAYS,
+                                           load_cached,
+                                           save_cached,
+                                           refresh_since,
+                                           merge_cached)
 
 
-def read_sql_data(connection_string: str, 
-                  level4: str,
-                  start_forecast,
-                  end_forecast):
-    
-    cnxn = create_engine(connection_string, pool_pre_ping=True, poolclass=None)
-
-    query = f"""
-        WITH cte AS (
-            SELECT D.ID, L.LocationID, L.DistrictID
-            FROM "Table" L
-            LEFT JOIN "Table" D ON L.LocationID = D.LocationID
-            where D.DepTypeSN = 2 and D.IsActive = 1
-        )
-        SELECT 
-            I.CodeLevel4 AS Level4_ID,
-            D.PersianInt AS Date,
-            D.PersianDayOfWeekInt AS WeekDays,
-            D.PersianMonthNo AS Month,
-            D.PersianDayInMonth AS Day,
-            D.PersianYearMonthInt AS YearMonth,
-            D.PersianWeekOfYearNo AS Sol_WeekOfYear,
-            D.PersianWeekOfMonthNo AS MonthWeeks,
-            D.PersianYearInt AS Year,
-            CAST(D.HasOKHoliday AS INT) AS IsHolliday,
-            D.Occastion_ID,
-            SUM(QTY) QTY,
-            SUM(Gross) Gross,
-            SUM(DiscountAmount) DiscountAmount,
-            SUM(WeightQTY) WeightQTY
-        FROM "Table" S
-        LEFT JOIN cte ON cte.ID = S.COM_Dim_InventLocationRef
-        LEFT JOIN "Table" I ON I.ID = S.Level4_ID
-        LEFT JOIN "Table" D ON D.DateKey = S.COM_Dim_DateRef
-		where  I.CodeLevel4 = '{level4}' and D.PersianInt <= {start_forecast.strftime('%Y%m%d')}
-        GROUP BY
-            I.CodeLevel4, D.PersianInt,
-            D.PersianDayOfWeekInt, D.PersianMonthNo,
-            D.PersianDayInMonth, D.PersianYearMonthInt,
-            D.PersianWeekOfYearNo, D.PersianWeekOfMonthNo,
-            D.PersianYearInt, D.HasOKHoliday, D.Occastion_ID
-		order by Level4_ID, Date
-    """
-
-    forecast_query = f"""
-        SELECT 
-            PersianInt AS Date,
-            PersianDayOfWeekInt AS WeekDays,
-            PersianMonthNo AS Month,
-            PersianWeekOfMonthNo AS MonthWeeks,
-            PersianDayInMonth AS Day,
-            PersianYearMonthInt AS YearMonth,
-            PersianWeekOfYearNo AS Sol_WeekOfYear,
-            PersianYearInt AS Year,
-            CAST(HasOKHoliday AS INT) AS IsHolliday,
-            Occastion_ID
-        "Table" 
-        WHERE PersianInt > {start_forecast.strftime('%Y%m%d')}
-          AND PersianInt <= {end_forecast.strftime('%Y%m%d')}
-        ORDER BY PersianInt
-    """
+# Explicit compact dtypes for the bulk panel; the target and money columns stay float64
+TRAIN_DTYPES = {
+    "Date": "int32",
+    "WeekDays": "int8",
+    "Month": "int8",
+    "Day": "int8",
+    "YearMonth": "int32",
+    "Sol_WeekOfYear": "int8",
+    "MonthWeeks": "int8",
+    "Year": "int16",
+    "IsHolliday": "int8",
+    "QTY": "float32",
+}
+VAL_DTYPES = {
+    "Date": "int32",
+    "WeightQTY_Actual": "float64",
+}
+EVENT_EFFECT_DTYPES = {
+    "PersianInt": "int32",
+    "Modified_Actual": "float64",
+}
 
-    val_query = f"""
-        WITH cte AS (
-            SELECT D.ID, L.LocationID, L.DistrictID
-            FROM "Table" L
-            LEFT JOIN "Table" D ON L.LocationID = D.LocationID
-            where D.DepTypeSN = 2 and D.IsActive = 1
-        )
-        SELECT 
-            I.CodeLevel4 AS Level4_ID,
-            D.PersianInt AS Date,
-            SUM(WeightQTY) WeightQTY_Actual
-        FROM "Table" S
-        LEFT JOIN cte ON cte.ID = S.COM_Dim_InventLocationRef
-        LEFT JOIN "Table" I ON I.ID = S.Level4_ID
-        LEFT JOIN "Table" D ON D.DateKey = S.COM_Dim_DateRef
-		where  I.CodeLevel4 = '{level4}' and D.PersianInt > {start_forecast.strftime('%Y%m%d')}
-        GROUP BY
-            I.CodeLevel4, D.PersianInt
-		order by Level4_ID, Date
-    """
 
-    long_weekend_calendar_query = f"""
-        SELECT *
-        FROM [Forecasting].[Long_Weekend_Calendar]
-        order by date
+def _read_calendar(source, start_forecast, end_forecast):
     """
-
-    event_effect_query = f"""
-        select 
-        Level4,
-        PersianInt,
-        Modified_Actual * 1000 AS Modified_Actual
-        from "Table"
-        where level4 = '{level4}'
+    The forecast calendar and long weekend tables are shared by every level4,
+    so use the run-scoped copy when the batch has loaded one.
     """
+    calendar = get_calendar(start_forecast, end_forecast)
+    if calendar is None:
+        calendar = read_calendar_data(source, start_forecast, end_forecast)
+        calendar = (calendar["forecast_data"], calendar["long_weekend"])
+    return calendar
 
-    # Create the dataframes of train and forecast sets
-    train_data = pd.read_sql_query(query, cnxn).sort_values("Date")
-    forecast_data = pd.read_sql_query(forecast_query, cnxn).sort_values("Date")
-    val_query = pd.read_sql_query(val_query, cnxn).sort_values("Date")
 
-    # Create the dataframe of longweekend
-    long_weekend = pd.read_sql_query(long_weekend_calendar_query, cnxn).astype(float)
+def _assemble_level4(level4,
+                     train_data,
+                     forecast_data,
+                     val_query,
+                     long_weekend,
+                     event_effect):
+    """
+    Join the calendar tables and apply the event effect corrections for one level4.
+    """
 
     train_data = pd.merge(train_data, long_weekend, on="Date", how="left")
     forecast_data = pd.merge(forecast_data, long_weekend, on="Date", how="left")
-    event_effect = pd.read_sql_query(event_effect_query, cnxn).sort_values(by="PersianInt")
 
     train_data["WeightQTY_Actual"] = train_data["WeightQTY"]
     if len(event_effect) > 0:
@@ -122,5 +65,137 @@ def read_sql_data(connection_string: str,
                                    .fillna(train_data["WeightQTY"])
                                    )
 
-
     return train_data, forecast_data, val_query
+
+
+def read_sql_data(source,
+                  level4: str,
+                  start_forecast,
+                  end_forecast,
+                  cache_dir=None,
+                  full_reload=False,
+                  lookback_days=CACHE_LOOKBACK_DAYS):
+    """
+    Read the train, forecast and validation frames of one level4 from source
+    (a DataSource).
+    With cache_dir, the training rows come from the local Parquet cache and only
+    the days after the last cached date (minus lookback_days) are queried;
+    full_reload ignores the cache and rebuilds it.
+    """
+
+    # Create the dataframes of train and forecast sets, with the dtypes of the bulk read
+    # so both paths write the same cache schema
+    if cache_dir is None:
+        train_data = source.read_train([level4], start_forecast, dtype=TRAIN_DTYPES).sort_values("Date")
+    else:
+        cached = None if full_reload else load_cached(cache_dir, level4)
+        since = refresh_since(cached, lookback_days)
+        fetched = source.read_train([level4], start_forecast, since, dtype=TRAIN_DTYPES)
+        cache, train_data = merge_cached(cached, fetched, since, start_forecast)
+        save_cached(cache_dir, level4, cache)
+    val_query = source.read_validation([level4], start_forecast, dtype=VAL_DTYPES).sort_values("Date")
+
+    forecast_data, long_weekend = _read_calendar(source, start_forecast, end_forecast)
+
+    event_effect = source.read_event_effect([level4], dtype=EVENT_EFFECT_DTYPES).sort_values(by="PersianInt")
+
+    return _assemble_level4(level4,
+                            train_data,
+                            forecast_data,
+                            val_query,
+                            long_weekend,
+                            event_effect
+                            )
+
+
+def _split_by_level4(df, column, sort_by):
+    return {level4: part.sort_values(by=sort_by).reset_index(drop=True)
+            for level4, part in df.groupby(column, sort=False)}
+
+
+def _read_train_panel_cached(source,
+                             level4_ids,
+                             start_forecast,
+                             cache_dir,
+                             full_reload,
+                             lookback_days):
+    cached = {} if full_reload else {level4: load_cached(cache_dir, level4) for level4 in level4_ids}
+    cached = {level4: df for level4, df in cached.items() if df is not None and len(df) > 0}
+    uncached_ids = [level4 for level4 in level4_ids if level4 not in cached]
+    since = min((refresh_since(df, lookback_days) for df in cached.values()), default=None)
+
+    fetched = []
+    if uncached_ids:
+        fetched.append(source.read_train(uncached_ids, start_forecast, dtype=TRAIN_DTYPES))
+    if cached:
+        fetched.append(source.read_train(list(cached), start_forecast, since, dtype=TRAIN_DTYPES))
+    fetched = pd.concat(fetched, ignore_index=True)
+    fetched_parts = _split_by_level4(fetched, "Level4_ID", "Date")
+
+    train_parts = []
+    for level4 in level4_ids:
+        new_rows = fetched_parts.get(level4, fetched.iloc[0:0])
+        cache, train_data = merge_cached(cached.get(level4),
+                                         new_rows,
+                                         since if level4 in cached else None,
+                                         start_forecast)
+        if len(cache) > 0:
+            save_cached(cache_dir, level4, cache)
+        train_parts.append(train_data)
+
+    return pd.concat(train_parts, ignore_index=True)
+
+
+def read_sql_data_bulk(source,
+                       level4_ids,
+                       start_forecast,
+                       end_forecast,
+                       cache_dir=None,
+                       full_reload=False,
+                       lookback_days=CACHE_LOOKBACK_DAYS):
+    """
+    Bulk version of read_sql_data: one set-based scan per table for all
+    level4_ids (chunked IN lists in the SQL sources), partitioned client-side.
+    With cache_dir, cached level4s are refreshed together from the earliest
+    date any of them needs, and level4s without a cache are loaded in full.
+
+    Returns:
+        data (dict): level4 -> (train_data, forecast_data, val_query), the same
+        tuple read_sql_data returns. Level4s without training rows are left out.
+    """
+
+    level4_ids = [str(level4) for level4 in level4_ids]
+    if not level4_ids:
+        return {}
+
+    if cache_dir is None:
+        train_panel = source.read_train(level4_ids, start_forecast, dtype=TRAIN_DTYPES)
+    else:
+        train_panel = _read_train_panel_cached(source,
+                                               level4_ids,
+                                               start_forecast,
+                                               cache_dir,
+                                               full_reload,
+                                               lookback_days)
+    val_panel = source.read_validation(level4_ids, start_forecast, dtype=VAL_DTYPES)
+    event_panel = source.read_event_effect(level4_ids, dtype=EVENT_EFFECT_DTYPES)
+
+    forecast_data, long_weekend = _read_calendar(source, start_forecast, end_forecast)
+
+    train_parts = _split_by_level4(train_panel, "Level4_ID", "Date")
+    val_parts = _split_by_level4(val_panel, "Level4_ID", "Date")
+    event_parts = _split_by_level4(event_panel, "Level4", "PersianInt")
+    empty_val = val_panel.iloc[0:0]
+    empty_event = event_panel.iloc[0:0]
+
+    data = {}
+    for level4, train_data in train_parts.items():
+        data[level4] = _assemble_level4(level4,
+                                        train_data,
+                                        forecast_data.copy(),
+                                        val_parts.get(level4, empty_val),
+                                        long_weekend,
+                                        event_parts.get(level4, empty_event)
+                                        )
+
+    return data
@@ -0,0 +1,335 @@
+from abc import ABC, abstractmethod
+import pandas as pd
+from src.components.fetching.connection import build_connection_string, read_query, iter_query
+
+
+# Level4 IDs per IN (...) list
+BULK_IN_CHUNK = 500
+
+# Rows per streamed chunk
+BULK_READ_CHUNKSIZE = 200_000
+
+
+class DataSource(ABC):
+    """
+    Interface of the fetch layer.
+
+    Every method returns a DataFrame with the columns the rest of the pipeline
+    expects, whatever the backend. level4_ids is a list of CodeLevel4 strings.
+    """
+
+    @abstractmethod
+    def read_level4_ids(self):
+        """Distinct CodeLevel4 values."""
+
+    @abstractmethod
+    def read_train(self, level4_ids, start_forecast, since=None, dtype=None):
+        """Daily sales and calendar columns up to start_forecast (after since, if given)."""
+
+    @abstractmethod
+    def read_validation(self, level4_ids, start_forecast, dtype=None):
+        """Daily WeightQTY_Actual after start_forecast."""
+
+    @abstractmethod
+    def read_event_effect(self, level4_ids, dtype=None):
+        """Modified_Actual corrections per Level4 and PersianInt."""
+
+    @abstractmethod
+    def read_forecast_calendar(self, start_forecast, end_forecast):
+        """Calendar columns of the days in (start_forecast, end_forecast]."""
+
+    @abstractmethod
+    def read_long_weekend(self):
+        """The long weekend calendar, one row per Date."""
+
+
+class SQLDataSource(DataSource):
+    """
+    DataSource backed by a SQL database reachable through read_query.
+    Subclasses provide connection_string and the query builders; level4
+    filters are passed to the builders as an "IN (...)" clause.
+    """
+
+    connection_string = None
+
+    @abstractmethod
+    def _level4_ids_query(self):
+        pass
+
+    @abstractmethod
+    def _train_query(self, level4_filter, start_forecast, since=None):
+        pass
+
+    @abstractmethod
+    def _val_query(self, level4_filter, start_forecast):
+        pass
+
+    @abstractmethod
+    def _event_effect_query(self, level4_filter):
+        pass
+
+    @abstractmethod
+    def _forecast_calendar_query(self, start_forecast, end_forecast):
+        pass
+
+    @abstractmethod
+    def _long_weekend_query(self):
+        pass
+
+    def _read_chunked_in(self, build_query, level4_ids, dtype=None, chunk=BULK_IN_CHUNK):
+        """
+        Run build_query once per chunk of level4_ids, streaming each result
+        with chunksize, and return the concatenated frame.
+        """
+        frames = []
+        for i in range(0, len(level4_ids), chunk):
+            ids = ", ".join(f"'{level4}'" for level4 in level4_ids[i:i + chunk])
+            frames.extend(iter_query(build_query(f"IN ({ids})"),
+                                     self.connection_string,
+                                     BULK_READ_CHUNKSIZE,
+                                     dtype=dtype))
+
+        if not frames:
+            return pd.DataFrame(columns=list(dtype or {}))
+        return pd.concat(frames, ignore_index=True)
+
+    def read_level4_ids(self):
+        return read_query(self._level4_ids_query(), self.connection_string)["CodeLevel4"].tolist()
+
+    def read_train(self, level4_ids, start_forecast, since=None, dtype=None):
+        return self._read_chunked_in(lambda f: self._train_query(f, start_forecast, since),
+                                     level4_ids,
+                                     dtype)
+
+    def read_validation(self, level4_ids, start_forecast, dtype=None):
+        return self._read_chunked_in(lambda f: self._val_query(f, start_forecast),
+                                     level4_ids,
+                                     dtype)
+
+    def read_event_effect(self, level4_ids, dtype=None):
+        return self._read_chunked_in(self._event_effect_query, level4_ids, dtype)
+
+    def read_forecast_calendar(self, start_forecast, end_forecast):
+        return read_query(self._forecast_calendar_query(start_forecast, end_forecast),
+                          self.connection_string)
+
+    def read_long_weekend(self):
+        return read_query(self._long_weekend_query(), self.connection_string)
+
+
+class MSSQLDataSource(SQLDataSource):
+    """The production SQL Server warehouse, through pyodbc and a Trusted_Connection."""
+
+    def __init__(self, server_name, database_name):
+        self.server_name = server_name
+        self.database_name = database_name
+        self._connection_string = None
+
+    @property
+    def connection_string(self):
+        # Built on first use so creating the source does not need pyodbc
+        if self._connection_string is None:
+            self._connection_string = build_connection_string(self.server_name, self.database_name)
+        return self._connection_string
+
+    def _level4_ids_query(self):
+
+        return """
+        SELECT distinct CodeLevel4
+        FROM "Table"
+    """
+
+    def _train_query(self, level4_filter, start_forecast, since=None):
+
+        since_filter = f"and D.PersianInt > {since}" if since is not None else ""
+
+        return f"""
+        WITH cte AS (
+            SELECT D.ID, L.LocationID, L.DistrictID
+            FROM "Table" L
+            LEFT JOIN "Table" D ON L.LocationID = D.LocationID
+            where D.DepTypeSN = 2 and D.IsActive = 1
+        )
+        SELECT
+            I.CodeLevel4 AS Level4_ID,
+            D.PersianInt AS Date,
+            D.PersianDayOfWeekInt AS WeekDays,
+            D.PersianMonthNo AS Month,
+            D.PersianDayInMonth AS Day,
+            D.PersianYearMonthInt AS YearMonth,
+            D.PersianWeekOfYearNo AS Sol_WeekOfYear,
+            D.PersianWeekOfMonthNo AS MonthWeeks,
+            D.PersianYearInt AS Year,
+            CAST(D.HasOKHoliday AS INT) AS IsHolliday,
+            D.Occastion_ID,
+            SUM(QTY) QTY,
+            SUM(Gross) Gross,
+            SUM(DiscountAmount) DiscountAmount,
+            SUM(WeightQTY) WeightQTY
+        FROM "Table" S
+        LEFT JOIN cte ON cte.ID = S.COM_Dim_InventLocationRef
+        LEFT JOIN "Table" I ON I.ID = S.Level4_ID
+        LEFT JOIN "Table" D ON D.DateKey = S.COM_Dim_DateRef
+		where  I.CodeLevel4 {level4_filter} and D.PersianInt <= {start_forecast.strftime('%Y%m%d')} {since_filter}
+        GROUP BY
+            I.CodeLevel4, D.PersianInt,
+            D.PersianDayOfWeekInt, D.PersianMonthNo,
+            D.PersianDayInMonth, D.PersianYearMonthInt,
+            D.PersianWeekOfYearNo, D.PersianWeekOfMonthNo,
+            D.PersianYearInt, D.HasOKHoliday, D.Occastion_ID
+		order by Level4_ID, Date
+    """
+
+    def _val_query(self, level4_filter, start_forecast):
+
+        return f"""
+        WITH cte AS (
+            SELECT D.ID, L.LocationID, L.DistrictID
+            FROM "Table" L
+            LEFT JOIN "Table" D ON L.LocationID = D.LocationID
+            where D.DepTypeSN = 2 and D.IsActive = 1
+        )
+        SELECT
+            I.CodeLevel4 AS Level4_ID,
+            D.PersianInt AS Date,
+            SUM(WeightQTY) WeightQTY_Actual
+        FROM "Table" S
+        LEFT JOIN cte ON cte.ID = S.COM_Dim_InventLocationRef
+        LEFT JOIN "Table" I ON I.ID = S.Level4_ID
+        LEFT JOIN "Table" D ON D.DateKey = S.COM_Dim_DateRef
+		where  I.CodeLevel4 {level4_filter} and D.PersianInt > {start_forecast.strftime('%Y%m%d')}
+        GROUP BY
+            I.CodeLevel4, D.PersianInt
+		order by Level4_ID, Date
+    """
+
+    def _event_effect_query(self, level4_filter):
+
+        return f"""
+        select
+        Level4,
+        PersianInt,
+        Modified_Actual * 1000 AS Modified_Actual
+        from "Table"
+        where level4 {level4_filter}
+    """
+
+    def _forecast_calendar_query(self, start_forecast, end_forecast):
+
+        return f"""
+        SELECT
+            PersianInt AS Date,
+            PersianDayOfWeekInt AS WeekDays,
+            PersianMonthNo AS Month,
+            PersianWeekOfMonthNo AS MonthWeeks,
+            PersianDayInMonth AS Day,
+            PersianYearMonthInt AS YearMonth,
+            PersianWeekOfYearNo AS Sol_WeekOfYear,
+            PersianYearInt AS Year,
+            CAST(HasOKHoliday AS INT) AS IsHolliday,
+            Occastion_ID
+        "Table"
+        WHERE PersianInt > {start_forecast.strftime('%Y%m%d')}
+          AND PersianInt <= {end_forecast.strftime('%Y%m%d')}
+        ORDER BY PersianInt
+    """
+
+    def _long_weekend_query(self):
+
+        return """
+        SELECT *
+        FROM [Forecasting].[Long_Weekend_Calendar]
+        order by date
+    """
+
+
+class LocalDataSource(SQLDataSource):
+    """
+    Offline stand-in for the warehouse: a SQLite file with the tables
+    sales, calendar, long_weekend and event_effect, as written by
+    src.components.fetching.synthetic. It serves the same frames as
+    MSSQLDataSource, so the whole pipeline runs without the database.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.connection_string = f"sqlite:///{self.path}"
+
+    def _level4_ids_query(self):
+
+        return """
+        SELECT DISTINCT Level4_ID AS CodeLevel4
+        FROM sales
+        ORDER BY Level4_ID
+    """
+
+    def _train_query(self, level4_filter, start_forecast, since=None):
+
+        since_filter = f"AND C.Date > {since}" if since is not None else ""
+
+        return f"""
+        SELECT
+            S.Level4_ID, C.Date, C.WeekDays, C.Month, C.Day, C.YearMonth,
+            C.Sol_WeekOfYear, C.MonthWeeks, C.Year, C.IsHolliday, C.Occastion_ID,
+            SUM(S.QTY) QTY,
+            SUM(S.Gross) Gross,
+            SUM(S.DiscountAmount) DiscountAmount,
+            SUM(S.WeightQTY) WeightQTY
+        FROM sales S
+        JOIN calendar C ON C.Date = S.Date
+        WHERE S.Level4_ID {level4_filter} AND C.Date <= {start_forecast.strftime('%Y%m%d')} {since_filter}
+        GROUP BY
+            S.Level4_ID, C.Date, C.WeekDays, C.Month, C.Day, C.YearMonth,
+            C.Sol_WeekOfYear, C.MonthWeeks, C.Year, C.IsHolliday, C.Occastion_ID
+        ORDER BY S.Level4_ID, C.Date
+    """
+
+    def _val_query(self, level4_filter, start_forecast):
+
+        return f"""
+        SELECT Level4_ID, Date, SUM(WeightQTY) WeightQTY_Actual
+        FROM sales
+        WHERE Level4_ID {level4_filter} AND Date > {start_forecast.strftime('%Y%m%d')}
+        GROUP BY Level4_ID, Date
+        ORDER BY Level4_ID, Date
+    """
+
+    def _event_effect_query(self, level4_filter):
+
+        return f"""
+        SELECT Level4, PersianInt, Modified_Actual * 1000 AS Modified_Actual
+        FROM event_effect
+        WHERE Level4 {level4_filter}
+    """
+
+    def _forecast_calendar_query(self, start_forecast, end_forecast):
+
+        return f"""
+        SELECT Date, WeekDays, Month, MonthWeeks, Day, YearMonth,
+               Sol_WeekOfYear, Year, IsHolliday, Occastion_ID
+        FROM calendar
+        WHERE Date > {start_forecast.strftime('%Y%m%d')}
+          AND Date <= {end_forecast.strftime('%Y%m%d')}
+        ORDER BY Date
+    """
+
+    def _long_weekend_query(self):
+
+        return """
+        SELECT *
+        FROM long_weekend
+        ORDER BY Date
+    """
+
+
+def data_source_from_config(config):
+    """
+    Build the data source described by the data_fetching section of config.yaml:
+    source "mssql" (default) or "local" with local_path.
+    """
+    source = config.get("source", "mssql")
+    if source == "local":
+        return LocalDataSource(config["local_path"])
+    if source == "mssql":
+        return MSSQLDataSource(config["server_name"], config["database_name"])
+    raise ValueError(f"Unknown data source: {source}")
@@ -0,0 +1,146 @@
+"""
+Synthetic data for the local SQLite data source.
+
+Writes the tables LocalDataSource reads (sales, calendar, long_weekend and
+event_effect) with plausible weekly and yearly seasonality, so main.py and
+batch_processing.py can run offline for profiling and regression runs.
+
+    python -m src.components.fetching.synthetic data/local_source.db --count 20
+"""
+import argparse
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import jdatetime as jdt
+from sqlalchemy import text
+from src.components.fetching.connection import get_engine
+from src.components.fetching.sources import LocalDataSource
+from src.utils.utils import jalali_calendar_index, calendar_positions
+
+
+def build_calendar(start_date, end_date):
+    """One row per Jalali day in [start_date, end_date], with the warehouse calendar columns."""
+    index = jalali_calendar_index()
+    first, last = calendar_positions([int(start_date.strftime("%Y%m%d")),
+                                      int(end_date.strftime("%Y%m%d"))])
+    days = slice(first, last + 1)
+
+    calendar = pd.DataFrame({"Date": index["key"][days],
+                             "WeekDays": index["weekday"][days].astype(int),
+                             "Month": index["month"][days].astype(int),
+                             "MonthWeeks": (index["day"][days].astype(int) - 1) // 7 + 1,
+                             "Day": index["day"][days].astype(int),
+                             "YearMonth": index["key"][days] // 100,
+                             "Sol_WeekOfYear": index["week_of_year"][days].astype(int),
+                             "Year": index["year"][days].astype(int)})
+
+    nowruz = (calendar.Month == 1) & (calendar.Day <= 4)
+    calendar["IsHolliday"] = ((calendar.WeekDays == 6) | nowruz).astype(int)
+
+    # A 30-day Ramadan-like occasion that moves 11 days earlier every year
+    calendar["Occastion_ID"] = 0
+    for year in calendar.Year.unique():
+        first = (9 * 31 - 11 * (year - 1400)) % 365
+        in_year = calendar.index[calendar.Year == year]
+        calendar.loc[in_year[first:first + 30], "Occastion_ID"] = 1
+    return calendar
+
+
+def build_long_weekend(calendar, rng):
+    long_weekend = pd.DataFrame({"Date": calendar.Date})
+    long_weekend["Record"] = (rng.random(len(calendar)) < 0.01).astype(int)
+    long_weekend["BeforeWeekend"] = (calendar.WeekDays == 5).astype(int)
+    long_weekend["AfterWeekend"] = (calendar.WeekDays == 0).astype(int)
+    long_weekend["LongWeekend"] = ((calendar.IsHolliday == 1) & (calendar.WeekDays != 6)).astype(int)
+    long_weekend["StartOfLongWeekend"] = (long_weekend.LongWeekend.diff() == 1).astype(int)
+    long_weekend["LastWeekOfYear"] = ((calendar.Month == 12) & (calendar.Day >= 23)).astype(int)
+    long_weekend["NourozHolliday"] = ((calendar.Month == 1) & (calendar.Day <= 13)).astype(int)
+    long_weekend["NourozHolliday_Coef"] = long_weekend.NourozHolliday * np.maximum(14 - calendar.Day, 0)
+    return long_weekend
+
+
+def build_sales(calendar, long_weekend, level4_ids, last_sales_date, rng):
+    days = calendar[calendar.Date <= last_sales_date].reset_index(drop=True)
+    weekday_profile = np.array([1.05, 1.0, 0.95, 0.95, 1.1, 1.25, 0.6])
+    t = np.arange(len(days))
+    frames = []
+    for level4 in level4_ids:
+        base = rng.lognormal(7, 1)
+        yearly = 1 + 0.25 * np.sin(2 * np.pi * (t / 365.25 + rng.random()))
+        trend = 1 + rng.normal(0, 0.0003) * t
+        nowruz = 1 - 0.5 * long_weekend.NourozHolliday.to_numpy()[:len(days)]
+        occasion = np.where(days.Occastion_ID == 1, rng.uniform(0.7, 1.4), 1.0)
+        mean = base * weekday_profile[days.WeekDays] * yearly * trend * nowruz * occasion
+        weight = rng.gamma(20, np.maximum(mean, 1e-3) / 20)
+
+        unit_weight = rng.uniform(0.2, 5)
+        price = rng.uniform(50, 500)
+        qty = np.round(weight / unit_weight)
+        gross = qty * price
+        frames.append(pd.DataFrame({"Level4_ID": level4,
+                                    "Date": days.Date,
+                                    "QTY": qty,
+                                    "Gross": gross,
+                                    "DiscountAmount": gross * rng.beta(1, 12, len(days)),
+                                    "WeightQTY": weight}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_event_effect(sales, rng, share=0.005):
+    events = sales.sample(frac=share, random_state=int(rng.integers(1 << 31)))
+    return pd.DataFrame({"Level4": events.Level4_ID,
+                         "PersianInt": events.Date,
+                         "Modified_Actual": events.WeightQTY * rng.uniform(0.6, 0.9, len(events)) / 1000})
+
+
+def write_local_source(path,
+                       level4_ids,
+                       start_date=jdt.date(1401, 1, 1),
+                       end_date=None,
+                       seed=0):
+    """
+    Fill the SQLite file at path with synthetic data for level4_ids.
+    Sales run until today; the calendar runs 120 days further to cover the forecast window.
+    """
+    rng = np.random.default_rng(seed)
+    today = jdt.date.today()
+    end_date = end_date or today + jdt.timedelta(days=120)
+
+    calendar = build_calendar(start_date, end_date)
+    long_weekend = build_long_weekend(calendar, rng)
+    sales = build_sales(calendar, long_weekend, level4_ids, int(today.strftime("%Y%m%d")), rng)
+    event_effect = build_event_effect(sales, rng)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    source = LocalDataSource(path)
+    engine = get_engine(source.connection_string)
+    for name, df in [("calendar", calendar),
+                     ("long_weekend", long_weekend),
+                     ("sales", sales),
+                     ("event_effect", event_effect)]:
+        df.to_sql(name, engine, if_exists="replace", index=False, chunksize=50_000)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sales ON sales (Level4_ID, Date)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_calendar ON calendar (Date)"))
+
+    return source
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic local data source")
+    parser.add_argument("path", nargs="?", default="data/local_source.db")
+    parser.add_argument("--count", type=int, default=20, help="number of Level4 IDs")
+    parser.add_argument("--start", type=int, default=14010101, help="first date (YYYYMMDD)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Use the Level4 IDs that have feature rules first, so the rules get exercised
+    with open("feature_rules.json", "r") as openfile:
+        level4_ids = list(json.load(openfile))[:args.count]
+    level4_ids += [f"9_9_9_{i}" for i in range(args.count - len(level4_ids))]
+
+    start = jdt.datetime.strptime(str(args.start), "%Y%m%d").date()
+    write_local_source(args.path, level4_ids, start, seed=args.seed)
+    print(f"Wrote {len(level4_ids)} Level4 IDs to {args.path}")
@@ -0,0 +1,93 @@
+import os
+import time
+import uuid
+from sqlalchemy import inspect, text
+from src import logger
+from src.components.fetching.connection import get_engine
+
+
+# Rows of the forecast table that a rerun of the same month replaces
+FORECAST_KEY_COLUMNS = ["Level4_ID", "Date", "TargetMonth"]
+
+
+def _chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def _load(df, table, conn, chunksize, stats):
+    """Insert df into table in chunks of chunksize rows, one executemany per chunk."""
+    for chunk in _chunks(df, chunksize):
+        start = time.perf_counter()
+        chunk.to_sql(table, conn, if_exists="append", index=False)
+        seconds = time.perf_counter() - start
+
+        stats["rows"] += len(chunk)
+        stats["batches"] += 1
+        stats["load_seconds"] += seconds
+        logger.info(f"Write {table}: batch {stats['batches']}, {stats['rows']}/{len(df)} rows, "
+                    f"{len(chunk) / max(seconds, 1e-9):,.0f} rows/s")
+
+
+def _merge(conn, quote, table, staging_table, columns, key_columns):
+    """Replace the rows of table that share a key with the staging table, then insert the staging rows."""
+    target, staging = quote(table), quote(staging_table)
+    column_list = ", ".join(quote(column) for column in columns)
+    matches = " AND ".join(f"{staging}.{quote(column)} = {target}.{quote(column)}" for column in key_columns)
+
+    # Without it every target row scans the whole staging table
+    conn.execute(text(f"CREATE INDEX {quote('ix_' + staging_table + '_key')} ON {staging} "
+                      f"({', '.join(quote(column) for column in key_columns)})"))
+    deleted = conn.execute(text(f"DELETE FROM {target} WHERE EXISTS "
+                                f"(SELECT 1 FROM {staging} WHERE {matches})")).rowcount
+    conn.execute(text(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging}"))
+    conn.execute(text(f"DROP TABLE {staging}"))
+    return deleted
+
+
+def run_staging_table(staging_table):
+    """The staging table of this write: staging_table with the process id and a random suffix,
+    so concurrent runs never load into the same table."""
+    return f"{staging_table}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+
+
+def write_frame(df, table, connection_string, chunksize=10000, staging_table=None, key_columns=None):
+    """
+    Bulk-write df to table. Rows go in chunks of chunksize through executemany
+    (fast_executemany on SQL Server, see get_engine), and every batch logs its
+    progress and throughput.
+
+    Without staging_table the rows are appended to table. With staging_table they
+    are loaded into a table of this write named after it (see run_staging_table)
+    first, and then, in one transaction, the rows of
+    table with the same key_columns are deleted and the staged rows inserted, so a
+    rerun replaces its earlier output instead of duplicating it.
+
+    Returns:
+        stats (dict): rows, batches, load_seconds, seconds, rows_per_second, replaced
+    """
+    engine = get_engine(connection_string)
+    stats = {"rows": 0, "batches": 0, "load_seconds": 0.0, "replaced": 0}
+    start = time.perf_counter()
+
+    if staging_table is None:
+        with engine.begin() as conn:
+            _load(df, table, conn, chunksize, stats)
+    else:
+        key_columns = FORECAST_KEY_COLUMNS if key_columns is None else key_columns
+        staging_table = run_staging_table(staging_table)
+        with engine.begin() as conn:
+            # The first run creates the target with the frame's column types
+            if not inspect(conn).has_table(table):
+                df.head(0).to_sql(table, conn, index=False)
+            df.head(0).to_sql(staging_table, conn, if_exists="replace", index=False)
+            _load(df, staging_table, conn, chunksize, stats)
+            stats["replaced"] = _merge(conn, engine.dialect.identifier_preparer.quote,
+                                       table, staging_table, list(df.columns), key_columns)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_second"] = stats["rows"] / max(stats["seconds"], 1e-9)
+    logger.info(f"Write {table}: {stats['rows']} rows in {stats['batches']} batches, "
+                f"{stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/s), "
+                f"{stats['replaced']} rows replaced")
+    return stats
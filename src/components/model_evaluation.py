@@ -1,6 +1,7 @@
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
+from src import OUTPUT_DIR
+from src.components.dtypes import feature_matrix
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -11,7 +12,9 @@ class ModelEvaluation:
                  train_data, 
                  forecast_data, 
                  feature_importances,
-                 days):
+                 days,
+                 output_mode="full",
+                 output_dir=OUTPUT_DIR):
 
         self.best_model = best_model
         self.best_params = best_params
@@ -19,37 +22,64 @@ class ModelEvaluation:
         self.forecast_data = forecast_data
         self.feature_importances = feature_importances
         self.days = days
+        self.output_mode = output_mode
+        self.output_dir = output_dir
 
     def run_evaluation(self):
         """
-        Evaluates the trained models on the forecast data and generates evaluation metrics and plots.
+        Evaluates the trained models on the forecast data and saves the forecast and
+        feature importances of every level4 as Parquet, unless the output mode is "none".
+        Plots are rendered afterwards from the saved forecasts (src.components.reporting).
+        Returns:
+            outputs (dict): level4 -> forecast frame (Forecast, WeightQTY, Date, SarimaOutput)
         """
-        for best_model in self.best_model.keys():
-            # Create output directory
-            os.makedirs(f"output/{best_model}", exist_ok=True)
-            
-            #Save feature importances
-            feat_imp = self.feature_importances[best_model]
-            feat_imp.to_excel(f"output/{best_model}/feature_importances.xlsx", index=False)
+        outputs = self.forecast_frames()
 
-            # Prepare data for evaluation
-            forecast_data_date = self.forecast_data[best_model]["Date"]
-            forecast_data = self.forecast_data[best_model].drop(columns=["Date"])
-            forecast_data = forecast_data.drop(columns=["WeightQTY_Actual"])
-            forecast_data = forecast_data.drop(columns=["SarimaOutput"])
+        if self.output_mode != "none":
+            for best_model, forecast_output in outputs.items():
+                self.save_outputs(best_model, forecast_output)
 
-            
-            # Generate forecasts
-            forecast = self.forecast_output(self.best_model[best_model], forecast_data)
+        return outputs
 
+    def forecast_frames(self):
+        """
+        Forecasts of all level4s, without writing any files.
+        Returns:
+            outputs (dict): level4 -> forecast frame (Forecast, WeightQTY, Date, SarimaOutput)
+        """
+        forecasts = self.forecast_global_models()
+        outputs = {}
+        for level4, model in self.best_model.items():
+            if level4 in forecasts:
+                forecast = forecasts[level4]
+            else:
+                forecast = self.forecast_output(model, self.model_inputs(level4))
+            outputs[level4] = self.output_frame(level4, self.forecast_data[level4]["Date"], forecast)
+        return outputs
+
+
+    def model_inputs(self, level4):
+        """The feature matrix of a level4's forecast rows."""
+        return self.forecast_data[level4].drop(columns=["Date", "WeightQTY_Actual", "SarimaOutput"])
+
+    def forecast_global_models(self):
+        """
+        Forecasts of the level4s whose model is a view of a global model, with one
+        predict call per global model.
+        Returns:
+            forecasts (dict): level4 -> forecast (ndarray)
+        """
+        groups = {}
+        for level4, model in self.best_model.items():
+            global_model = getattr(model, "global_model", None)
+            if global_model is not None:
+                groups.setdefault(id(global_model), (global_model, {}))[1][level4] = model.frame(self.model_inputs(level4))
+
+        forecasts = {}
+        for global_model, frames in groups.values():
+            forecasts.update(global_model.predict_panel(frames))
+        return forecasts
 
-            # plotting results
-            self.show_plots(best_model,
-                            forecast_data_date,
-                            forecast
-                            )
-            
-    
     # function to generate forecast
     def forecast_output(self, model, data):
         """
@@ -60,49 +90,24 @@ class ModelEvaluation:
             Returns:
                 forecast (ndarray): Forecasted values generated by the model.
         """
-        forecast = model.predict(data.values)
+        forecast = model.predict(feature_matrix(data))
         # AND WRITE TO DB
         return forecast
     
-    def show_plots(self,
-                   best_model,
-                   forecast_data_date,
-                   forecast
-                   ):
-        # extract the first and last date for plotting
-        first_date = forecast_data_date.iloc[0]
-        last_date = forecast_data_date.iloc[-1]
-        
-        # create the dataframe for output
+    def output_frame(self, best_model, forecast_data_date, forecast):
+        """The forecast of a level4 next to its actuals and the Sarima output."""
         forecast_output = pd.DataFrame(forecast, columns=["Forecast"])
-        forecast_output['Forecast'] = forecast_output['Forecast'].apply(lambda x: 0 if x < 0 else x)
+        forecast_output['Forecast'] = forecast_output['Forecast'].clip(lower=0)
         forecast_output["WeightQTY"] = self.forecast_data[best_model].WeightQTY_Actual
         forecast_output["Date"] = forecast_data_date
         forecast_output["SarimaOutput"] = self.forecast_data[best_model]["SarimaOutput"]
-        forecast_output.to_csv(f"output/{best_model}/forecast.csv")
-
-        # PLot the prediction 
-        plt.figure()
-        plt.plot(forecast, color = 'r', linewidth = 1, label='forecast')
-        plt.plot(self.forecast_data[best_model].WeightQTY_Actual.reset_index(drop=True), color = 'g', linewidth = 1, label='Actual')
-        plt.axvline(x = self.days -1 , color = 'b', linewidth = 0.3)
-        plt.xticks([0, len(forecast)], [first_date, last_date])
-        plt.title("Forecast")
-        plt.xlabel("Days")
-        plt.ylabel("W")
-        plt.legend()
-        plt.grid()
-        plt.savefig(f"output/{best_model}/Prediction.png")
-        plt.close()
+        return forecast_output
 
-        plt.figure()
-        plt.plot(self.forecast_data[best_model]["SarimaOutput"], color = 'r', linewidth = 1, label='Sarima')
-        plt.plot(forecast, color = 'g', linewidth = 1, label='Forecast')
-        plt.xticks([0, len(forecast)], [first_date, last_date])
-        plt.title("Forecast VS Sarima")
-        plt.xlabel("Days")
-        plt.ylabel("W")
-        plt.legend()
-        plt.grid()
-        plt.savefig(f"output/{best_model}/Forecast_VS_Sarima.png")
-        plt.close()
\ No newline at end of file
+    def save_outputs(self, best_model, forecast_output):
+        """Write the forecast and feature importances of a level4 to <output_dir>/<level4>/."""
+        level4_dir = os.path.join(self.output_dir, str(best_model))
+        os.makedirs(level4_dir, exist_ok=True)
+        forecast_output.to_parquet(os.path.join(level4_dir, "forecast.parquet"))
+        feat_imp = self.feature_importances.get(best_model)
+        if feat_imp is not None:
+            feat_imp.to_parquet(os.path.join(level4_dir, "feature_importances.parquet"), index=False)
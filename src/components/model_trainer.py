@@ -1,9 +1,52 @@
-from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+import importlib
+from sklearn.model_selection import TimeSeriesSplit
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import ElasticNetCV, ElasticNet, LinearRegression, Ridge
-import lightgbm as lgb
 from tqdm import tqdm
+from src.components.training.search import (search_settings,
+                                            fold_evaluator,
+                                            random_search,
+                                            sklearn_random_search,
+                                            halving_search,
+                                            refit_params)
+from src.components.training.params_store import (settings_hash,
+                                                  load_best_params,
+                                                  save_best_params,
+                                                  research_reason,
+                                                  data_fingerprint,
+                                                  degraded)
+from src.components.training.global_model import (HIERARCHY_COLUMNS,
+                                                  GlobalModel,
+                                                  PanelTimeSeriesSplit,
+                                                  hierarchy_segments,
+                                                  sales_scale_columns,
+                                                  sales_scale)
+from src import logger
+
+
+# Modules of the regressor names config.yaml may use as training.models.<name>.type
+MODEL_MODULES = {
+    "lgb": "lightgbm",
+    "RandomForestRegressor": "sklearn.ensemble",
+    "ElasticNetCV": "sklearn.linear_model",
+    "ElasticNet": "sklearn.linear_model",
+    "LinearRegression": "sklearn.linear_model",
+    "Ridge": "sklearn.linear_model",
+}
+
+
+def model_class(type_name):
+    """
+    The regressor class of a model type ("lgb.LGBMRegressor", "Ridge" or a full
+    dotted path), importing its module only when it is used.
+    """
+    head, _, attr = type_name.rpartition(".")
+    if head in MODEL_MODULES:
+        return getattr(importlib.import_module(MODEL_MODULES[head]), attr)
+    if not head and attr in MODEL_MODULES:
+        return getattr(importlib.import_module(MODEL_MODULES[attr]), attr)
+    if head:
+        return getattr(importlib.import_module(head), attr)
+    raise ValueError(f"Unknown model type {type_name}")
 
 
 class ModelTrainig:
@@ -13,7 +56,11 @@ class ModelTrainig:
                  validation_size,      # replaces hard-coded 30
                  models,               # model config
                  model,                # selected model name
-                 params                # hyperparameter grid
+                 params,               # hyperparameter grid
+                 params_store=None,    # training.params_store section of config.yaml
+                 force_search=False,   # search even when stored params could be reused
+                 n_jobs=None,          # parallel search fits, None for search.n_jobs in params.yaml
+                 model_threads=None    # threads per model fit, None for the model params in config.yaml
                  ):
         
         self.train_data = train_data
@@ -21,6 +68,115 @@ class ModelTrainig:
         self.models = models
         self.model = model
         self.params = params
+        self.search = search_settings(params)
+        self.search_stats = {}
+        self.params_store = params_store or {}
+        self.force_search = force_search
+        self.model_threads = model_threads
+        if n_jobs is not None:
+            self.search["n_jobs"] = n_jobs
+
+    def _search(self, base_model, param_grid, train_x, train_y, tscv):
+        """Run the hyperparameter search selected in params.yaml."""
+        if self.search["mode"] not in ("halving", "random"):
+            raise ValueError(f"Unknown search mode: {self.search['mode']}")
+
+        if self.search["mode"] == "random" and self.search["backend"] == "sklearn":
+            return sklearn_random_search(
+                base_model,
+                param_grid,
+                train_x,
+                train_y,
+                tscv,
+                n_iter=self.search["n_iter"],
+                random_state=self.search["random_state"],
+                n_jobs=self.search["n_jobs"]
+            )
+
+        # Folds of one pre-binned lgb.Dataset with the native backend
+        evaluator = fold_evaluator(self.search["backend"], base_model, train_x, train_y, tscv)
+
+        if self.search["mode"] == "halving":
+            return halving_search(
+                evaluator,
+                param_grid,
+                max(param_grid.get("n_estimators", [base_model.get_params()["n_estimators"]])),
+                n_iter=self.search["n_iter"],
+                factor=self.search["factor"],
+                min_resource=self.search["min_resource"],
+                early_stopping_rounds=self.search["early_stopping_rounds"],
+                random_state=self.search["random_state"],
+                n_jobs=self.search["n_jobs"]
+            )
+
+        return random_search(
+            evaluator,
+            param_grid,
+            n_iter=self.search["n_iter"],
+            random_state=self.search["random_state"],
+            n_jobs=self.search["n_jobs"]
+        )
+
+    def _search_or_reuse(self, level4_id, reg_cfg, base_model, param_grid, train_x, train_y, dates, tscv):
+        """
+        Reuse the stored best params of the level4 when the params_store policy allows it,
+        otherwise search and store the result.
+
+        params_store.reuse: "search" always searches; "refit" refits the stored params as
+        long as the search config, the feature columns and the rows searched on (dates up
+        to the last searched one) are unchanged; "auto" also searches again when they are
+        older than max_age_days or their CV MAE got worse than max_degradation since the search.
+        """
+        store_dir = self.params_store.get("dir")
+        reuse = self.params_store.get("reuse", "auto")
+        config_hash = settings_hash(reg_cfg,
+                                    param_grid,
+                                    {k: v for k, v in self.search.items() if k != "n_jobs"})
+        data_hash = settings_hash(list(train_x.columns))
+
+        reason = "forced" if self.force_search else "params store disabled"
+        if store_dir is not None and reuse != "search" and not self.force_search:
+            stored = load_best_params(store_dir, level4_id)
+            reason = research_reason(stored,
+                                     config_hash,
+                                     data_hash,
+                                     self.params_store.get("max_age_days") if reuse == "auto" else None,
+                                     dates,
+                                     train_y)
+
+        n_fits = 0
+        if reason is None:
+            evaluator = fold_evaluator(self.search["backend"], base_model, train_x, train_y, tscv)
+            best_est, best_params, stats = refit_params(evaluator,
+                                                        stored["params"],
+                                                        validate=reuse == "auto",
+                                                        n_jobs=self.search["n_jobs"])
+            if reuse == "auto" and degraded(stored, stats["best_score"], self.params_store.get("max_degradation")):
+                reason = f"CV MAE {stats['best_score']:.2f} against {stored['cv_score']:.2f} when searched"
+                n_fits = stats["n_fits"]
+            else:
+                logger.info(f"{level4_id}: reused params searched on {stored['searched_on']}, "
+                            f"{stats['n_fits']} fits in {stats['seconds']:.1f}s")
+                return best_est, best_params, stats
+
+        logger.info(f"{level4_id}: searching params ({reason})")
+        best_est, best_params, stats = self._search(base_model, param_grid, train_x, train_y, tscv)
+        stats["n_fits"] += n_fits
+        logger.info(f"{level4_id}: {self.search['mode']} search, {stats['n_fits']} fits "
+                    f"in {stats['seconds']:.1f}s, CV MAE {stats['best_score']:.2f}")
+
+        if store_dir is not None:
+            # Stored as the score refit_params(validate=True) is compared with: the random searches
+            # score candidates that way, halving reports it separately from its rung scores
+            save_best_params(store_dir,
+                             level4_id,
+                             best_params,
+                             stats.get("cv_score", stats["best_score"]),
+                             config_hash,
+                             data_hash,
+                             len(train_x),
+                             data_fingerprint(dates, train_y))
+        return best_est, best_params, stats
 
     def run_training(self):
         """
@@ -51,8 +207,8 @@ class ModelTrainig:
 
             # ---------------- TimeSeries CV ----------------
             tscv = TimeSeriesSplit(
-                n_splits=4,
-                test_size=10
+                n_splits=self.search["n_splits"],
+                test_size=self.search["test_size"]
             )
 
             # ---------------- Model selection ----------------
@@ -61,28 +217,26 @@ class ModelTrainig:
                 if model_name != self.model:
                     continue
 
-                model_cls = eval(reg_cfg["type"])
-                base_model = model_cls(**reg_cfg["params"])
+                model_cls = model_class(reg_cfg["type"])
+                model_params = dict(reg_cfg["params"])
+                if self.model_threads is not None:
+                    model_params["n_jobs"] = self.model_threads
+                base_model = model_cls(**model_params)
 
                 param_grid = {}
                 for param in self.params[model_name]:
                     for k, v in param.items():
                         param_grid[k] = v
 
-                search = RandomizedSearchCV(
-                    estimator=base_model,
-                    param_distributions=param_grid,
-                    cv=tscv,
-                    n_jobs=-1,
-                    n_iter=60,
-                    scoring="neg_mean_absolute_error",
-                    random_state=100,
-                    return_train_score=True
-                )
-
-                search.fit(train_x, train_y)
-
-                best_est = search.best_estimator_
+                best_est, best_params, stats = self._search_or_reuse(level4_id,
+                                                                     reg_cfg,
+                                                                     base_model,
+                                                                     param_grid,
+                                                                     train_x,
+                                                                     train_y,
+                                                                     train_df["Date"].to_numpy(),
+                                                                     tscv)
+                self.search_stats[level4_id] = stats
 
                 # ---------------- Feature importance ----------------
                 if hasattr(best_est, "feature_importances_"):
@@ -99,6 +253,129 @@ class ModelTrainig:
                     feature_importances[level4_id] = feat_imp
 
                 best_models_dict[level4_id] = best_est
-                best_params_dict[level4_id] = search.best_params_
+                best_params_dict[level4_id] = best_params
+
+        return best_models_dict, best_params_dict, feature_importances
+
+
+class GlobalModelTrainig(ModelTrainig):
+    """
+    Trains and tunes one LightGBM model on the stacked frames of all level4s,
+    with the level4 code and its hierarchy segments as categorical features.
+
+    run_training keeps the ModelTrainig contract: every level4 gets a view of
+    the global model that predicts from its own feature matrix, the global
+    best params and the global feature importances.
+    """
+
+    def __init__(self,
+                 train_data,           # dict of Level4 → DataFrame
+                 validation_size,
+                 models,               # model config
+                 model,                # selected model name
+                 params,               # hyperparameter grid
+                 features_recipe,      # recipe features, to find the ones in sales units
+                 params_store=None,
+                 force_search=False,
+                 n_jobs=None,
+                 model_threads=None
+                 ):
+
+        super().__init__(train_data,
+                         validation_size,
+                         models,
+                         model,
+                         params,
+                         params_store,
+                         force_search,
+                         n_jobs,
+                         model_threads)
+        self.features_recipe = features_recipe
+
+    def stack(self):
+        """
+        The pooled training set.
+        Returns:
+            train_x (DataFrame), train_y (Series), dates (ndarray), columns (dict of level4 → feature columns),
+            scaled_columns (list), scales (dict), categories (dict)
+        """
+        columns = {}
+        for level4_id, train_df in self.train_data.items():
+            columns[level4_id] = list(train_df.drop(columns=["target", "Date", "WeightQTY_Actual"]).columns)
+
+        feature_columns = list(dict.fromkeys(c for level4_columns in columns.values() for c in level4_columns))
+        scaled_columns = sales_scale_columns(feature_columns, self.features_recipe)
+        scales = {level4_id: sales_scale(train_df["target"]) for level4_id, train_df in self.train_data.items()}
+        segments = [hierarchy_segments(level4_id) for level4_id in self.train_data]
+        categories = {column: sorted({s[i] for s in segments}) for i, column in enumerate(HIERARCHY_COLUMNS)}
+
+        train_x = GlobalModel.design({level4_id: train_df[columns[level4_id]]
+                                      for level4_id, train_df in self.train_data.items()},
+                                     feature_columns,
+                                     scaled_columns,
+                                     scales,
+                                     categories)
+        train_y = pd.concat([train_df["target"] / scales[level4_id]
+                             for level4_id, train_df in self.train_data.items()],
+                            ignore_index=True)
+        dates = pd.concat([train_df["Date"] for train_df in self.train_data.values()], ignore_index=True).to_numpy()
+
+        return train_x, train_y, dates, columns, scaled_columns, scales, categories
+
+    def run_training(self):
+        """
+        Trains the global model using the stacked training data and hyperparameters.
+        Returns:
+            best_models_dict (dict)
+            best_params_dict (dict)
+            feature_importances (dict)
+        """
+        train_x, train_y, dates, columns, scaled_columns, scales, categories = self.stack()
+        logger.info(f"Global model: {len(self.train_data)} level4s, {train_x.shape[0]} rows, "
+                    f"{train_x.shape[1]} features")
+
+        tscv = PanelTimeSeriesSplit(dates,
+                                    n_splits=self.search["n_splits"],
+                                    test_size=self.search["test_size"])
+
+        reg_cfg = self.models[self.model]
+        model_cls = model_class(reg_cfg["type"])
+        model_params = dict(reg_cfg["params"])
+        if self.model_threads is not None:
+            model_params["n_jobs"] = self.model_threads
+        base_model = model_cls(**model_params)
+
+        param_grid = {}
+        for param in self.params[self.model]:
+            for k, v in param.items():
+                param_grid[k] = v
+
+        best_est, best_params, stats = self._search_or_reuse("global",
+                                                             reg_cfg,
+                                                             base_model,
+                                                             param_grid,
+                                                             train_x,
+                                                             train_y,
+                                                             dates,
+                                                             tscv)
+        self.search_stats["global"] = stats
+
+        global_model = GlobalModel(best_est, list(train_x.columns[:-len(HIERARCHY_COLUMNS)]),
+                                   scaled_columns, scales, categories)
+        feat_imp = (
+            pd.DataFrame({
+                "feature": train_x.columns,
+                "importance": best_est.feature_importances_
+            })
+            .query("importance != 0")
+            .sort_values("importance", ascending=False)
+            .reset_index(drop=True)
+        )
+
+        best_models_dict = {level4_id: global_model.for_level4(level4_id, columns[level4_id])
+                            for level4_id in self.train_data}
+        best_params_dict = {level4_id: best_params for level4_id in self.train_data}
+        feature_importances = {level4_id: feat_imp.assign(Level4_ID=level4_id)[["Level4_ID", "feature", "importance"]]
+                               for level4_id in self.train_data}
 
         return best_models_dict, best_params_dict, feature_importances
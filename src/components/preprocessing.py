@@ -1,28 +1,10 @@
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
-from sklearn.preprocessing import MinMaxScaler
 from src import logger
 
-from src.components.Preprocess.features import (
-                                                add_paycheck_feature,
-                                                add_ma_features,
-                                                add_t_lag_features,
-                                                apply_sine_features,
-                                                apply_dummy_features,
-                                                add_start_of_year, 
-                                                add_ramadan, 
-                                                add_end_of_year, 
-                                                add_new_custom_feature, 
-                                                add_week_day_indicator, 
-                                                add_weekend,
-                                                add_isholiday, 
-                                                update_ma,
-                                                update_lag, 
-                                                add_school,
-                                                remove_sin_features
-    
-)
+from src.components.Preprocess.plans import compile_feature_plan, run_feature_plan, DEFAULT_PLAN
+from src.components.Preprocess.columnar import stack_columns, build_feature_columns, column_values
+from src.components.dtypes import compact_columns, compact_frame, widen_frame
 # from src.components.preprocess.rules import apply_feature_rules
     
 
@@ -38,7 +20,10 @@ class Preprocessing:
         MA_variations,
         T_variations,
         feature_rules, 
-        feature_recipe
+        feature_recipe,
+        feature_plans=None,
+        engine="columnar",
+        dtypes="compact"
         ):
         
         self.data = train_data
@@ -50,6 +35,25 @@ class Preprocessing:
         self.T_variations = T_variations
         self.feature_rules = feature_rules
         self.feature_recipe=feature_recipe
+        self.feature_plans = {} if feature_plans is None else feature_plans
+        self.engine = engine
+        self.dtypes = dtypes
+        # dtypes declared in features_to_keep, applied to the kept columns with dtypes "compact"
+        self.declared_dtypes = {name: dtype for f in features_to_keep for name, dtype in f.items()}
+
+    def feature_plan(self, key):
+        """The compiled feature plan of a level4, compiled here if it is not in feature_plans."""
+        plan_key = key if key in self.feature_rules else DEFAULT_PLAN
+        if plan_key not in self.feature_plans:
+            self.feature_plans[plan_key] = compile_feature_plan(key,
+                                                                self.features_to_keep,
+                                                                self.sin_features,
+                                                                self.features_to_dummies,
+                                                                self.MA_variations,
+                                                                self.T_variations,
+                                                                self.feature_rules,
+                                                                self.feature_recipe)
+        return self.feature_plans[plan_key]
 
     def preprocess_data(self):
         """
@@ -70,68 +74,10 @@ class Preprocessing:
 
         try:
             for key in self.data.keys():
-                data = self.data[key].reset_index(drop=True)
-                forecast = self.forecast_data[key].reset_index(drop=True)
-
-                train_actual = data["WeightQTY_Actual"]
-                has_actual = "WeightQTY_Actual" in forecast.columns
-                has_sarima = "SarimaOutput" in forecast.columns
-
-                if has_actual:
-                    actual_weight = forecast["WeightQTY_Actual"]
-                if has_sarima:
-                    sarima_output = forecast["SarimaOutput"]
-           
-                cols_to_keep = [list(f.keys())[0] for f in self.features_to_keep]
-                data = data[cols_to_keep]
-                forecast = forecast[cols_to_keep]
-
-                l_data = len(data)
-
-                data = pd.concat([data, forecast]).reset_index(drop=True)
-                WeightQTY = data["WeightQTY"]
-
-                data = add_ma_features(data, WeightQTY, self.MA_variations)
-                data = add_t_lag_features(data, WeightQTY, self.T_variations)
-                data["Ratio"] = data["MA-7"] / data["MA-60"]
-                data = add_paycheck_feature(data )
-                data = add_ramadan(data)
-                data = add_school(data)
-                data = add_weekend(data)
-                data = add_isholiday(data)
-                data = add_start_of_year(data)
-                data = add_end_of_year(data)
-                data = add_week_day_indicator(data , key , self.feature_rules)
-                data = apply_sine_features(data, self.sin_features)
-                data = add_new_custom_feature(data , self.feature_rules , key , self.feature_recipe)
-                data = update_ma (data , key, self.feature_rules)
-                data = update_lag (data , key , self.feature_rules)
-                data = apply_dummy_features(data, self.features_to_dummies)
-                data = remove_sin_features(data, self.sin_features)
-
-                # ---------------- train
-                train_df = data[:l_data].reset_index(drop=True)
-                train_df["target"] = self.data[key]["WeightQTY"].reset_index(drop=True)
-                train_df["Date"] = self.data[key]["Date"].reset_index(drop=True)
-                train_df["WeightQTY_Actual"] = train_actual
-                train_df = train_df.drop("WeightQTY", axis=1)
-
-                # ---------------- forecast
-                forecast_df = data[l_data:].reset_index(drop=True)
-
-                if "Price" in train_df.columns:
-                    forecast_df["Price"] = train_df["Price"][-7:].mean()
-                if "Discount" in train_df.columns:
-                    forecast_df["Discount"] = train_df["Discount"][-7:].mean()
-
-                forecast_df["Date"] = self.forecast_data[key]["Date"].reset_index(drop=True)
-
-                if has_actual:
-                    forecast_df["WeightQTY_Actual"] = actual_weight
-                if has_sarima:
-                    forecast_df["SarimaOutput"] = sarima_output
-
-                forecast_df = forecast_df.drop("WeightQTY", axis=1)
+                if self.engine == "columnar":
+                    train_df, forecast_df = self.preprocess_columnar(key)
+                else:
+                    train_df, forecast_df = self.preprocess_frames(key)
 
                 self.data[key] = train_df
                 self.forecast_data[key] = forecast_df
@@ -141,3 +87,91 @@ class Preprocessing:
         except Exception as e:
             logger.exception(e)
             raise
+
+    def preprocess_frames(self, key):
+        """Feature plan of a level4 run on a pandas frame of its train and forecast rows."""
+        data = self.data[key].reset_index(drop=True)
+        forecast = self.forecast_data[key].reset_index(drop=True)
+
+        train_actual = data["WeightQTY_Actual"]
+        has_actual = "WeightQTY_Actual" in forecast.columns
+        has_sarima = "SarimaOutput" in forecast.columns
+
+        if has_actual:
+            actual_weight = forecast["WeightQTY_Actual"]
+        if has_sarima:
+            sarima_output = forecast["SarimaOutput"]
+
+        cols_to_keep = [list(f.keys())[0] for f in self.features_to_keep]
+        data = data[cols_to_keep]
+        forecast = forecast[cols_to_keep]
+
+        l_data = len(data)
+
+        data = widen_frame(pd.concat([data, forecast]).reset_index(drop=True))
+        data = run_feature_plan(data, self.feature_plan(key), self.feature_recipe)
+        if self.dtypes == "compact":
+            data = compact_frame(data, self.declared_dtypes)
+
+        # ---------------- train
+        train_df = data[:l_data].reset_index(drop=True)
+        train_df["target"] = self.data[key]["WeightQTY"].reset_index(drop=True)
+        train_df["Date"] = self.data[key]["Date"].reset_index(drop=True)
+        train_df["WeightQTY_Actual"] = train_actual
+        train_df = train_df.drop("WeightQTY", axis=1)
+
+        # ---------------- forecast
+        forecast_df = data[l_data:].reset_index(drop=True)
+
+        if "Price" in train_df.columns:
+            forecast_df["Price"] = train_df["Price"][-7:].mean()
+        if "Discount" in train_df.columns:
+            forecast_df["Discount"] = train_df["Discount"][-7:].mean()
+
+        forecast_df["Date"] = self.forecast_data[key]["Date"].reset_index(drop=True)
+
+        if has_actual:
+            forecast_df["WeightQTY_Actual"] = actual_weight
+        if has_sarima:
+            forecast_df["SarimaOutput"] = sarima_output
+
+        forecast_df = forecast_df.drop("WeightQTY", axis=1)
+
+        return train_df, forecast_df
+
+    def preprocess_columnar(self, key):
+        """
+        Feature plan of a level4 run on NumPy columns (src.components.Preprocess.columnar),
+        with the train and forecast frames constructed once from them at the end.
+        Gives the same frames as preprocess_frames.
+        """
+        train = self.data[key]
+        forecast = self.forecast_data[key]
+        cols_to_keep = [list(f.keys())[0] for f in self.features_to_keep]
+        l_data = len(train)
+
+        columns = build_feature_columns(stack_columns(train, forecast, cols_to_keep),
+                                        self.feature_plan(key),
+                                        self.feature_recipe)
+        if self.dtypes == "compact":
+            compact_columns(columns, self.declared_dtypes)
+
+        # ---------------- train
+        train_columns = {name: values[:l_data] for name, values in columns.items()}
+        train_columns["target"] = column_values(train["WeightQTY"])
+        train_columns["Date"] = column_values(train["Date"])
+        train_columns["WeightQTY_Actual"] = column_values(train["WeightQTY_Actual"])
+        del train_columns["WeightQTY"]
+
+        # ---------------- forecast
+        forecast_columns = {name: values[l_data:] for name, values in columns.items()}
+        for name in ["Price", "Discount"]:
+            if name in train_columns:
+                forecast_columns[name] = np.full(len(forecast), np.nanmean(train_columns[name][-7:]))
+        forecast_columns["Date"] = column_values(forecast["Date"])
+        for name in ["WeightQTY_Actual", "SarimaOutput"]:
+            if name in forecast.columns:
+                forecast_columns[name] = column_values(forecast[name])
+        del forecast_columns["WeightQTY"]
+
+        return pd.DataFrame(train_columns), pd.DataFrame(forecast_columns)
@@ -0,0 +1,85 @@
+"""
+Forecast plots, rendered after the run from the stored forecasts.
+
+Reads <output_dir>/<level4>/forecast.parquet and writes Prediction.png and
+Forecast_VS_Sarima.png next to it, with the headless Agg backend and one figure
+reused for every plot. Plots newer than their forecast are left alone, so a
+rerun only renders what changed. Batch runs with output mode "full" call it at
+the end; on demand, at low priority:
+    python -m src plots [LEVEL4 ...] [--overwrite]
+"""
+from pathlib import Path
+import pandas as pd
+from src import logger
+
+
+def _pyplot():
+    # Imported here so runs without plots never load matplotlib
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _draw(fig, ax, path, series, ticks, days, title):
+    """Draw series ({label: (values, color)}) on the reused axes and save the figure to path."""
+    ax.clear()
+    for label, (values, color) in series.items():
+        ax.plot(values, color=color, linewidth=1, label=label)
+    if days is not None:
+        ax.axvline(x=days - 1, color="b", linewidth=0.3)
+    ax.set_xticks(*ticks)
+    ax.set_title(title)
+    ax.set_xlabel("Days")
+    ax.set_ylabel("W")
+    ax.legend()
+    ax.grid()
+    fig.savefig(path)
+
+
+def render_plots(output_dir, level4s=None, days=None, overwrite=False):
+    """
+    Render the plots of the level4s (all with a stored forecast by default).
+    Returns:
+        rendered (int): number of level4s whose plots were written
+    """
+    output_dir = Path(output_dir)
+    if level4s is None:
+        paths = sorted(output_dir.glob("*/forecast.parquet"))
+    else:
+        paths = [output_dir / str(level4) / "forecast.parquet" for level4 in level4s]
+
+    plt, fig, ax = None, None, None
+    rendered = 0
+    for path in paths:
+        if not path.exists():
+            continue
+        prediction_png = path.parent / "Prediction.png"
+        sarima_png = path.parent / "Forecast_VS_Sarima.png"
+        if not overwrite and all(png.exists() and png.stat().st_mtime >= path.stat().st_mtime
+                                 for png in [prediction_png, sarima_png]):
+            continue
+
+        if fig is None:
+            plt = _pyplot()
+            fig = plt.figure()
+            ax = fig.add_subplot()
+
+        forecast_output = pd.read_parquet(path)
+        forecast = forecast_output["Forecast"].to_numpy()
+        ticks = ([0, len(forecast)], [forecast_output["Date"].iloc[0], forecast_output["Date"].iloc[-1]])
+
+        _draw(fig, ax, prediction_png,
+              {"forecast": (forecast, "r"), "Actual": (forecast_output["WeightQTY"].to_numpy(), "g")},
+              ticks, days, "Forecast")
+
+        _draw(fig, ax, sarima_png,
+              {"Sarima": (forecast_output["SarimaOutput"].to_numpy(), "r"), "Forecast": (forecast, "g")},
+              ticks, None, "Forecast VS Sarima")
+        rendered += 1
+
+    if fig is not None:
+        plt.close(fig)
+    logger.info(f"Reporting: rendered plots of {rendered} level4(s) in {output_dir}")
+    return rendered
+
@@ -0,0 +1,47 @@
+from pathlib import Path
+import pandas as pd
+from src import logger
+
+
+# Columns of total_output.csv and of the forecast table, before insert_date
+OUTPUT_COLUMNS = ["Level4_ID", "Date", "Forecast", "WeightQTY", "TargetMonth"]
+
+
+class ForecastSink:
+    """
+    Collects the forecast frames of a run as the level4s finish. Every frame is
+    written at once as one part of a Parquet dataset (<parquet_dir>/<level4>.parquet)
+    when parquet_dir is set, and kept in memory so the combined output is built
+    with a single concat at the end instead of re-reading per-level4 files.
+    parquet_dir is meant for this run alone (see Settings.forecasts_dir): parts
+    already in it are left as they are.
+    """
+
+    def __init__(self, target_month, parquet_dir=None):
+        self.target_month = target_month
+        self.parquet_dir = Path(parquet_dir) if parquet_dir is not None else None
+        self.frames = []
+
+        if self.parquet_dir is not None:
+            self.parquet_dir.mkdir(parents=True, exist_ok=True)
+
+    def add(self, level4, forecast_output):
+        """Add the forecast frame of one level4 (Forecast, WeightQTY, Date columns)."""
+        frame = forecast_output.assign(Level4_ID=str(level4), TargetMonth=self.target_month)
+        frame = frame[OUTPUT_COLUMNS].reset_index(drop=True)
+        if self.parquet_dir is not None:
+            frame.to_parquet(self.parquet_dir / f"{level4}.parquet", index=False)
+        self.frames.append(frame)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def collect(self, insert_date):
+        """All frames added so far as one frame, stamped with insert_date."""
+        if self.frames:
+            output_df = pd.concat(self.frames, ignore_index=True)
+        else:
+            output_df = pd.DataFrame(columns=OUTPUT_COLUMNS)
+        output_df["insert_date"] = insert_date
+        logger.info(f"Forecast sink: {len(self.frames)} level4s, {len(output_df)} rows")
+        return output_df
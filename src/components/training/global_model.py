@@ -0,0 +1,124 @@
+import re
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import TimeSeriesSplit
+
+
+# Level4 codes look like 7_5_9_2; every prefix is a level of the product hierarchy
+HIERARCHY_COLUMNS = ["Level1", "Level2", "Level3", "Level4"]
+
+# Features in the units of the level4's sales: lags and moving averages of the target
+SALES_SCALE_PATTERN = re.compile(r"^(T|MA)-\d+$")
+
+
+def hierarchy_segments(level4):
+    """["7", "7_5", "7_5_9", "7_5_9_2"] for "7_5_9_2", padded with the level4 itself."""
+    parts = str(level4).split("_")
+    segments = ["_".join(parts[:i + 1]) for i in range(min(len(parts), len(HIERARCHY_COLUMNS)))]
+    return segments + [str(level4)] * (len(HIERARCHY_COLUMNS) - len(segments))
+
+
+def sales_scale_columns(columns, features_recipe):
+    """
+    Columns that scale with the level4's sales: T-n and MA-n, and the recipe
+    features built from them (products such as Nouroz_MA_30 = MA-30 * coef).
+    """
+    scaled = {column for column in columns if SALES_SCALE_PATTERN.match(column)}
+    changed = True
+    while changed:
+        changed = False
+        for name, recipe in features_recipe.items():
+            if name not in scaled and (recipe["a"] in scaled or recipe["b"] in scaled):
+                scaled.add(name)
+                changed = True
+    return [column for column in columns if column in scaled]
+
+
+def sales_scale(target):
+    """Mean daily sales of a level4, the unit its target and sales features are divided by."""
+    scale = float(np.nanmean(np.asarray(target, dtype=float))) if len(target) else np.nan
+    return scale if np.isfinite(scale) and scale > 0 else 1.0
+
+
+class PanelTimeSeriesSplit:
+    """
+    TimeSeriesSplit over the distinct dates of a stacked panel: every fold holds
+    out the same test_size days of all level4s and trains on the days before.
+    """
+
+    def __init__(self, dates, n_splits=4, test_size=10):
+        self.dates = np.asarray(dates)
+        self.n_splits = n_splits
+        self.test_size = test_size
+
+    def get_n_splits(self, X=None, y=None, groups=None):
+        return self.n_splits
+
+    def split(self, X=None, y=None, groups=None):
+        unique_dates = np.unique(self.dates)
+        for train_days, test_days in TimeSeriesSplit(self.n_splits, test_size=self.test_size).split(unique_dates):
+            yield (np.flatnonzero(np.isin(self.dates, unique_dates[train_days])),
+                   np.flatnonzero(np.isin(self.dates, unique_dates[test_days])))
+
+
+class GlobalModel:
+    """
+    One model for many level4s. Inputs are aligned to the pooled columns (missing
+    features are NaN), sales-scale columns and the target are divided by each
+    level4's mean sales, and the hierarchy segments are categorical features.
+    """
+
+    def __init__(self, model, feature_columns, scaled_columns, scales, categories):
+        self.model = model
+        self.feature_columns = feature_columns
+        self.scaled_columns = scaled_columns
+        self.scales = scales
+        self.categories = categories
+
+    @staticmethod
+    def design(frames, feature_columns, scaled_columns, scales, categories):
+        """Stack {level4: features} into the pooled feature frame, in the order of frames."""
+        parts = []
+        for level4, frame in frames.items():
+            part = frame.reindex(columns=feature_columns).astype(np.float32)
+            part[scaled_columns] = part[scaled_columns] / scales[level4]
+            for column, segment in zip(HIERARCHY_COLUMNS, hierarchy_segments(level4)):
+                part[column] = segment
+            parts.append(part)
+
+        X = pd.concat(parts, ignore_index=True)
+        for column in HIERARCHY_COLUMNS:
+            X[column] = pd.Categorical(X[column], categories=categories[column])
+        return X
+
+    def predict_panel(self, frames):
+        """Forecasts of {level4: features} with a single predict call, back in each level4's units."""
+        X = self.design(frames, self.feature_columns, self.scaled_columns, self.scales, self.categories)
+        prediction = self.model.predict(X)
+
+        forecasts, start = {}, 0
+        for level4, frame in frames.items():
+            forecasts[level4] = prediction[start:start + len(frame)] * self.scales[level4]
+            start += len(frame)
+        return forecasts
+
+    def for_level4(self, level4, columns):
+        return GlobalModelView(self, level4, columns)
+
+
+class GlobalModelView:
+    """
+    The global model seen as the model of one level4: predict takes that level4's
+    feature matrix (columns in its preprocessing order), like a per-level4 model.
+    """
+
+    def __init__(self, global_model, level4, columns):
+        self.global_model = global_model
+        self.level4 = level4
+        self.columns = list(columns)
+
+    def frame(self, X):
+        return X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns=self.columns)
+
+    def predict(self, X):
+        return self.global_model.predict_panel({self.level4: self.frame(X)})[self.level4]
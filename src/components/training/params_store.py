@@ -0,0 +1,114 @@
+import json
+import hashlib
+import datetime
+from pathlib import Path
+import numpy as np
+
+
+def settings_hash(*parts):
+    """Short stable hash of JSON-serialisable settings (model params, grid, feature columns...)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _to_builtin(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def data_fingerprint(dates, target, until=None):
+    """
+    Row count, date range and target sum of the training rows (those up to
+    until, a PersianInt, when given): cheap to compute and to compare across runs.
+    """
+    dates = np.asarray(dates)
+    target = np.asarray(target, dtype=float)
+    if until is not None:
+        keep = dates <= until
+        dates, target = dates[keep], target[keep]
+    return {"n_rows": int(len(dates)),
+            "first_date": int(dates.min()) if len(dates) else None,
+            "last_date": int(dates.max()) if len(dates) else None,
+            "target_sum": float(target.sum())}
+
+
+def data_changed(stored, dates, target):
+    """
+    True when the rows the stored params were searched on changed: rows up to
+    the last searched date were restated, added or removed. Rows appended after
+    it are left to max_age_days and the degradation check.
+    """
+    searched = stored.get("data")
+    if searched is None:
+        return True
+    current = data_fingerprint(dates, target, searched["last_date"])
+    return (current["n_rows"] != searched["n_rows"]
+            or current["first_date"] != searched["first_date"]
+            or not np.isclose(current["target_sum"], searched["target_sum"], rtol=1e-9, atol=1e-6))
+
+
+def load_best_params(store_dir, level4):
+    """Return the stored search result of a level4 (params, cv_score, searched_on, hashes, data) or None."""
+    path = Path(store_dir) / f"{level4}.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as openfile:
+        return json.load(openfile)
+
+
+def save_best_params(store_dir, level4, best_params, cv_score, config_hash, data_hash, n_rows, data=None):
+    path = Path(store_dir) / f"{level4}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    stored = {"params": {k: _to_builtin(v) for k, v in best_params.items()},
+              "cv_score": float(cv_score),
+              "config_hash": config_hash,
+              "data_hash": data_hash,
+              "n_rows": int(n_rows),
+              "data": data,
+              "searched_on": datetime.date.today().isoformat()}
+    with open(path, "w") as openfile:
+        json.dump(stored, openfile, indent=4)
+
+
+def reuse_state(params_store, level4):
+    """
+    What a training run of level4 reads from the params store (the params_store
+    section of config.yaml): the stored record and whether it is past
+    max_age_days. Part of the train checkpoint key.
+    """
+    store_dir = params_store.get("dir")
+    if store_dir is None or params_store.get("reuse", "auto") == "search":
+        return None
+    stored = load_best_params(store_dir, level4)
+    if stored is None:
+        return None
+    max_age_days = params_store.get("max_age_days") if params_store.get("reuse", "auto") == "auto" else None
+    age = (datetime.date.today() - datetime.date.fromisoformat(stored["searched_on"])).days
+    return stored, max_age_days is not None and age >= max_age_days
+
+
+def research_reason(stored, config_hash, data_hash, max_age_days=None, dates=None, target=None):
+    """
+    Why the stored params of a level4 cannot be reused without a new search,
+    or None when they can. data_hash stamps the feature columns; with dates
+    and target, the rows searched on are checked too (see data_changed). The
+    validation error check needs a CV run and is done by the caller (see degraded).
+    """
+    if stored is None:
+        return "no stored params"
+    if stored["config_hash"] != config_hash:
+        return "search config changed"
+    if stored["data_hash"] != data_hash:
+        return "feature columns changed"
+    if dates is not None and data_changed(stored, dates, target):
+        return "training data changed"
+    age = (datetime.date.today() - datetime.date.fromisoformat(stored["searched_on"])).days
+    if max_age_days is not None and age >= max_age_days:
+        return f"searched {age} days ago"
+    return None
+
+
+def degraded(stored, cv_score, max_degradation=None):
+    """True when the CV MAE of the stored params got worse than max_degradation (a fraction) since the search."""
+    if max_degradation is None:
+        return False
+    return cv_score > stored["cv_score"] * (1 + max_degradation)
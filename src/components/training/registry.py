@@ -0,0 +1,181 @@
+import os
+import json
+import pickle
+from datetime import datetime
+from pathlib import Path
+import lightgbm as lgb
+from src.components.checkpoints import digest, code_version
+from src.components.training.search import BoosterModel
+from src.components.training.global_model import GlobalModel, GlobalModelView
+from src import logger
+
+
+# Columns of the preprocessed frames that are not model inputs
+NON_FEATURE_COLUMNS = ["target", "Date", "WeightQTY_Actual", "SarimaOutput"]
+
+GLOBAL_ENTRY = "global"
+
+
+def feature_columns(frame):
+    """Model input columns of a preprocessed train or forecast frame, in frame order."""
+    return [column for column in frame.columns if column not in NON_FEATURE_COLUMNS]
+
+
+def align_features(frame, columns):
+    """frame with its feature columns in the stored order; ValueError if the feature set differs."""
+    current = feature_columns(frame)
+    if set(current) != set(columns):
+        raise ValueError(f"features differ from the stored model: "
+                         f"missing {sorted(set(columns) - set(current))}, "
+                         f"unexpected {sorted(set(current) - set(columns))}")
+    return frame[list(columns) + [column for column in frame.columns if column in NON_FEATURE_COLUMNS]]
+
+
+def preprocess_signature(level4, preprocessing_cfg, feature_rules, features_recipe):
+    """Hash of what the features of a level4 are built from: preprocessing config, rules, recipe and code."""
+    # Both preprocessing engines build the same features
+    preprocessing_cfg = {key: value for key, value in preprocessing_cfg.items() if key != "engine"}
+    return digest(code_version("preprocess"), preprocessing_cfg,
+                  feature_rules.get(level4), features_recipe)[:16]
+
+
+def _write_atomic(path, write):
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """
+    Fitted models on disk, one entry per level4:
+        <root>/<level4>/model.txt   LightGBM model text (model.pkl for other estimators)
+        <root>/<level4>/meta.json   feature column order, preprocessing signature, params and
+                                    the weekly fit of the SarimaOutput feature
+    Level4s of a global model share <root>/global/, whose meta.json also holds
+    the pooled columns, sales scales and hierarchy categories; their own entry
+    only records their column order. meta.json is written last, so an entry
+    without it is incomplete and not listed.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._saved_global = None
+        self._global_model = None
+
+    def level4s(self):
+        if not self.root.exists():
+            return []
+        return sorted(path.parent.name for path in self.root.glob("*/meta.json")
+                      if path.parent.name != GLOBAL_ENTRY)
+
+    def _save_model(self, entry_dir, model):
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        booster = getattr(model, "booster_", None)
+        if booster is not None:
+            _write_atomic(entry_dir / "model.txt", lambda path: booster.save_model(str(path)))
+            return "model.txt"
+
+        def dump(path):
+            with open(path, "wb") as openfile:
+                pickle.dump(model, openfile, protocol=pickle.HIGHEST_PROTOCOL)
+        _write_atomic(entry_dir / "model.pkl", dump)
+        return "model.pkl"
+
+    def _save_meta(self, entry_dir, meta):
+        meta = {**meta, "saved_on": datetime.now().isoformat(timespec="seconds")}
+        _write_atomic(entry_dir / "meta.json",
+                      lambda path: path.write_text(json.dumps(meta, indent=2, default=str), encoding="utf-8"))
+
+    def save(self, level4, model, columns, signature, best_params, weekly_fit=None):
+        """
+        Store the fitted model of a level4 with its feature column order, preprocessing
+        signature and the weekly fit its SarimaOutput feature came from (see SarimaPredictor.fits).
+        """
+        entry_dir = self.root / str(level4)
+        global_model = getattr(model, "global_model", None)
+        meta = {"level4": str(level4),
+                "feature_columns": list(columns),
+                "preprocess_signature": signature,
+                "params": best_params,
+                "weekly_fit": weekly_fit}
+
+        if global_model is None:
+            meta["model_file"] = self._save_model(entry_dir, model)
+        else:
+            # The pooled model is stored once per run, however many level4s it serves
+            if self._saved_global is not global_model:
+                self._save_global(global_model, best_params)
+            meta["model_file"] = None
+            meta["global"] = True
+            entry_dir.mkdir(parents=True, exist_ok=True)
+        self._save_meta(entry_dir, meta)
+
+    def _save_global(self, global_model, best_params):
+        entry_dir = self.root / GLOBAL_ENTRY
+        model_file = self._save_model(entry_dir, global_model.model)
+        self._save_meta(entry_dir, {"model_file": model_file,
+                                    "feature_columns": global_model.feature_columns,
+                                    "scaled_columns": global_model.scaled_columns,
+                                    "scales": global_model.scales,
+                                    "categories": global_model.categories,
+                                    "params": best_params})
+        self._saved_global = global_model
+
+    def meta(self, level4):
+        with open(self.root / str(level4) / "meta.json", "r", encoding="utf-8") as openfile:
+            return json.load(openfile)
+
+    def _load_model(self, entry_dir, meta):
+        path = entry_dir / meta["model_file"]
+        if path.suffix == ".txt":
+            return BoosterModel(lgb.Booster(model_file=str(path)), meta["params"])
+        with open(path, "rb") as openfile:
+            return pickle.load(openfile)
+
+    def _load_global(self):
+        if self._global_model is None:
+            entry_dir = self.root / GLOBAL_ENTRY
+            meta = self.meta(GLOBAL_ENTRY)
+            self._global_model = GlobalModel(self._load_model(entry_dir, meta),
+                                             meta["feature_columns"],
+                                             meta["scaled_columns"],
+                                             meta["scales"],
+                                             meta["categories"])
+        return self._global_model
+
+    def load(self, level4, signature=None):
+        """
+        The stored model of a level4 and its meta. A model predicts from the
+        feature columns in meta["feature_columns"] order; a signature differing
+        from the stored one means the features are now built differently.
+        """
+        meta = self.meta(level4)
+        if signature is not None and signature != meta["preprocess_signature"]:
+            logger.warning(f"Registry {level4}: preprocessing changed since the model was trained "
+                           f"on {meta['saved_on']}")
+
+        if meta.get("global"):
+            model = GlobalModelView(self._load_global(), str(level4), meta["feature_columns"])
+        else:
+            model = self._load_model(self.root / str(level4), meta)
+        return model, meta
+
+
+def register_models(registry_dir, best_model, best_params, train_data, preprocessing_cfg, feature_rules, features_recipe,
+                    weekly_fits=None):
+    """
+    Store every model of a training run, with the column order of its training frame
+    and its weekly fit from weekly_fits (level4 -> fit). No-op without registry_dir.
+    """
+    if registry_dir is None:
+        return
+    registry = ModelRegistry(registry_dir)
+    weekly_fits = weekly_fits or {}
+    for level4, model in best_model.items():
+        registry.save(level4,
+                      model,
+                      feature_columns(train_data[level4]),
+                      preprocess_signature(level4, preprocessing_cfg, feature_rules, features_recipe),
+                      best_params[level4],
+                      weekly_fits.get(level4))
+    logger.info(f"Registry: stored {len(best_model)} model(s) in {registry_dir}")
@@ -0,0 +1,329 @@
+import math
+import time
+import numpy as np
+import lightgbm as lgb
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import RandomizedSearchCV, ParameterSampler
+from src.components.training.global_model import PanelTimeSeriesSplit
+
+
+# Search settings used when params.yaml has no search section
+DEFAULT_SEARCH = {
+    "mode": "random",               # random | halving
+    "backend": "sklearn",           # sklearn | native
+    "n_iter": 60,
+    "n_splits": 4,
+    "test_size": 10,
+    "factor": 3,
+    "min_resource": 40,
+    "early_stopping_rounds": 50,
+    "random_state": 100,
+    "n_jobs": -1,
+}
+
+
+def search_settings(params):
+    """The search section of params.yaml on top of DEFAULT_SEARCH."""
+    return {**DEFAULT_SEARCH, **(params.get("search") or {})}
+
+
+def stopping_split(cv, train_idx):
+    """
+    The training part of a fold split again into (fit, stop) indices: its last
+    cv.test_size rows (days for a PanelTimeSeriesSplit) are left for early
+    stopping, so the held-out split of the fold is only scored.
+    """
+    if isinstance(cv, PanelTimeSeriesSplit):
+        dates = cv.dates[train_idx]
+        stop = dates >= np.unique(dates)[-cv.test_size]
+    else:
+        stop = np.arange(len(train_idx)) >= len(train_idx) - cv.test_size
+    return train_idx[~stop], train_idx[stop]
+
+
+def _mae(y_true, y_pred):
+    return float(np.mean(np.abs(np.asarray(y_true, dtype=float) - y_pred)))
+
+
+class SklearnFolds:
+    """Cross-validates candidates by fitting clones of an sklearn-API LightGBM model per fold."""
+
+    # joblib preference: every fit pickles its own copy of the data
+    prefer = "processes"
+
+    def __init__(self, base_model, train_x, train_y, cv):
+        self.base_model = base_model
+        self.train_x = train_x
+        self.train_y = train_y
+        self.folds = list(cv.split(train_x))
+        self.stopping = [stopping_split(cv, train_idx) for train_idx, _ in self.folds]
+
+    def fit_fold(self, fold, candidate, n_estimators, early_stopping_rounds=None):
+        """
+        (held-out MAE, iteration) of one candidate on one fold. With early_stopping_rounds
+        it stops early on the stopping split of the fold (see stopping_split) and is scored
+        on the held-out split at that iteration.
+        """
+        train_idx, test_idx = self.folds[fold]
+        model = clone(self.base_model).set_params(**{**candidate, "n_estimators": n_estimators, "metric": "l1"})
+        if not early_stopping_rounds:
+            model.fit(self.train_x.iloc[train_idx],
+                      self.train_y.iloc[train_idx],
+                      eval_set=[(self.train_x.iloc[test_idx], self.train_y.iloc[test_idx])])
+            return model.best_score_["valid_0"]["l1"], n_estimators
+
+        fit_idx, stop_idx = self.stopping[fold]
+        model.fit(self.train_x.iloc[fit_idx],
+                  self.train_y.iloc[fit_idx],
+                  eval_set=[(self.train_x.iloc[stop_idx], self.train_y.iloc[stop_idx])],
+                  callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+        iteration = model.best_iteration_ or n_estimators
+        predictions = model.predict(self.train_x.iloc[test_idx], num_iteration=iteration)
+        return _mae(self.train_y.iloc[test_idx], predictions), iteration
+
+    def refit(self, params):
+        """The model with params fitted on the whole training set."""
+        return clone(self.base_model).set_params(**params).fit(self.train_x, self.train_y)
+
+
+class BoosterModel:
+    """
+    A Booster trained on the whole training set, with the parts of the sklearn
+    regressor interface the pipeline uses (predict and feature_importances_).
+    """
+
+    def __init__(self, booster, params):
+        self.booster_ = booster
+        self.params = params
+        self.feature_importances_ = booster.feature_importance(importance_type="split")
+        self.n_features_in_ = booster.num_feature()
+
+    def predict(self, X):
+        return self.booster_.predict(X)
+
+    def get_params(self, deep=True):
+        return dict(self.params)
+
+
+class DatasetFolds:
+    """
+    Cross-validates candidates with lgb.train on one pre-binned lgb.Dataset.
+
+    The histogram bins are computed once per level4; every fold is a subset
+    of that Dataset, built once and shared by all candidates and rungs.
+    """
+
+    # lgb.train releases the GIL, and a Dataset cannot be pickled to other processes
+    prefer = "threads"
+
+    def __init__(self, base_params, train_x, train_y, cv):
+        # sklearn-only settings are left out; n_estimators is the number of boosting rounds
+        self.base_params = {k: v for k, v in base_params.items()
+                            if k not in ("n_estimators", "importance_type", "class_weight")}
+        # feature_pre_filter off so candidates can lower min_child_samples on the shared bins
+        self.dataset = lgb.Dataset(train_x,
+                                   train_y,
+                                   params={"feature_pre_filter": False, "verbosity": -1},
+                                   free_raw_data=False).construct()
+        # Raw rows of the held-out splits, scored by predicting when a fold stops early
+        self.train_x = train_x
+        self.train_y = train_y
+        self.folds = []
+        self.stopping = []
+        for train_idx, test_idx in cv.split(train_x):
+            fit_idx, stop_idx = stopping_split(cv, train_idx)
+            self.folds.append((self.dataset.subset(sorted(train_idx)).construct(),
+                               self.dataset.subset(sorted(test_idx)).construct(),
+                               test_idx))
+            self.stopping.append((self.dataset.subset(sorted(fit_idx)).construct(),
+                                  self.dataset.subset(sorted(stop_idx)).construct()))
+
+    def _params(self, candidate):
+        params = {**self.base_params, **candidate, "verbosity": -1}
+        return params, params.pop("n_estimators", 100)
+
+    def fit_fold(self, fold, candidate, n_estimators, early_stopping_rounds=None):
+        """(held-out MAE, iteration) of one candidate on one fold, like SklearnFolds.fit_fold."""
+        train_set, valid_set, test_idx = self.folds[fold]
+        params, _ = self._params(candidate)
+        if not early_stopping_rounds:
+            booster = lgb.train({**params, "metric": "l1"},
+                                train_set,
+                                num_boost_round=n_estimators,
+                                valid_sets=[valid_set])
+            return booster.best_score["valid_0"]["l1"], n_estimators
+
+        fit_set, stop_set = self.stopping[fold]
+        booster = lgb.train({**params, "metric": "l1"},
+                            fit_set,
+                            num_boost_round=n_estimators,
+                            valid_sets=[stop_set],
+                            callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+        iteration = booster.best_iteration or n_estimators
+        predictions = booster.predict(self.train_x.iloc[test_idx], num_iteration=iteration)
+        return _mae(self.train_y.iloc[test_idx], predictions), iteration
+
+    def refit(self, params):
+        """A BoosterModel with params trained on the whole Dataset."""
+        train_params, n_estimators = self._params(params)
+        booster = lgb.train(train_params, self.dataset, num_boost_round=n_estimators)
+        return BoosterModel(booster, {**self.base_params, **params})
+
+
+def fold_evaluator(backend, base_model, train_x, train_y, cv):
+    """SklearnFolds or DatasetFolds for backend "sklearn" or "native"."""
+    if backend == "native":
+        return DatasetFolds(base_model.get_params(), train_x, train_y, cv)
+    if backend == "sklearn":
+        return SklearnFolds(base_model, train_x, train_y, cv)
+    raise ValueError(f"Unknown search backend: {backend}")
+
+
+def _cross_validate(parallel, evaluator, candidates, n_estimators, early_stopping_rounds=None):
+    """
+    Array of shape (candidates, folds, 2) with the held-out MAE and best iteration.
+    n_estimators is one value for all candidates, or None to use each candidate's own.
+    """
+    n_folds = len(evaluator.folds)
+    results = parallel(delayed(evaluator.fit_fold)(fold,
+                                                   candidate,
+                                                   n_estimators or candidate["n_estimators"],
+                                                   early_stopping_rounds)
+                       for candidate in candidates
+                       for fold in range(n_folds))
+    return np.array(results, dtype=float).reshape(len(candidates), n_folds, 2)
+
+
+def random_search(evaluator, param_grid, n_iter=60, random_state=100, n_jobs=-1):
+    """
+    Cross-validate n_iter candidates sampled from param_grid with their own n_estimators,
+    like RandomizedSearchCV, and refit the one with the lowest mean MAE.
+
+    Returns:
+        best_estimator, best_params, stats (dict with n_fits, seconds and best_score, the CV MAE)
+    """
+    start = time.perf_counter()
+    candidates = list(ParameterSampler(param_grid, n_iter=n_iter, random_state=random_state))
+
+    with Parallel(n_jobs=n_jobs, prefer=evaluator.prefer) as parallel:
+        results = _cross_validate(parallel, evaluator, candidates, None)
+    scores = results[:, :, 0].mean(axis=1)
+
+    best = int(np.argmin(scores))
+    best_params = candidates[best]
+    best_estimator = evaluator.refit(best_params)
+
+    stats = {"n_fits": results.shape[0] * results.shape[1] + 1,
+             "seconds": time.perf_counter() - start,
+             "best_score": scores[best]}
+    return best_estimator, best_params, stats
+
+
+def sklearn_random_search(base_model, param_grid, train_x, train_y, cv, n_iter=60, random_state=100, n_jobs=-1):
+    """
+    RandomizedSearchCV over n_iter candidates, refit on the whole training set.
+
+    Returns:
+        best_estimator, best_params, stats (dict with n_fits, seconds and best_score, the CV MAE)
+    """
+    start = time.perf_counter()
+    search = RandomizedSearchCV(
+        estimator=base_model,
+        param_distributions=param_grid,
+        cv=cv,
+        n_jobs=n_jobs,
+        n_iter=n_iter,
+        scoring="neg_mean_absolute_error",
+        random_state=random_state,
+        return_train_score=True
+    )
+    search.fit(train_x, train_y)
+
+    stats = {"n_fits": len(search.cv_results_["params"]) * cv.get_n_splits() + 1,
+             "seconds": time.perf_counter() - start,
+             "best_score": -search.best_score_}
+    return search.best_estimator_, search.best_params_, stats
+
+
+def halving_search(evaluator,
+                   param_grid,
+                   max_resource,
+                   n_iter=60,
+                   factor=3,
+                   min_resource=40,
+                   early_stopping_rounds=50,
+                   random_state=100,
+                   n_jobs=-1):
+    """
+    Successive halving over n_estimators for LightGBM models.
+
+    The same n_iter candidates as random_search (n_estimators excluded) are cross-validated
+    with min_resource trees; the best 1/factor go on with factor times more trees, up to
+    max_resource. Every fold stops early on the last days of its training part and is scored
+    on its held-out split at that iteration, so the CV MAE is comparable with random_search.
+    The winner is refit on the whole training set with the mean best iteration of its last rung.
+
+    Returns:
+        best_estimator, best_params, stats (dict with n_fits, seconds, best_score, rungs and
+        cv_score, the CV MAE of best_params computed like refit_params)
+    """
+    start = time.perf_counter()
+    grid = {k: v for k, v in param_grid.items() if k != "n_estimators"}
+    candidates = list(ParameterSampler(grid, n_iter=n_iter, random_state=random_state)) if grid else [{}]
+
+    n_fits = 0
+    rungs = []
+    rung = 0
+    with Parallel(n_jobs=n_jobs, prefer=evaluator.prefer) as parallel:
+        while True:
+            resource = min(max_resource, min_resource * factor ** rung)
+            results = _cross_validate(parallel, evaluator, candidates, resource, early_stopping_rounds)
+            n_fits += results.shape[0] * results.shape[1]
+            scores = results[:, :, 0].mean(axis=1)
+            rungs.append({"candidates": len(candidates), "n_estimators": resource})
+
+            order = np.argsort(scores, kind="stable")
+            if len(candidates) == 1 or resource == max_resource:
+                break
+            keep = order[:math.ceil(len(candidates) / factor)]
+            candidates = [candidates[i] for i in keep]
+            rung += 1
+
+        best = order[0]
+        best_params = {**candidates[best], "n_estimators": max(1, int(round(results[best, :, 1].mean())))}
+        # The winner with its refit n_estimators and no early stopping, like refit_params validates it
+        validation = _cross_validate(parallel, evaluator, [best_params], None)
+        n_fits += validation.shape[1]
+
+    best_estimator = evaluator.refit(best_params)
+    n_fits += 1
+
+    stats = {"n_fits": n_fits,
+             "seconds": time.perf_counter() - start,
+             "best_score": scores[best],
+             "cv_score": validation[0, :, 0].mean(),
+             "rungs": rungs}
+    return best_estimator, best_params, stats
+
+
+def refit_params(evaluator, params, validate=True, n_jobs=-1):
+    """
+    Refit known params (e.g. the stored result of an earlier search) without searching.
+    With validate, cross-validate them first on the same folds as a search would.
+
+    Returns:
+        best_estimator, params, stats (dict with n_fits, seconds and best_score, NaN when not validated)
+    """
+    start = time.perf_counter()
+    n_fits, score = 0, np.nan
+    if validate:
+        with Parallel(n_jobs=n_jobs, prefer=evaluator.prefer) as parallel:
+            results = _cross_validate(parallel, evaluator, [params], None)
+        n_fits, score = results.shape[1], results[0, :, 0].mean()
+
+    best_estimator = evaluator.refit(params)
+    stats = {"n_fits": n_fits + 1,
+             "seconds": time.perf_counter() - start,
+             "best_score": score}
+    return best_estimator, params, stats
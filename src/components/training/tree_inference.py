@@ -0,0 +1,271 @@
+import numpy as np
+
+
+# Bits of a node's decision_type in the LightGBM model text, and its zero threshold
+CATEGORICAL_MASK = 1
+DEFAULT_LEFT_MASK = 2
+MISSING_ZERO = 1
+ZERO_THRESHOLD = 1e-35
+
+# Objectives whose prediction is the raw score, and those predicting exp(raw score)
+IDENTITY_OBJECTIVES = {"regression", "regression_l1", "huber", "fair", "quantile", "mape"}
+EXP_OBJECTIVES = {"poisson", "gamma", "tweedie"}
+
+# Rows x trees evaluated per vectorized pass
+CHUNK_CELLS = 4_000_000
+
+NODE_ARRAYS = ["feature", "threshold", "decision", "left", "right", "cat_start", "cat_end"]
+
+
+def _fields(lines):
+    return dict(line.split("=", 1) for line in lines if "=" in line)
+
+
+def _array(value, dtype):
+    return np.array(value.split(), dtype=dtype)
+
+
+def _split_model_text(model_text):
+    """Header lines, header fields and tree blocks of a LightGBM model text."""
+    header, _, trees = model_text.partition("\nTree=")
+    header_lines = header.split("\n")
+    return header_lines, _fields(header_lines), trees
+
+
+def unsupported(model_text):
+    """Why the tree evaluator cannot evaluate a model (its LightGBM model text), or None when it can."""
+    header_lines, header, trees = _split_model_text(model_text)
+    objective = header["objective"].split(" ")
+    if int(header["num_tree_per_iteration"]) != 1 or "average_output" in header_lines:
+        return "only single-output gradient boosting models are supported"
+    if not ((objective[0] in IDENTITY_OBJECTIVES and "sqrt" not in objective) or objective[0] in EXP_OBJECTIVES):
+        return f"objective {header['objective']} is not supported"
+    if "\nis_linear=1" in trees:
+        return "linear trees are not supported"
+    return None
+
+
+class TreeEnsemble:
+    """
+    The trees of a LightGBM booster as flat arrays, read from its model text
+    (the arrays LightGBM itself predicts from). Internal nodes of all trees are
+    numbered in one sequence and leaves in another; a child c >= 0 is internal
+    node c, a child c < 0 is leaf ~c. roots holds the root of every tree in the
+    same encoding.
+    """
+
+    def __init__(self, model_text):
+        reason = unsupported(model_text)
+        if reason is not None:
+            raise ValueError(reason)
+        _, header, trees = _split_model_text(model_text)
+        self.transform = np.exp if header["objective"].split(" ")[0] in EXP_OBJECTIVES else None
+        self.feature_names = tuple(header["feature_names"].split(" "))
+
+        parts = {key: [] for key in NODE_ARRAYS}
+        leaf_values, roots, words = [], [], []
+        n_internal = n_leaves = n_words = 0
+        for block in trees.split("\nend of trees")[0].split("\nTree="):
+            tree = _fields(block.split("\n"))
+            leaf_value = _array(tree["leaf_value"], np.float64)
+            leaf_values.append(leaf_value)
+            if int(tree["num_leaves"]) == 1:
+                roots.append(~n_leaves)
+                n_leaves += 1
+                continue
+
+            decision = _array(tree["decision_type"], np.int64)
+            threshold = _array(tree["threshold"], np.float64)
+            cat_start = np.zeros(len(decision), dtype=np.int64)
+            cat_end = np.zeros(len(decision), dtype=np.int64)
+            if int(tree.get("num_cat", "0")) > 0:
+                # The threshold of a categorical node indexes the tree's category bitsets
+                boundaries = _array(tree["cat_boundaries"], np.int64) + n_words
+                categorical = (decision & CATEGORICAL_MASK) > 0
+                cat_index = threshold[categorical].astype(np.int64)
+                cat_start[categorical] = boundaries[cat_index]
+                cat_end[categorical] = boundaries[cat_index + 1]
+                tree_words = _array(tree["cat_threshold"], np.uint32)
+                words.append(tree_words)
+                n_words += len(tree_words)
+
+            for key, name in [("left", "left_child"), ("right", "right_child")]:
+                child = _array(tree[name], np.int64)
+                parts[key].append(np.where(child >= 0, child + n_internal, ~(~child + n_leaves)))
+            parts["feature"].append(_array(tree["split_feature"], np.int64))
+            parts["threshold"].append(threshold)
+            parts["decision"].append(decision)
+            parts["cat_start"].append(cat_start)
+            parts["cat_end"].append(cat_end)
+            roots.append(n_internal)
+            n_internal += len(decision)
+            n_leaves += len(leaf_value)
+
+        for key in NODE_ARRAYS:
+            dtype = np.float64 if key == "threshold" else np.int64
+            setattr(self, key, np.concatenate(parts[key]) if parts[key] else np.zeros(0, dtype=dtype))
+        self.leaf_value = np.concatenate(leaf_values)
+        self.words = np.concatenate(words) if words else np.zeros(0, dtype=np.uint32)
+        self.roots = np.array(roots, dtype=np.int64)
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Flatten a booster, or None for a model this evaluator does not cover (see unsupported)."""
+        model_text = booster.model_to_string()
+        if unsupported(model_text) is not None:
+            return None
+        return cls(model_text)
+
+
+class NodeTable:
+    """
+    The nodes of a group of ensembles with the same feature schema, renumbered
+    into one set of arrays, with the parts of each node's decision that do not
+    depend on the value precomputed. roots[m, t] is the root of tree t of
+    ensemble m; ensembles with fewer trees point their missing trees at leaf 0,
+    of value 0.
+    """
+
+    def __init__(self, ensembles):
+        n_trees = max(len(ensemble.roots) for ensemble in ensembles)
+        self.roots = np.full((len(ensembles), n_trees), ~0, dtype=np.int64)
+        parts = {key: [] for key in NODE_ARRAYS}
+        leaf_values, words = [np.zeros(1)], []
+        n_internal, n_leaves, n_words = 0, 1, 0
+
+        for m, ensemble in enumerate(ensembles):
+            def renumber(child):
+                return np.where(child >= 0, child + n_internal, ~(~child + n_leaves))
+
+            self.roots[m, :len(ensemble.roots)] = renumber(ensemble.roots)
+            parts["left"].append(renumber(ensemble.left))
+            parts["right"].append(renumber(ensemble.right))
+            parts["cat_start"].append(ensemble.cat_start + n_words)
+            parts["cat_end"].append(ensemble.cat_end + n_words)
+            for key in ["feature", "threshold", "decision"]:
+                parts[key].append(getattr(ensemble, key))
+            leaf_values.append(ensemble.leaf_value)
+            words.append(ensemble.words)
+            n_internal += len(ensemble.feature)
+            n_leaves += len(ensemble.leaf_value)
+            n_words += len(ensemble.words)
+
+        feature, threshold, decision, left, right, cat_start, cat_end = (np.concatenate(parts[key])
+                                                                         for key in NODE_ARRAYS)
+        self.feature = feature
+        self.threshold = threshold
+        self.cat_start = cat_start
+        self.cat_end = cat_end
+        self.leaf_value = np.concatenate(leaf_values)
+        self.words = np.concatenate(words).astype(np.int64)
+
+        # child[2 * node + go_left]
+        self.child = np.empty(2 * len(feature), dtype=np.int64)
+        self.child[0::2] = right
+        self.child[1::2] = left
+
+        missing_type = (decision >> 2) & 3
+        self.default_left = (decision & DEFAULT_LEFT_MASK) > 0
+        self.categorical = (decision & CATEGORICAL_MASK) > 0
+        self.zero_missing = (missing_type == MISSING_ZERO) & ~self.categorical
+        # NaN is missing for missing types Zero and NaN and 0.0 for None; NaN categories go right
+        self.nan_left = np.where(missing_type > 0, self.default_left, 0.0 <= threshold) & ~self.categorical
+        self.has_zero_missing = bool(self.zero_missing.any())
+        self.has_categorical = bool(self.categorical.any())
+
+    def go_left(self, node, x):
+        """LightGBM's decision at node for feature value x, elementwise."""
+        left = x <= self.threshold[node]
+        nan = np.isnan(x)
+        if nan.any():
+            left[nan] = self.nan_left[node[nan]]
+
+        if self.has_zero_missing:
+            zero = self.zero_missing[node] & (np.abs(x) <= ZERO_THRESHOLD)
+            if zero.any():
+                left[zero] = self.default_left[node[zero]]
+
+        if self.has_categorical:
+            categorical = np.flatnonzero(self.categorical[node])
+            if categorical.size:
+                cat_node, cat_x = node[categorical], x[categorical]
+                # Negative categories go right too
+                valid = ~np.isnan(cat_x) & (cat_x >= 0)
+                code = np.where(valid, cat_x, 0).astype(np.int64)
+                word = self.cat_start[cat_node] + code // 32
+                valid &= word < self.cat_end[cat_node]
+                bits = self.words[np.where(valid, word, 0)]
+                left[categorical] = valid & (((bits >> (code % 32)) & 1) == 1)
+        return left
+
+    def predict(self, X, model_index):
+        """Raw scores of the rows of X, row i scored by the ensemble model_index[i]."""
+        n_trees = self.roots.shape[1]
+        chunk = max(1, CHUNK_CELLS // n_trees)
+        raw = np.zeros(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk):
+            X_chunk = X[start:start + chunk]
+            flat_x = X_chunk.ravel()
+
+            # One cell per (row, tree); a cell leaves the pass when it reaches a leaf
+            state = self.roots[model_index[start:start + chunk]].ravel()
+            leaf = np.where(state < 0, ~state, 0)
+            active = np.flatnonzero(state >= 0)
+            node = state[active]
+            row_offset = (active // n_trees) * X.shape[1]
+            while active.size:
+                left = self.go_left(node, flat_x[row_offset + self.feature[node]])
+                node = self.child[2 * node + left]
+                reached = node < 0
+                leaf[active[reached]] = ~node[reached]
+                keep = ~reached
+                active, node, row_offset = active[keep], node[keep], row_offset[keep]
+
+            # Tree by tree, in the order LightGBM adds them up
+            values = self.leaf_value[leaf].reshape(len(X_chunk), n_trees)
+            score = np.zeros(len(X_chunk), dtype=np.float64)
+            for t in range(n_trees):
+                score += values[:, t]
+            raw[start:start + chunk] = score
+        return raw
+
+
+def predict_ensembles(items):
+    """
+    Predictions of many models at once: items is {key: (ensemble, X)} with X
+    in the ensemble's feature order. Ensembles with the same feature schema are
+    evaluated together in vectorized passes over all their rows.
+    Returns:
+        predictions (dict): key -> ndarray, equal to Booster.predict(X) (within an ulp for exp objectives)
+    """
+    groups = {}
+    for key, (ensemble, X) in items.items():
+        groups.setdefault((ensemble.feature_names, ensemble.transform), []).append(key)
+
+    predictions = {}
+    for (_, transform), keys in groups.items():
+        table = NodeTable([items[key][0] for key in keys])
+        X = np.concatenate([np.asarray(items[key][1], dtype=np.float64) for key in keys])
+        lengths = [len(items[key][1]) for key in keys]
+        raw = table.predict(X, np.repeat(np.arange(len(keys)), lengths))
+        if transform is not None:
+            raw = transform(raw)
+        for key, part in zip(keys, np.split(raw, np.cumsum(lengths)[:-1])):
+            predictions[key] = part
+    return predictions
+
+
+def predict_boosters(items):
+    """
+    predict_ensembles for {key: (model, X)} of models with a booster_; a model
+    the tree evaluator does not cover is predicted with its own predict.
+    """
+    ensembles, predictions = {}, {}
+    for key, (model, X) in items.items():
+        ensemble = TreeEnsemble.from_booster(model.booster_)
+        if ensemble is None:
+            predictions[key] = model.predict(X)
+        else:
+            ensembles[key] = (ensemble, X)
+    predictions.update(predict_ensembles(ensembles))
+    return predictions
@@ -0,0 +1,102 @@
+import signal
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+
+# Weekly rows per Jalali year: weeks 1..53 of (Year, WeekofYear), the last one partial
+SEASON_LENGTH = 53
+
+
+@contextmanager
+def time_budget(seconds):
+    """
+    Raise TimeoutError in the block after seconds. Uses SIGALRM, so the budget is
+    only enforced on the main thread of a Unix process (Pool workers included).
+    """
+    if (not seconds or not hasattr(signal, "SIGALRM")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def _raise(signum, frame):
+        raise TimeoutError(f"time budget of {seconds}s exceeded")
+
+    previous = signal.signal(signal.SIGALRM, _raise)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _as_forecast(values, n_obs):
+    """Forecast Series indexed by position after the sample, like SARIMAX results.forecast."""
+    values = np.asarray(values, dtype=float)
+    return pd.Series(values, index=pd.RangeIndex(n_obs, n_obs + len(values)), name="predicted_mean")
+
+
+def fourier_terms(t, period=SEASON_LENGTH, K=4):
+    """Sine/cosine pairs of the first K harmonics of period, one row per t."""
+    t = np.asarray(t, dtype=float)[:, None]
+    k = np.arange(1, K + 1)[None, :]
+    return np.hstack([np.sin(2 * np.pi * k * t / period), np.cos(2 * np.pi * k * t / period)])
+
+
+def fourier_arma_forecast(weekly_sales, steps, fourier_k=4):
+    """
+    ARMA(1,1) with a linear trend and Fourier regressors for the yearly cycle.
+    Replaces the 53-lag seasonal state space with 2 * fourier_k coefficients.
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    n_obs = len(weekly_sales)
+    X = fourier_terms(np.arange(n_obs + steps), K=fourier_k)
+    model = SARIMAX(np.asarray(weekly_sales, dtype=float), exog=X[:n_obs], order=(1, 0, 1), trend="ct")
+    fit_result = model.fit(disp=False)
+    return _as_forecast(fit_result.forecast(steps, exog=X[n_obs:]), n_obs)
+
+
+def ets_forecast(weekly_sales, steps):
+    """Additive Holt-Winters with a damped trend; needs two full years of weeks."""
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    if len(weekly_sales) < 2 * SEASON_LENGTH:
+        raise ValueError(f"ets needs {2 * SEASON_LENGTH} weeks, got {len(weekly_sales)}")
+    model = ExponentialSmoothing(np.asarray(weekly_sales, dtype=float),
+                                 trend="add",
+                                 damped_trend=True,
+                                 seasonal="add",
+                                 seasonal_periods=SEASON_LENGTH)
+    return _as_forecast(model.fit().forecast(steps), len(weekly_sales))
+
+
+def seasonal_naive_forecast(weekly_sales, steps, level_weeks=8):
+    """
+    Same week last year, scaled by how the last level_weeks compare with the
+    same weeks a year earlier. With less than a year of history, the mean of
+    the last 4 weeks.
+    """
+    values = np.asarray(weekly_sales, dtype=float)
+    n_obs = len(values)
+    if n_obs < SEASON_LENGTH + level_weeks:
+        return _as_forecast(np.repeat(values[-4:].mean(), steps), n_obs)
+
+    recent = values[-level_weeks:].sum()
+    year_before = values[-level_weeks - SEASON_LENGTH:-SEASON_LENGTH].sum()
+    ratio = np.clip(recent / year_before, 0.5, 2.0) if year_before > 0 else 1.0
+
+    positions = np.arange(n_obs, n_obs + steps) - SEASON_LENGTH
+    # Horizons beyond a full season reuse the last observed season
+    positions = np.where(positions >= n_obs, positions - SEASON_LENGTH, positions)
+    return _as_forecast(values[positions] * ratio, n_obs)
+
+
+# Engines other than "sarimax", which lives in SarimaPredictor for its warm start
+WEEKLY_ENGINES = {
+    "fourier_arma": fourier_arma_forecast,
+    "ets": ets_forecast,
+    "seasonal_naive": seasonal_naive_forecast,
+}
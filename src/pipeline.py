@@ -0,0 +1,532 @@
+"""
+Stages of the forecast runs: one Level4 (run), all Level4 IDs (batch) and
+inference from the model registry (predict).
+
+Each stage imports its components when it runs, so starting the CLI, a Pool
+worker or the plots does not load statsmodels, LightGBM or scikit-learn before
+a stage needs them. The Settings of the run are read once by the entry point
+and handed to the workers by init_worker.
+"""
+import os
+import time
+import importlib
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from src import logger, setup_logging
+
+
+# Modules of the stages, imported before a fork Pool so the workers share them
+STAGE_MODULES = ["src.components.data_fetching",
+                 "src.components.MA_Sarima",
+                 "src.components.preprocessing",
+                 "src.components.model_trainer",
+                 "src.components.model_evaluation",
+                 "src.components.training.registry"]
+
+# Per-process Run of the Pool workers, set by init_worker
+_WORKER = {}
+
+
+class Run:
+    """The settings of a run with the per-process objects built from them."""
+
+    def __init__(self, settings, budget):
+        self.settings = settings
+        self.config = settings.config
+        self.budget = budget
+        self.checkpoints = settings.checkpoints()
+        self.source = settings.data_source()
+
+
+def start_process(settings, budget):
+    """Logging, BLAS threads and connection pool of the current process."""
+    from src.utils.cores import limit_blas
+    from src.components.fetching.connection import configure_pool
+
+    setup_logging()
+    limit_blas(budget["blas_threads"])
+    configure_pool(settings.config["data_fetching"]["pool_size"],
+                   settings.config["data_fetching"]["max_overflow"])
+    return Run(settings, budget)
+
+
+def preload_stages():
+    """With the fork start method, import the stage modules once in the parent instead of in every worker."""
+    if multiprocessing.get_start_method() == "fork":
+        for module in STAGE_MODULES:
+            importlib.import_module(module)
+
+
+@contextmanager
+def stage(name):
+    logger.info(f"--- Stage {name} started ---")
+    try:
+        yield
+    except Exception as e:
+        logger.exception(e)
+        raise e
+    logger.info(f"--- Stage {name} completed ---\n\n")
+
+
+# ====== Stages =====
+def fetch(run, level4, data=None):
+    """Train and forecast frames of a level4, from data (its bulk-fetched tuple) or the source."""
+    from src.components.data_fetching import DataFetching
+    from src.components.fetching.connection import connection_stats
+
+    settings, config = run.settings, run.config
+    data_fetching = DataFetching(config["data_fetching"]["server_name"],
+                                 config["data_fetching"]["database_name"],
+                                 settings.start_forecast,
+                                 settings.end_forecast,
+                                 level4,
+                                 data,
+                                 cache_dir = config["data_fetching"]["cache_dir"],
+                                 full_reload = settings.full_reload,
+                                 lookback_days = config["data_fetching"]["cache_lookback_days"],
+                                 source = run.source
+                                 )
+
+    # Only bulk-fetched data is checkpointed: it is part of the key, so a changed read is never
+    # served from the store. Without it the rows come from the source, which the key cannot see.
+    if data is None:
+        fetched = data_fetching.run()
+    else:
+        fetched = run.checkpoints.run("fetch",
+                                      level4,
+                                      (level4, settings.start_forecast, settings.end_forecast, data,
+                                       config["data_fetching"]),
+                                      data_fetching.run)
+    stats = connection_stats(reset=True)
+    logger.info(f"Level4 {level4} fetch: {stats['queries']} queries, "
+                f"{stats['new_connections']} new connections, "
+                f"connect {stats['connect_time']:.2f}s, query {stats['query_time']:.2f}s")
+    return fetched
+
+
+def sarima(run, level4, train_data, forecast_data, forecast_date, weekly_fit=None):
+    """
+    forecast_data with the SarimaOutput column of the weekly stage, and the weekly
+    fits it was forecast with (level4 -> fit, see SarimaPredictor.fits). A weekly_fit
+    stored with the level4's model is reused instead of fitting.
+    """
+    from src.components.MA_Sarima import SarimaPredictor
+
+    settings, config = run.settings, run.config
+    sm_predictor = SarimaPredictor(config["sarima"]["params_dir"],
+                                   config["sarima"]["warm_start"],
+                                   config["sarima"]["refit_every_days"],
+                                   force_refit = settings.sarima_refit,
+                                   engines = config["sarima"]["engines"],
+                                   time_budget_seconds = config["sarima"]["time_budget_seconds"],
+                                   fourier_k = config["sarima"]["fourier_k"],
+                                   weekly_fits = None if weekly_fit is None else {level4: weekly_fit})
+
+    def forecast():
+        forecast_data_sarima = sm_predictor(train_data,
+                                            forecast_data,
+                                            forecast_date,
+                                            steps = settings.sarima_steps)
+        return forecast_data_sarima, sm_predictor.fits
+
+    # A fit from scratch, a warm start from the stored parameters or the fit of the model
+    return run.checkpoints.run("sarima",
+                               level4,
+                               (train_data, forecast_data, config["sarima"], settings.sarima_steps,
+                                sm_predictor.fit_state(level4), weekly_fit),
+                               forecast)
+
+
+def preprocess(run, level4, train_data, forecast_data):
+    """The preprocessed train and forecast frames of a level4 (dicts keyed by level4)."""
+    from src.components.preprocessing import Preprocessing
+
+    settings, config = run.settings, run.config
+    preprocessing = Preprocessing(train_data,
+                                  forecast_data,
+                                  config["preprocessing"]["features_to_keep"],
+                                  config["preprocessing"]["sin_features"],
+                                  config["preprocessing"]["features_to_dummies"],
+                                  config["preprocessing"]["MA_variations"],
+                                  config["preprocessing"]["T_variations"],
+                                  settings.feature_rules,
+                                  settings.features_recipe,
+                                  settings.feature_plans,
+                                  config["preprocessing"]["engine"],
+                                  config["preprocessing"]["dtypes"]
+                                  )
+    return run.checkpoints.run("preprocess",
+                               level4,
+                               (train_data, forecast_data,
+                                config["preprocessing"],
+                                settings.feature_rules.get(level4),
+                                settings.features_recipe),
+                               preprocessing.preprocess_data)
+
+
+def train(run, key, train_data_processed, budget, global_model=False, weekly_fits=None):
+    """
+    Search, fit and register the models of train_data_processed: one per level4,
+    or one pooled model when global_model. key names the checkpoint ("global" or the level4).
+    weekly_fits (level4 -> fit of the weekly stage) are registered with the models.
+    Returns:
+        best_model (dict), best_params (dict), feature_importances (dict)
+    """
+    from src.components.model_trainer import ModelTrainig, GlobalModelTrainig
+    from src.components.training.registry import register_models
+    from src.components.training.params_store import reuse_state
+
+    settings, config = run.settings, run.config
+    # The stored params and their re-search schedule decide between a search and a refit
+    key_parts = (train_data_processed, config["training"], settings.params, settings.model_name,
+                 reuse_state(config["training"]["params_store"], "global" if global_model else key))
+    if global_model:
+        trainer = GlobalModelTrainig(train_data_processed,
+                                     config["training"]["validation_size"],
+                                     config["training"]["models"],
+                                     settings.model_name,
+                                     settings.params,
+                                     settings.features_recipe,
+                                     config["training"]["params_store"],
+                                     force_search = settings.params_research,
+                                     n_jobs = budget["search_jobs"],
+                                     model_threads = budget["lgb_threads"]
+                                     )
+        key_parts += (settings.features_recipe,)
+    else:
+        trainer = ModelTrainig(train_data_processed,
+                               config["training"]["validation_size"],
+                               config["training"]["models"],
+                               settings.model_name,
+                               settings.params,
+                               config["training"]["params_store"],
+                               force_search = settings.params_research,
+                               n_jobs = budget["search_jobs"],
+                               model_threads = budget["lgb_threads"]
+                               )
+
+    best_model, best_params, feature_importances = run.checkpoints.run("train", key, key_parts, trainer.run_training)
+
+    register_models(config["training"]["registry_dir"],
+                    best_model,
+                    best_params,
+                    train_data_processed,
+                    config["preprocessing"],
+                    settings.feature_rules,
+                    settings.features_recipe,
+                    weekly_fits)
+    return best_model, best_params, feature_importances
+
+
+def evaluate(run, best_model, best_params, train_data_processed, forecast_data_processed, feature_importances):
+    """Forecasts of the trained models (level4 -> frame), saved per level4 as the output mode says."""
+    from src.components.model_evaluation import ModelEvaluation
+
+    config = run.config
+    evaluator = ModelEvaluation(best_model,
+                                best_params,
+                                train_data_processed,
+                                forecast_data_processed,
+                                feature_importances,
+                                config["training"]["validation_size"],
+                                config["output"]["mode"],
+                                run.settings.output_dir
+                                )
+    return evaluator.run_evaluation()
+
+
+def prepare_level4(run, level4, data=None, weekly_fit=None):
+    """Fetch, Sarima and preprocessing stages of one Level4_ID.
+
+    Returns:
+        train_data_processed (dict), forecast_data_processed (dict), weekly_fits (dict)
+    """
+    train_data, forecast_data, forecast_date = fetch(run, level4, data)
+    forecast_data, weekly_fits = sarima(run, level4, train_data, forecast_data, forecast_date, weekly_fit)
+    return (*preprocess(run, level4, train_data, forecast_data), weekly_fits)
+
+
+# ====== Pool workers =====
+def init_worker(settings, calendar, budget):
+    """Pool initializer: share the run's settings, calendar tables and core budget with the worker."""
+    from src.components.fetching.calendar import set_calendar
+
+    set_calendar(calendar)
+    _WORKER["run"] = start_process(settings, budget)
+
+
+def prepare_task(task):
+    """
+    Pool task of the global mode and the predict run: the prepare_level4 frames of one
+    Level4_ID, or None if it failed. task is (level4, data) or (level4, data, weekly_fit).
+    """
+    level4, data, *weekly_fit = task
+    try:
+        return level4, prepare_level4(_WORKER["run"], level4, data, *weekly_fit)
+    except Exception:
+        traceback.print_exc()
+        return level4, None
+
+
+def process_level4(task):
+    """Process one Level4_ID independently.
+
+    task is (level4, data) where data is the bulk-fetched tuple for the level4,
+    or None to let the worker query it itself.
+
+    Returns:
+        level4, status message, forecast frame (None if the level4 failed)
+    """
+    level4, data = task
+    run = _WORKER["run"]
+    try:
+        train_data_processed, forecast_data_processed, weekly_fits = prepare_level4(run, level4, data)
+        best_model, best_params, feature_importances = train(run, level4, train_data_processed, run.budget,
+                                                             weekly_fits = weekly_fits)
+        outputs = evaluate(run, best_model, best_params, train_data_processed, forecast_data_processed,
+                           feature_importances)
+
+        if level4 in outputs:
+            return level4, f"✅ Level4 {level4} completed successfully.", outputs[level4]
+        else:
+            return level4, f"⚠️ Level4 {level4} finished, but produced no forecast.", None
+
+    except Exception as e:
+        traceback.print_exc()
+        return level4, f"❌ Level4 {level4} failed: {e}", None
+
+
+# ====== Runs =====
+def run_single(settings, level4):
+    """Every stage of one Level4_ID in this process, with the whole core budget for the search."""
+    budget = settings.core_budget(n_tasks = 1)
+    run = start_process(settings, budget)
+    config = run.config
+
+    with stage("Data Fetching"):
+        train_data, forecast_data, forecast_date = fetch(run, level4)
+
+    with stage("Sarima Prediction"):
+        forecast_data, weekly_fits = sarima(run, level4, train_data, forecast_data, forecast_date)
+
+    with stage("Preprocessing"):
+        train_data_processed, forecast_data_processed = preprocess(run, level4, train_data, forecast_data)
+
+    with stage("Model Training"):
+        best_model, best_params, feature_importances = train(run, level4, train_data_processed, budget,
+                                                             config["training"]["mode"] == "global",
+                                                             weekly_fits)
+
+    with stage("Model Evaluation"):
+        evaluate(run, best_model, best_params, train_data_processed, forecast_data_processed, feature_importances)
+
+        if config["output"]["mode"] == "full":
+            from src.components.reporting import render_plots
+            render_plots(settings.output_dir, [level4], config["training"]["validation_size"])
+
+
+def _read_panels(run, level4_ids):
+    """The run's calendar tables and the Pool tasks of level4_ids, with their panels when bulk fetching."""
+    from src.components.fetching.calendar import read_calendar_data, set_calendar
+    from src.components.fetching.read_sql import read_sql_data_bulk
+
+    settings, config = run.settings, run.config
+    print("🔄 Reading forecast and long weekend calendars...")
+    calendar = read_calendar_data(run.source, settings.start_forecast, settings.end_forecast)
+    set_calendar(calendar)
+
+    if settings.bulk_fetch:
+        print("🔄 Reading training, validation and event data for all Level4 IDs...")
+        panel = read_sql_data_bulk(run.source,
+                                   level4_ids,
+                                   settings.start_forecast,
+                                   settings.end_forecast,
+                                   config["data_fetching"]["cache_dir"],
+                                   settings.full_reload,
+                                   config["data_fetching"]["cache_lookback_days"])
+        tasks = [(level4, panel.get(str(level4))) for level4 in level4_ids]
+        del panel
+    else:
+        tasks = [(level4, None) for level4 in level4_ids]
+    return calendar, tasks
+
+
+def _pool(settings, calendar, budget):
+    from multiprocessing import Pool
+
+    preload_stages()
+    return Pool(processes = budget["workers"],
+                initializer = init_worker,
+                initargs = (settings, calendar, budget))
+
+
+def _write_output(run, output_df, path):
+    """Save the combined forecasts to path and, when the run says so, to the database."""
+    output_df.to_csv(path, index=False)
+    print(f"✅ All results combined and saved to {path}")
+
+    if run.settings.write_to_db:
+        from src.components.fetching.write_sql import write_frame
+
+        print("🔄 Writing combined results back to database...")
+        db_output = run.config["output"]["database"]
+        write_stats = write_frame(output_df,
+                                  db_output["table"],
+                                  run.source.connection_string,
+                                  chunksize = db_output["chunksize"],
+                                  staging_table = db_output["staging_table"],
+                                  key_columns = db_output["key_columns"])
+        print(f"✅ {write_stats['rows']} rows written to database successfully "
+              f"({write_stats['rows_per_second']:,.0f} rows/s, {write_stats['replaced']} rows replaced).")
+
+
+def run_batch(settings):
+    """All Level4 IDs of the source, one Pool task each (or pooled into one global model)."""
+    import jdatetime as jdt
+    from tqdm import tqdm
+    from src.components.result_sink import ForecastSink
+
+    run = start_process(settings, settings.core_budget(workers = settings.config["resources"]["workers"]))
+    config = run.config
+    settings.output_dir.mkdir(exist_ok=True)
+
+    removed = run.checkpoints.prune(config["checkpoints"]["max_age_days"])
+    if removed:
+        print(f"🧹 Removed {removed} stale checkpoint(s).")
+
+    # === Load initial data for Level4 IDs ===
+    print("🔄 Reading initial Level4 IDs from database...")
+    level4_ids = run.source.read_level4_ids()
+    print(f"✅ Found {len(level4_ids)} unique Level4 IDs.\n")
+
+    calendar, tasks = _read_panels(run, level4_ids)
+
+    # === Split the cores between workers, search jobs and LightGBM threads ===
+    budget = settings.core_budget(n_tasks = len(level4_ids), workers = config["resources"]["workers"])
+    print(f"🚀 Starting multiprocessing with {budget['workers']} processes, "
+          f"{budget['search_jobs']} search jobs and {budget['lgb_threads']} LightGBM thread(s) each...\n")
+
+    # Forecasts are written as the level4s finish, while the others are still training
+    sink = ForecastSink(settings.target_month, settings.forecasts_dir("batch"))
+
+    with _pool(settings, calendar, budget) as pool:
+        if config["training"]["mode"] == "global":
+            prepared = list(tqdm(pool.imap_unordered(prepare_task, tasks),
+                                 total=len(level4_ids),
+                                 ascii=True))
+        else:
+            for level4, message, forecast_output in tqdm(pool.imap_unordered(process_level4, tasks),
+                                                         total=len(level4_ids),
+                                                         ascii=True):
+                if forecast_output is not None:
+                    sink.add(level4, forecast_output)
+                else:
+                    print(message)
+
+    # === Train one pooled model for all Level4 IDs ===
+    if config["training"]["mode"] == "global":
+        train_data_processed, forecast_data_processed, weekly_fits = {}, {}, {}
+        for level4, frames in prepared:
+            if frames is not None:
+                train_data_processed.update(frames[0])
+                forecast_data_processed.update(frames[1])
+                weekly_fits.update(frames[2])
+        del prepared
+
+        print(f"🔄 Training the global model on {len(train_data_processed)} Level4 IDs...")
+        best_model, best_params, feature_importances = train(run, "global", train_data_processed,
+                                                             settings.core_budget(n_tasks = 1), global_model=True,
+                                                             weekly_fits=weekly_fits)
+        for level4, forecast_output in evaluate(run, best_model, best_params, train_data_processed,
+                                                forecast_data_processed, feature_importances).items():
+            sink.add(level4, forecast_output)
+
+    # === Combine the forecasts of all Level4 IDs ===
+    print("\n📂 Combining all forecasts...")
+    _write_output(run, sink.collect(jdt.date.today().isoformat()), settings.output_dir / "total_output.csv")
+
+    # === Plots, once the numbers are out, at low priority ===
+    if config["output"]["mode"] == "full":
+        from src.components.reporting import render_plots
+
+        print("🔄 Rendering plots...")
+        os.nice(10)
+        rendered = render_plots(settings.output_dir, [str(level4) for level4 in level4_ids],
+                                config["training"]["validation_size"])
+        print(f"✅ Plots of {rendered} Level4 IDs rendered.")
+
+
+def run_predict(settings):
+    """
+    Inference-only forecast of the Level4 IDs in the model registry: fetched,
+    run through the weekly stage with the weekly fit stored with each model and
+    preprocessed like the batch run, then forecast with the stored models,
+    without search or training.
+    """
+    import jdatetime as jdt
+    from tqdm import tqdm
+    from src.components.model_evaluation import ModelEvaluation
+    from src.components.result_sink import ForecastSink
+    from src.components.training.registry import ModelRegistry, align_features, preprocess_signature
+
+    start = time.perf_counter()
+    run = start_process(settings, settings.core_budget(workers = settings.config["resources"]["workers"]))
+    config = run.config
+    settings.output_dir.mkdir(exist_ok=True)
+
+    registry = ModelRegistry(config["training"]["registry_dir"])
+    level4_ids = registry.level4s()
+    print(f"✅ Found {len(level4_ids)} Level4 IDs in the model registry.\n")
+
+    calendar, tasks = _read_panels(run, level4_ids)
+    budget = settings.core_budget(n_tasks = len(level4_ids), workers = config["resources"]["workers"])
+
+    # The SARIMA parameters the models were trained with are filtered, not fitted again
+    weekly_fits = {level4: registry.meta(level4).get("weekly_fit") for level4 in level4_ids}
+    missing = [level4 for level4, weekly_fit in weekly_fits.items() if weekly_fit is None]
+    if missing:
+        logger.warning(f"Registry: {len(missing)} Level4 IDs have no stored weekly fit and are fitted again: {missing}")
+    tasks = [(level4, data, weekly_fits[level4]) for level4, data in tasks]
+
+    # === Fetch, Sarima and preprocessing, as in the batch run ===
+    print(f"🚀 Preparing the Level4 IDs with {budget['workers']} processes...\n")
+    with _pool(settings, calendar, budget) as pool:
+        prepared = list(tqdm(pool.imap_unordered(prepare_task, tasks),
+                             total=len(level4_ids),
+                             ascii=True))
+
+    # === Load the stored models ===
+    best_model, best_params, train_data_processed, forecast_data_processed = {}, {}, {}, {}
+    for level4, frames in prepared:
+        if frames is None:
+            continue
+        level4 = str(level4)
+        try:
+            signature = preprocess_signature(level4, config["preprocessing"], settings.feature_rules,
+                                             settings.features_recipe)
+            model, meta = registry.load(level4, signature)
+            forecast_data_processed[level4] = align_features(frames[1][level4], meta["feature_columns"])
+        except Exception as e:
+            logger.exception(e)
+            print(f"❌ Level4 {level4} skipped: {e}")
+            continue
+        best_model[level4] = model
+        best_params[level4] = meta["params"]
+        train_data_processed[level4] = frames[0][level4]
+    del prepared
+
+    # === Forecast ===
+    evaluator = ModelEvaluation(best_model,
+                                best_params,
+                                train_data_processed,
+                                forecast_data_processed,
+                                {},
+                                config["training"]["validation_size"]
+                                )
+    sink = ForecastSink(settings.target_month, settings.forecasts_dir("predict"))
+    for level4, forecast_output in evaluator.forecast_frames().items():
+        sink.add(level4, forecast_output)
+
+    print(f"✅ {len(best_model)} Level4 IDs forecast in {time.perf_counter() - start:.1f}s")
+    _write_output(run, sink.collect(jdt.date.today().isoformat()), settings.output_dir / "total_output.csv")
@@ -0,0 +1,130 @@
+"""
+Run settings, read once per run and passed down.
+
+config.yaml, params.yaml, the feature rules and recipe and the compiled feature
+plans are read by Settings.load in the entry point, together with the options
+of the run and its forecast window. Settings is plain data, so the Pool workers
+get it from their initializer instead of reading the files again.
+"""
+import os
+import json
+import datetime
+from pathlib import Path
+import jdatetime as jdt
+from src import OUTPUT_DIR
+from src.utils.utils import read_yaml
+
+
+def forecast_window(date=None, sarima_steps=9):
+    """
+    First and last day of the forecast: date (YYYYMMDD int), 15 days ago by
+    default, and sarima_steps weeks after it.
+    """
+    if date is None:
+        date = (jdt.date.today() - jdt.timedelta(days = 15)).strftime('%Y%m%d')
+    start_forecast = jdt.datetime.strptime(str(date), '%Y%m%d')
+    return start_forecast, start_forecast + jdt.timedelta(days = sarima_steps * 7)
+
+
+class Settings:
+
+    def __init__(self,
+                 config,
+                 params,
+                 feature_rules,
+                 features_recipe,
+                 feature_plans,
+                 model_name="lgb",
+                 date=None,             # Either None or int (e.g. 14040301)
+                 sarima_steps=9,        # Number of steps for Sarima prediction
+                 full_reload=False,     # Ignore the local data cache and reload the full history
+                 sarima_refit=False,    # Ignore the stored SARIMA parameters and fit from scratch
+                 params_research=False, # Search hyperparameters even when the stored best params could be reused
+                 bulk_fetch=True,       # Fetch all Level4 IDs with one query per table instead of per worker
+                 write_to_db=False,
+                 target_month=140412,
+                 output_dir=OUTPUT_DIR):
+
+        self.config = config
+        self.params = params
+        self.feature_rules = feature_rules
+        self.features_recipe = features_recipe
+        self.feature_plans = feature_plans
+        self.model_name = model_name
+        self.sarima_steps = sarima_steps
+        self.full_reload = full_reload
+        self.sarima_refit = sarima_refit
+        self.params_research = params_research
+        self.bulk_fetch = bulk_fetch
+        self.write_to_db = write_to_db
+        self.target_month = target_month
+        self.output_dir = Path(output_dir)
+        self.start_forecast, self.end_forecast = forecast_window(date, sarima_steps)
+
+    @classmethod
+    def load(cls,
+             config_path="config/config.yaml",
+             params_path="params.yaml",
+             rules_path="feature_rules.json",
+             recipe_path="features_recipe.json",
+             **options):
+        """Read the configuration files of a run; options are the keyword arguments of Settings."""
+        from src.components.Preprocess.plans import load_feature_plans
+
+        config = read_yaml(Path(config_path))
+        with open(recipe_path, 'r') as openfile:
+            features_recipe = json.load(openfile)
+        with open(rules_path, 'r') as openfile:
+            feature_rules = json.load(openfile)
+
+        # Compiled once per rules/recipe/config change, cached in feature_rules.plans.json
+        feature_plans = load_feature_plans(rules_path,
+                                           config["preprocessing"],
+                                           feature_rules,
+                                           features_recipe)
+
+        return cls(config,
+                   read_yaml(Path(params_path)),
+                   feature_rules,
+                   features_recipe,
+                   feature_plans,
+                   **options)
+
+    def checkpoints(self):
+        """
+        The checkpoint store of the run. A stage the run forces to recompute is
+        left out: a full reload always queries the database, a SARIMA refit
+        always fits and a params research always searches.
+        """
+        from src.components.checkpoints import CheckpointStore
+
+        forced = {"fetch": self.full_reload, "sarima": self.sarima_refit, "train": self.params_research}
+        return CheckpointStore(self.config["checkpoints"]["dir"],
+                               [stage for stage in self.config["checkpoints"]["stages"]
+                                if not forced.get(stage, False)])
+
+    def forecasts_dir(self, run_name):
+        """
+        Parquet dataset of the forecasts of one run (output.forecasts_dir, under
+        output_dir unless absolute): a new <run_name>-<time> directory per run,
+        so a run never removes the parts of another. None when disabled.
+        """
+        forecasts_dir = self.config["output"]["forecasts_dir"]
+        if forecasts_dir is None:
+            return None
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return self.output_dir / forecasts_dir / f"{run_name}-{stamp}-{os.getpid()}"
+
+    def data_source(self):
+        from src.components.fetching.sources import data_source_from_config
+
+        return data_source_from_config(self.config["data_fetching"])
+
+    def core_budget(self, n_tasks=None, workers=None):
+        from src.utils.cores import allocate_cores
+
+        return allocate_cores(self.config["resources"]["total_cores"],
+                              n_tasks = n_tasks,
+                              workers = workers,
+                              lgb_threads = self.config["resources"]["lgb_threads"],
+                              blas_threads = self.config["resources"]["blas_threads"])
@@ -0,0 +1,53 @@
+import os
+from threadpoolctl import threadpool_limits
+
+
+def available_cores():
+    """Cores this process may run on (the affinity mask where supported)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def allocate_cores(total_cores=None,
+                   n_tasks=None,
+                   workers=None,
+                   lgb_threads=None,
+                   blas_threads=1):
+    """
+    Split one core budget between the three nested levels of parallelism, so that
+    workers * search_jobs * lgb_threads never exceeds total_cores.
+
+    Level4s are independent, so the Pool workers get the cores first (one per task
+    at most); each worker's share then goes to the hyperparameter search, which runs
+    candidates and folds in parallel, with single-threaded LightGBM fits.
+
+    Args:
+        total_cores (int): cores the run may use. None for all but one.
+        n_tasks (int): number of level4s, None when unknown.
+        workers (int): Pool processes. None to derive from total_cores and n_tasks.
+        lgb_threads (int): LightGBM threads per fit. None for 1.
+        blas_threads (int): BLAS threads per process (numpy, statsmodels).
+
+    Returns:
+        budget (dict): total_cores, workers, search_jobs, lgb_threads and blas_threads.
+    """
+    total_cores = max(1, total_cores or available_cores() - 1)
+    if workers is None:
+        workers = min(total_cores, n_tasks) if n_tasks else total_cores
+    workers = max(1, min(workers, total_cores))
+    lgb_threads = max(1, min(lgb_threads or 1, total_cores // workers))
+    search_jobs = max(1, total_cores // (workers * lgb_threads))
+
+    return {"total_cores": total_cores,
+            "workers": workers,
+            "search_jobs": search_jobs,
+            "lgb_threads": lgb_threads,
+            "blas_threads": blas_threads}
+
+
+def limit_blas(threads):
+    """Cap the BLAS thread pools (OpenBLAS, MKL...) of this process for the rest of its life."""
+    if threads is not None:
+        threadpool_limits(limits=threads, user_api="blas")
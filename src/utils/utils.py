@@ -4,10 +4,9 @@ import yaml
 import numpy as np
 from typing import List
 import jdatetime as jdt
-import matplotlib.pyplot as plt
 from src import logger
-from sklearn.metrics import mean_squared_error, r2_score
 import os
+from functools import lru_cache
 
 
 
@@ -35,9 +34,78 @@ def get_year_week(jdate: jdt.datetime) -> int:
         return (delta_days // 7) + 1
 
 
-def to_jdatetime(dates: pd.Series) -> pd.Series:
-    """Convert YYYYMMDD integers to jdatetime objects."""
-    return [jdt.datetime.strptime(str(x), "%Y%m%d") for x in dates]
+# Closed range of PersianInt dates covered by the calendar index
+CALENDAR_FIRST_YEAR = 1390
+CALENDAR_LAST_YEAR = 1430
+
+
+@lru_cache(maxsize=None)
+def jalali_calendar_index(first_year: int = CALENDAR_FIRST_YEAR,
+                          last_year: int = CALENDAR_LAST_YEAR) -> dict:
+    """
+    Precomputed calendar of every Jalali day from first_year to last_year, built once per process.
+
+    Returns a dict of aligned NumPy arrays sorted by "key" (the YYYYMMDD integer):
+    "gregorian" (datetime64[D]), "year", "month", "day", "weekday" (jdatetime
+    weekday, Saturday = 0), "day_of_year" (1-based) and "week_of_year" (same as
+    get_year_week).
+    """
+    first = jdt.date(first_year, 1, 1)
+    n_days = (jdt.date(last_year + 1, 1, 1) - first).days
+
+    year = np.empty(n_days, dtype=np.int16)
+    month = np.empty(n_days, dtype=np.int8)
+    day = np.empty(n_days, dtype=np.int8)
+    day_of_year = np.empty(n_days, dtype=np.int16)
+
+    i = 0
+    for y in range(first_year, last_year + 1):
+        is_leap = jdt.date(y, 1, 1).isleap()
+        year_start = i
+        for m in range(1, 13):
+            days_in_month = 30 if (m == 12 and is_leap) else jdt.j_days_in_month[m - 1]
+            year[i:i + days_in_month] = y
+            month[i:i + days_in_month] = m
+            day[i:i + days_in_month] = np.arange(1, days_in_month + 1)
+            i += days_in_month
+        day_of_year[year_start:i] = np.arange(1, i - year_start + 1)
+
+    gregorian = np.datetime64(first.togregorian(), "D") + np.arange(n_days)
+    # 1970-01-01 was a Thursday, which is weekday 5 when Saturday is 0
+    weekday = ((gregorian.astype(np.int64) + 5) % 7).astype(np.int8)
+
+    return {"key": year.astype(np.int64) * 10000 + month.astype(np.int64) * 100 + day,
+            "gregorian": gregorian,
+            "year": year,
+            "month": month,
+            "day": day,
+            "weekday": weekday,
+            "day_of_year": day_of_year,
+            "week_of_year": ((day_of_year - 1) // 7 + 1).astype(np.int8)}
+
+
+def calendar_positions(dates) -> np.ndarray:
+    """Positions of YYYYMMDD integers in the calendar index; raises ValueError for unknown dates."""
+    keys = jalali_calendar_index()["key"]
+    dates = np.asarray(dates, dtype=np.int64)
+    positions = np.searchsorted(keys, dates)
+    if len(dates) and (positions.max() >= len(keys) or (keys[np.minimum(positions, len(keys) - 1)] != dates).any()):
+        raise ValueError("Dates outside the Jalali calendar index")
+    return positions
+
+
+def calendar_lookup(dates, field: str) -> np.ndarray:
+    """Look a calendar field (see jalali_calendar_index) up for YYYYMMDD integers."""
+    return jalali_calendar_index()[field][calendar_positions(dates)]
+
+
+def shift_persian_int(dates, days) -> np.ndarray:
+    """Move YYYYMMDD integers by a number of days; raises ValueError when a result leaves the calendar index."""
+    keys = jalali_calendar_index()["key"]
+    positions = calendar_positions(dates) + days
+    if positions.size and (positions.min() < 0 or positions.max() >= len(keys)):
+        raise ValueError("Dates outside the Jalali calendar index")
+    return keys[positions]
 
 
 def split_train_forecast(df, train_len):
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from src.utils.utils import jalali_calendar_index, shift_persian_int
+
+
+def test_shift_crosses_month_and_year():
+    np.testing.assert_array_equal(shift_persian_int([14031230, 14040101], 1), [14040101, 14040102])
+    np.testing.assert_array_equal(shift_persian_int([14040101], -1), [14031230])
+
+
+@pytest.mark.parametrize("days", [-1, 1])
+def test_shift_outside_the_index_raises(days):
+    keys = jalali_calendar_index()["key"]
+    edge = keys[0] if days < 0 else keys[-1]
+    with pytest.raises(ValueError):
+        shift_persian_int([edge], days)
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import jdatetime as jdt
+import pandas as pd
+import pytest
+
+from src.utils.utils import read_yaml
+from src.components.data_fetching import DataFetching
+from src.components.fetching.read_sql import read_sql_data_bulk
+from src.components.fetching.synthetic import write_local_source
+from src.components.MA_Sarima import SarimaPredictor
+from src.components.preprocessing import Preprocessing
+
+ROOT = Path(__file__).resolve().parent.parent
+LEVEL4 = "7_5_9_2"
+
+PREPROCESSING = read_yaml(ROOT / "config" / "config.yaml")["preprocessing"]
+with open(ROOT / "feature_rules.json", "r") as openfile:
+    FEATURE_RULES = json.load(openfile)
+with open(ROOT / "features_recipe.json", "r") as openfile:
+    FEATURES_RECIPE = json.load(openfile)
+
+
+@pytest.fixture(scope="module")
+def fetched(tmp_path_factory):
+    """Train and forecast frames of one synthetic level4, with the weekly stage output."""
+    source = write_local_source(tmp_path_factory.mktemp("source") / "source.db", [LEVEL4],
+                                start_date=jdt.date(1403, 1, 1))
+    start_forecast = jdt.datetime.combine(jdt.date.today() - jdt.timedelta(days=15), jdt.time())
+    end_forecast = start_forecast + jdt.timedelta(days=63)
+    data = read_sql_data_bulk(source, [LEVEL4], start_forecast, end_forecast)
+    train_data, forecast_data, forecast_date = DataFetching("", "", start_forecast, end_forecast, LEVEL4,
+                                                            data[LEVEL4], cache_dir=None, source=source).run()
+    forecast_data = SarimaPredictor(engines=["seasonal_naive"])(train_data, forecast_data, forecast_date)
+    assert "SarimaOutput" in forecast_data[LEVEL4]
+    return train_data, forecast_data
+
+
+def preprocess(engine, fetched, rules, dtypes):
+    train_data, forecast_data = fetched
+    return Preprocessing({LEVEL4: train_data[LEVEL4].copy()},
+                         {LEVEL4: forecast_data[LEVEL4].copy()},
+                         PREPROCESSING["features_to_keep"],
+                         PREPROCESSING["sin_features"],
+                         PREPROCESSING["features_to_dummies"],
+                         PREPROCESSING["MA_variations"],
+                         PREPROCESSING["T_variations"],
+                         rules,
+                         FEATURES_RECIPE,
+                         engine=engine,
+                         dtypes=dtypes).preprocess_data()
+
+
+# The rules of several feature_rules.json entries applied to the level4, and no rules at all
+@pytest.mark.parametrize("rule", ["1_2_5_1", "7_5_9_2", "1_1_1_1", None])
+@pytest.mark.parametrize("dtypes", ["compact", "wide"])
+def test_columnar_engine_matches_pandas(fetched, rule, dtypes):
+    rules = {LEVEL4: FEATURE_RULES[rule]} if rule is not None else {}
+    expected_train, expected_forecast = preprocess("pandas", fetched, rules, dtypes)
+    train, forecast = preprocess("columnar", fetched, rules, dtypes)
+
+    assert len(train[LEVEL4]) > 365 and len(forecast[LEVEL4]) > 0
+
+    pd.testing.assert_frame_equal(train[LEVEL4], expected_train[LEVEL4], check_exact=True)
+    pd.testing.assert_frame_equal(forecast[LEVEL4], expected_forecast[LEVEL4], check_exact=True)
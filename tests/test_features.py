@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.utils import read_yaml
+from src.components.Preprocess.features import (add_ma_features,
+                                                add_t_lag_features,
+                                                select_lag_variations,
+                                                update_lag)
+
+PREPROCESSING = read_yaml(Path(__file__).resolve().parent.parent / "config" / "config.yaml")["preprocessing"]
+
+
+def legacy_add_ma_features(df, weight_col, ma_variations):
+    """Original per-row implementation, kept as the reference output."""
+    for feature in ma_variations:
+        for key, value in feature.items():
+            df[key] = 1.0
+            df.loc[1: df.shape[0], key] = [
+                np.mean(weight_col[i - value:]) for i in range(1, df.shape[0])
+            ]
+    return df
+
+
+def legacy_add_t_lag_features(df, weight_col, t_variations):
+    """Original per-row implementation, kept as the reference output."""
+    for feature in t_variations:
+        for key, value in feature.items():
+            df[key] = 0.0
+            df.loc[value: df.shape[0], key] = [
+                weight_col[i - value] for i in range(value, df.shape[0])
+            ]
+    return df
+
+
+def synthetic_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    weight = rng.gamma(2.0, 500.0, n_rows)
+    weight[rng.random(n_rows) < 0.01] = np.nan
+    return pd.DataFrame({"WeightQTY": weight})
+
+
+def assert_same_features(actual, expected):
+    cols = [c for c in expected.columns if c != "WeightQTY"]
+    np.testing.assert_allclose(actual[cols].to_numpy(dtype=float),
+                               expected[cols].to_numpy(dtype=float),
+                               rtol=1e-9, equal_nan=True)
+
+
+# Shorter than the longest window too, where the legacy slices wrap to the tail
+@pytest.mark.parametrize("n_rows", [1, 5, 40, 500])
+def test_ma_features_match_legacy(n_rows):
+    df = synthetic_frame(n_rows)
+    expected = legacy_add_ma_features(df.copy(), df["WeightQTY"], PREPROCESSING["MA_variations"])
+    actual = add_ma_features(df.copy(), df["WeightQTY"], PREPROCESSING["MA_variations"])
+    assert_same_features(actual, expected)
+
+
+@pytest.mark.parametrize("n_rows", [1, 5, 40, 500])
+def test_t_lag_features_match_legacy(n_rows):
+    df = synthetic_frame(n_rows)
+    expected = legacy_add_t_lag_features(df.copy(), df["WeightQTY"], PREPROCESSING["T_variations"])
+    actual = add_t_lag_features(df.copy(), df["WeightQTY"], PREPROCESSING["T_variations"])
+    assert_same_features(actual, expected)
+
+
+def test_kept_lags_match_building_all_and_dropping():
+    df = synthetic_frame(200)
+    rules = {"3_9_2_4": {"auto_corr": [1, 0, 0, 1]}}
+    kept = add_t_lag_features(df.copy(), df["WeightQTY"],
+                              select_lag_variations(PREPROCESSING["T_variations"], "3_9_2_4", rules))
+    dropped = update_lag(add_t_lag_features(df.copy(), df["WeightQTY"], PREPROCESSING["T_variations"]),
+                         "3_9_2_4", rules)
+    pd.testing.assert_frame_equal(kept, dropped)
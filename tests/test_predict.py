@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import jdatetime as jdt
+import pandas as pd
+
+from src import pipeline
+from src.settings import Settings
+from src.components.fetching.synthetic import write_local_source
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def local_settings(tmp_path, level4_ids):
+    """Settings of a run against a synthetic local source, with every artifact under tmp_path."""
+    write_local_source(tmp_path / "source.db", level4_ids, start_date=jdt.date(1403, 1, 1))
+    settings = Settings.load(ROOT / "config" / "config.yaml",
+                             ROOT / "params.yaml",
+                             ROOT / "feature_rules.json",
+                             ROOT / "features_recipe.json",
+                             output_dir = tmp_path / "output")
+    config = settings.config
+    config["resources"].update(total_cores=2, workers=1)
+    config["checkpoints"]["dir"] = str(tmp_path / "checkpoints")
+    config["data_fetching"].update(source="local", local_path=str(tmp_path / "source.db"),
+                                   cache_dir=str(tmp_path / "cache"))
+    config["sarima"]["params_dir"] = str(tmp_path / "sarima")
+    config["training"]["registry_dir"] = str(tmp_path / "models")
+    config["training"]["params_store"]["dir"] = str(tmp_path / "best_params")
+    config["output"]["mode"] = "none"
+    settings.params["search"] = {**settings.params.get("search", {}), "n_iter": 2, "n_splits": 2}
+    return settings
+
+
+def test_predict_reproduces_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings = local_settings(tmp_path, ["7_5_9_2", "3_9_2_4"])
+
+    pipeline.run_batch(settings)
+    batch = pd.read_csv(settings.output_dir / "total_output.csv")
+    # The batch run moved the stored SARIMA parameters on: predict must not fit them again
+    pipeline.run_predict(settings)
+    predict = pd.read_csv(settings.output_dir / "total_output.csv")
+
+    assert set(batch["Level4_ID"]) == {"7_5_9_2", "3_9_2_4"}
+    # Each run keeps its own Parquet parts under the output directory
+    runs = sorted(path.name.split("-")[0] for path in (settings.output_dir / "forecasts").iterdir())
+    assert runs == ["batch", "predict"]
+    assert all(len(list(path.glob("*.parquet"))) == 2 for path in (settings.output_dir / "forecasts").iterdir())
+    keys = ["Level4_ID", "Date"]
+    pd.testing.assert_frame_equal(predict.sort_values(keys).reset_index(drop=True),
+                                  batch.sort_values(keys).reset_index(drop=True))
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+import pytest
+
+from src.components.training.tree_inference import TreeEnsemble, predict_ensembles, predict_boosters
+
+
+def train_booster(X, y, **params):
+    return lgb.train({"objective": "regression", "num_leaves": 15, "min_data_in_leaf": 5, "verbose": -1, **params},
+                     lgb.Dataset(X, y), num_boost_round=50)
+
+
+def assert_same_predictions(booster, X):
+    expected = booster.predict(X)
+    actual = predict_ensembles({0: (TreeEnsemble.from_booster(booster), np.asarray(X, dtype=float))})[0]
+    np.testing.assert_array_equal(actual, expected)
+
+
+def features(n_rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 4))
+    y = 2 * X[:, 0] + np.where(np.isnan(X[:, 1]), 3, X[:, 1]) + rng.normal(size=n_rows) * 0.1
+    return X, y, rng
+
+
+def test_nan_as_missing():
+    X, y, rng = features()
+    X[rng.random(X.shape) < 0.2] = np.nan
+    booster = train_booster(X, y)
+    X_new = features(seed=1)[0][:100]
+    X_new[rng.random(X_new.shape) < 0.3] = np.nan
+    assert_same_predictions(booster, X_new)
+
+
+def test_zero_as_missing():
+    X, y, rng = features()
+    X[rng.random(X.shape) < 0.2] = 0.0
+    booster = train_booster(X, y, zero_as_missing=True)
+    X_new = features(seed=1)[0][:100]
+    X_new[rng.random(X_new.shape) < 0.2] = 0.0
+    X_new[rng.random(X_new.shape) < 0.1] = np.nan
+    assert_same_predictions(booster, X_new)
+
+
+def test_categorical_splits():
+    X, y, rng = features()
+    X[:, 2] = rng.integers(0, 40, len(X))
+    y = y + np.where(X[:, 2] % 3 == 0, 5.0, 0.0)
+    booster = lgb.train({"objective": "regression", "num_leaves": 15, "min_data_in_leaf": 5,
+                         "min_data_per_group": 5, "cat_smooth": 1, "verbose": -1},
+                        lgb.Dataset(X, y, categorical_feature=[2]), num_boost_round=50)
+    X_new = X[:200].copy()
+    # Unseen, negative and missing categories
+    X_new[:10, 2] = [45, 100, -1, np.nan, 0, 1, 2, 3, 39, 64]
+    assert_same_predictions(booster, X_new)
+
+
+def test_models_of_one_schema_are_evaluated_together():
+    X, y, rng = features()
+    boosters = {m: train_booster(X, y + m, learning_rate=0.05 * (m + 1)) for m in range(3)}
+    X_new = {m: features(n_rows=20 + m, seed=m + 1)[0] for m in boosters}
+    predictions = predict_ensembles({m: (TreeEnsemble.from_booster(b), X_new[m]) for m, b in boosters.items()})
+    for m, booster in boosters.items():
+        np.testing.assert_array_equal(predictions[m], booster.predict(X_new[m]))
+
+
+def test_unsupported_models_use_their_own_predict():
+    X, y, _ = features()
+    booster = lgb.train({"objective": "regression", "linear_tree": True, "verbose": -1}, lgb.Dataset(X, y),
+                        num_boost_round=10)
+    assert TreeEnsemble.from_booster(booster) is None
+
+    model = lgb.LGBMRegressor(linear_tree=True, n_estimators=10, verbose=-1).fit(pd.DataFrame(X), y)
+    predictions = predict_boosters({0: (model, X[:20])})
+    np.testing.assert_array_equal(predictions[0], model.predict(X[:20]))
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect
+
+from src.components.fetching.connection import get_engine
+from src.components.fetching.write_sql import write_frame
+
+
+def forecast_frame(level4s=3, days=5, target_month=140412, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Level4_ID": np.repeat([f"{i}_1_1_1" for i in range(level4s)], days),
+                         "Date": np.tile(14050101 + np.arange(days), level4s),
+                         "Forecast": rng.gamma(2.0, 500.0, level4s * days),
+                         "TargetMonth": target_month})
+
+
+def read_table(connection_string, table):
+    with get_engine(connection_string).connect() as conn:
+        return pd.read_sql_query(f"SELECT * FROM {table}", conn)
+
+
+def test_staged_rerun_replaces_rows(tmp_path):
+    connection_string = f"sqlite:///{tmp_path / 'forecast.db'}"
+    first, rerun = forecast_frame(seed=0), forecast_frame(seed=1)
+
+    stats = write_frame(first, "forecast", connection_string, chunksize=4, staging_table="forecast_staging")
+    assert stats["rows"] == len(first) and stats["replaced"] == 0
+
+    stats = write_frame(rerun, "forecast", connection_string, chunksize=4, staging_table="forecast_staging")
+    assert stats["replaced"] == len(first)
+
+    stored = read_table(connection_string, "forecast").sort_values(["Level4_ID", "Date"]).reset_index(drop=True)
+    assert len(stored) == len(rerun)
+    np.testing.assert_allclose(stored["Forecast"], rerun.sort_values(["Level4_ID", "Date"])["Forecast"])
+    # The per-write staging table is dropped by the merge
+    assert inspect(get_engine(connection_string)).get_table_names() == ["forecast"]
+
+
+def test_staged_write_keeps_other_months(tmp_path):
+    connection_string = f"sqlite:///{tmp_path / 'forecast.db'}"
+    write_frame(forecast_frame(target_month=140411), "forecast", connection_string, staging_table="forecast_staging")
+    write_frame(forecast_frame(target_month=140412), "forecast", connection_string, staging_table="forecast_staging")
+
+    counts = read_table(connection_string, "forecast")["TargetMonth"].value_counts()
+    assert counts.to_dict() == {140411: 15, 140412: 15}